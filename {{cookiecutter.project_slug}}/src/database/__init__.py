@@ -8,8 +8,8 @@ It follows the Flask application factory pattern to prevent circular dependencie
 # initializing db in __init__.py
 # to prevent circular dependencies
 
-from modules.manager.models import Module, Log
+from modules.manager.models import Log, Module
 from modules.users.models import Organization, User
 from {{cookiecutter.project_slug}}.extensions import db
 
-__all__ = ['db', 'User', 'Organization', 'Module', 'Log']
+__all__ = ['Log', 'Module', 'Organization', 'User', 'db']
@@ -1,10 +1,26 @@
+"""
+Discovers the model classes of the installed and enabled modules.
+
+Every `models.py` is parsed with the `ast` module, so only real top-level
+classes are picked up (not commented-out or nested ones). The classes found
+in each file are kept in an index next to this module, keyed by path with the
+file's mtime, size and hash, so unchanged files are not parsed again.
+
+The result is written to `database/__init__.py`, which imports every model so
+that Flask-Migrate sees them. Imports already present in that file are kept,
+and the file is only rewritten when its content changes.
+"""
+import ast
+import hashlib
+import json
 import os
-import re
 from pathlib import Path
-from collections import defaultdict
 
 from modules.manager.models import Module
 
+INDEX_FILE = '.models_index.json'
+BASE_IMPORT = 'from {{cookiecutter.project_slug}}.extensions import db'
+
 
 def auto_load_models(installed_apps):
     models_files = []
@@ -25,7 +41,7 @@ def auto_load_models(installed_apps):
 def get_enabled_modules():
     enable_modules = []
     try:
-        module_entry = Module.query.filter_by(enabled=True).all()
+        module_entry = Module.query.with_entities(Module.name).filter_by(enabled=True).all()
         for module in module_entry:
             enable_modules.append(module.name)
         return enable_modules
@@ -33,96 +49,150 @@ def get_enabled_modules():
         print(e)
 
 
+def find_model_classes(source):
+    """
+    Returns the names of the top-level classes with at least one base class.
+
+    Args:
+        source (str): The source code of a models.py file.
+
+    Returns:
+        list: The class names, in definition order.
+    """
+    tree = ast.parse(source)
+    return [node.name for node in tree.body if isinstance(node, ast.ClassDef) and node.bases]
+
+
+def load_index(index_path):
+    """
+    Loads the models index persisted by a previous run.
+
+    Args:
+        index_path (str): The path of the index file.
+
+    Returns:
+        dict: The index, empty if the file is missing or invalid.
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def scan_models_file(models_file, entry):
+    """
+    Returns the index entry of a models.py file, parsing it only if it changed.
+
+    Args:
+        models_file (str): The path of the models.py file.
+        entry (dict): The entry stored by the previous run, or None.
+
+    Returns:
+        dict: The entry with `mtime`, `size`, `sha256` and `classes` keys.
+    """
+    stat = os.stat(models_file)
+    if entry and entry.get('mtime') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+        return entry
+
+    with open(models_file, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if entry and entry.get('sha256') == digest:
+        classes = entry['classes']
+    else:
+        try:
+            classes = find_model_classes(content.decode('utf-8'))
+        except SyntaxError as e:
+            print(f"Unable to parse {models_file}: {e}")
+            classes = []
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest, 'classes': classes}
+
+
+def parse_init_file(content):
+    """
+    Splits the current `database/__init__.py` into its header and model imports.
+
+    Args:
+        content (str): The content of the file.
+
+    Returns:
+        tuple: The header (docstring and comments before the first import) and a
+            dict mapping each imported module to the set of imported names.
+    """
+    lines = content.splitlines(keepends=True)
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return '', {}
+
+    imports = {}
+    first_import = None
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and first_import is None:
+            first_import = node.lineno
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = {alias.name for alias in node.names if alias.name != 'db'}
+            if names:
+                imports.setdefault(node.module, set()).update(names)
+
+    header = ''.join(lines[:first_import - 1]) if first_import else ''
+    return header, imports
+
+
+def render_init_file(header, imports):
+    """
+    Renders `database/__init__.py` from its header and model imports.
+
+    Args:
+        header (str): The docstring and comments placed before the imports.
+        imports (dict): Maps each module to the set of model names it provides.
+
+    Returns:
+        str: The file content.
+    """
+    import_lines = [f"from {module} import {', '.join(sorted(names))}\n" for module, names in sorted(imports.items())]
+    all_items = sorted({name for names in imports.values() for name in names} | {'db'})
+    return (
+        header
+        + ''.join(import_lines)
+        + f"{BASE_IMPORT}\n\n"
+        + f"__all__ = [{', '.join(repr(item) for item in all_items)}]\n"
+    )
+
+
 def register_models(models_files):
     root_project = Path(__file__).parent.parent
+    index_path = os.path.join(Path(__file__).parent, INDEX_FILE)
+    index = load_index(index_path)
 
-    # Extract class names from all models.py files, grouped by their file
-    models_imports = defaultdict(list)
+    # Extract class names from all models.py files, grouped by their import path
+    new_index = {}
+    models_imports = {}
     for models_file in models_files:
-        with open(models_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            classes = re.findall(r'^(?!#\s*)class\s+(\w+)\(.*\):', content, re.MULTILINE)
-            if classes:
-                import_path = (
-                    models_file.replace(str(root_project) + os.sep, '')
-                    .replace('/', '.').replace('\\', '.')
-                    .replace('.py', '')
-                )
-                models_imports[import_path].extend(classes)
-
-    # Update the __init__.py file
-    init_file = f"{root_project}/database/__init__.py"
-    with open(init_file, 'r+', encoding='utf-8') as f:
-        content = f.readlines()
-
-        # Ensure `from {{cookiecutter.project_slug}}.extensions import db` is present
-        base_import = 'from {{cookiecutter.project_slug}}.extensions import db\n'
-        if base_import not in content:
-            last_import_line = max(
-                (i for i, line in enumerate(content) if line.startswith(('from ', 'import '))),
-                default=-1
-            )
-            content.insert(last_import_line + 1 if last_import_line != -1 else 0, base_import)
-
-        # Track existing imports
-        existing_imports = {}
-        for line in content:
-            if line.startswith('from '):
-                match = re.match(r'from (.+?) import (.+)', line)
-                if match:
-                    module, classes = match.groups()
-                    existing_imports.setdefault(module.strip(), set()).update(
-                        cls.strip() for cls in classes.split(',')
-                    )
-
-        # Add import statements for models, avoiding duplicates
-        new_content = []
-        inserted_modules = set()
-        for line in content:
-            if line.startswith('from ') and 'import' in line:
-                module = line.split('import')[0].strip().replace('from ', '')
-                if module not in inserted_modules:
-                    inserted_modules.add(module)
-                    new_content.append(line)
-            else:
-                new_content.append(line)
-
-        # Insert new imports
-        base_import_index = new_content.index(base_import)
-        for import_path, classes in models_imports.items():
-            classes = sorted(set(classes))
-            existing_classes = existing_imports.get(import_path, set())
-            new_classes = set(classes) - existing_classes
-
-            if new_classes:
-                models_import = f'from {import_path} import {", ".join(sorted(new_classes))}\n'
-                new_content.insert(base_import_index, models_import)
-                base_import_index += 1
-
-        # Update __all__ list
-        all_items = set()
-        for line in new_content:
-            if line.startswith('__all__'):
-                all_items.update(
-                    item.strip("' \n")
-                    for item in re.findall(r"'([^']+)'", line)
-                )
-
-        # Add 'db' and model classes to __all__
-        all_items.add('db')
-        for classes in models_imports.values():
-            all_items.update(classes)
-
-        # Replace or insert __all__
-        all_list_line = next((i for i, line in enumerate(new_content) if line.startswith('__all__')), None)
-        formatted_all = f"__all__ = [{', '.join(repr(item) for item in sorted(all_items))}]\n"
-
-        if all_list_line is not None:
-            new_content[all_list_line] = formatted_all
-        else:
-            new_content.append('\n' + formatted_all)
-
-        # Write back to __init__.py
-        f.seek(0)
-        f.writelines(new_content)
-        f.truncate()
+        key = os.path.relpath(os.path.abspath(models_file), root_project)
+        entry = scan_models_file(models_file, index.get(key))
+        new_index[key] = entry
+        if entry['classes']:
+            import_path = key[:-len('.py')].replace(os.sep, '.')
+            models_imports[import_path] = set(entry['classes'])
+
+    if new_index != index:
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(new_index, f, indent=4, sort_keys=True)
+
+    # Keep the imports already present, e.g. from modules that have been disabled since
+    init_file = os.path.join(root_project, 'database', '__init__.py')
+    with open(init_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    header, imports = parse_init_file(content)
+    for import_path, classes in models_imports.items():
+        imports.setdefault(import_path, set()).update(classes)
+
+    new_content = render_init_file(header, imports)
+    if new_content != content:
+        with open(init_file, 'w', encoding='utf-8') as f:
+            f.write(new_content)
+        print(f"Updated {init_file}")
+    else:
+        print(f"{init_file} is up to date.")
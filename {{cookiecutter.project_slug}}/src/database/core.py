@@ -1,27 +1,270 @@
 """
 Database core module.
 
-This module provides a mixin class for SQLAlchemy models.
+This module provides a mixin class for SQLAlchemy models, the serializer
+compiled for each model class from its mapped columns, and the UUID column
+type used for primary keys, filled with time-ordered UUIDv7 values.
 """
+import os
+import threading
+import time as _time
+import uuid
+from datetime import date, datetime, time
+from operator import attrgetter
+
+from sqlalchemy import BINARY, Date, DateTime, LargeBinary, Time, inspect
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generates a time-ordered UUID, version 7 of RFC 9562.
+
+    The first 48 bits are the Unix time in milliseconds, followed by a 12-bit
+    counter that keeps the identifiers of a process strictly increasing within
+    a millisecond, and 62 random bits. New rows therefore land at the end of
+    primary key indexes instead of at random pages.
+
+    Returns:
+        uuid.UUID: The new identifier.
+    """
+    global _uuid7_last  # pylint: disable=global-statement
+    with _uuid7_lock:
+        stamp = _time.time_ns() // 1_000_000 << 12
+        _uuid7_last = stamp if stamp > _uuid7_last else _uuid7_last + 1
+        value = _uuid7_last
+    random_bits = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    return uuid.UUID(int=(value >> 12) << 80 | 0x7 << 76 | (value & 0xFFF) << 64 | 0b10 << 62 | random_bits)
+
+
+def new_id() -> str:
+    """
+    Default of UUID primary keys.
+
+    Returns:
+        str: A new UUIDv7 in its canonical string form.
+    """
+    return str(uuid7())
+
+
+def is_uuid(value) -> bool:
+    """
+    Tells whether a value, e.g. an id received in a request, can be bound to a UUIDType column.
+
+    Args:
+        value (object): The value to check.
+
+    Returns:
+        bool: True for UUID objects and their string forms.
+    """
+    if isinstance(value, uuid.UUID):
+        return True
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+class UUIDType(TypeDecorator):
+    """
+    A UUID column: native `UUID` on PostgreSQL, 16-byte binary elsewhere.
+
+    Values are bound from UUID objects or strings and loaded as canonical
+    strings, so code handling ids as strings keeps working. Binding a value
+    that is not a UUID raises, check untrusted ids with `is_uuid` first.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(LargeBinary(16))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            try:
+                value = uuid.UUID(bytes=value) if isinstance(value, bytes) else uuid.UUID(str(value))
+            except ValueError as e:
+                raise ValueError(f"Invalid UUID {value!r}.") from e
+        return value if dialect.name == 'postgresql' else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            # Strings are ids of a table not migrated yet, see `flask database migrate-uuids`
+            return value
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return str(uuid.UUID(bytes=bytes(value)))
+
+
+class Serializer:
+    """
+    Converts instances or result rows of a model to JSON ready dictionaries.
+
+    A serializer is compiled once per model and field selection: the column
+    keys, a single getter for all of them, and the positions of the temporal
+    columns that are formatted as ISO 8601 strings. The `id` column is
+    renamed to `_id` to interface with responses.
+
+    Attributes:
+        keys (tuple): The serialized attribute names, in column order.
+        names (tuple): The keys of the output dictionaries.
+        columns (tuple): The mapped attributes, to select rows for `many()`.
+    """
+
+    def __init__(self, model, include=None, exclude=()):
+        attrs = [attr for attr in inspect(model).column_attrs
+                 if (include is None or attr.key in include) and attr.key not in exclude]
+        self.model = model
+        self.keys = tuple(attr.key for attr in attrs)
+        self.names = tuple('_id' if key == 'id' else key for key in self.keys)
+        self.columns = tuple(getattr(model, key) for key in self.keys)
+        getter = attrgetter(*self.keys) if self.keys else (lambda obj: ())
+        self._getter = getter if len(self.keys) != 1 else (lambda obj: (getter(obj),))
+        self._temporal = tuple(
+            index for index, attr in enumerate(attrs)
+            if isinstance(attr.columns[0].type, (Date, DateTime, Time))
+        )
+
+    def _dump(self, values):
+        if self._temporal:
+            values = list(values)
+            for index in self._temporal:
+                value = values[index]
+                if isinstance(value, (date, datetime, time)):
+                    values[index] = value.isoformat()
+        return dict(zip(self.names, values))
+
+    def one(self, obj) -> dict:
+        """
+        Serializes a model instance.
+
+        Args:
+            obj (Mixin): The model instance.
+
+        Returns:
+            dict: The serialized fields.
+        """
+        return self._dump(self._getter(obj))
+
+    def many(self, rows) -> list:
+        """
+        Serializes model instances, or result rows selected with `columns`.
+
+        Args:
+            rows (iterable): Model instances, or tuples of values in `columns` order.
+
+        Returns:
+            list: The serialized fields of every row.
+        """
+        getter, dump, model = self._getter, self._dump, self.model
+        return [dump(getter(row) if isinstance(row, model) else row) for row in rows]
 
 
 class Mixin:
     """Utility Base Class for SQLAlchemy Models.
-    Adds `to_dict()` to easily serialize objects to dictionaries.
+    Adds `to_dict()` and `to_dicts()` to serialize objects to dictionaries.
+    Adds `fixture_row()` to turn fixture fields into a row for bulk inserts.
+
+    Columns listed in `__serializer_exclude__` are never serialized.
     """
 
-    def to_dict(self, exclude: list = None) -> dict:
+    __serializer_exclude__ = frozenset()
+
+    @classmethod
+    def serializer(cls, include=None, exclude=None) -> Serializer:
+        """
+        Returns the serializer of the model, compiled on first use.
+
+        Args:
+            include (iterable): The attribute names to serialize. Defaults to every column.
+            exclude (iterable): Attribute names to leave out, in addition to `__serializer_exclude__`.
+
+        Returns:
+            Serializer: The compiled serializer.
+        """
+        serializers = cls.__dict__.get('_serializers')
+        if serializers is None:
+            serializers = {}
+            cls._serializers = serializers
+        include = frozenset(include) if include is not None else None
+        exclude = frozenset(exclude or ()) | cls.__serializer_exclude__
+        serializer = serializers.get((include, exclude))
+        if serializer is None:
+            serializer = serializers[(include, exclude)] = Serializer(cls, include, exclude)
+        return serializer
+
+    def to_dict(self, exclude: list = None, include: list = None) -> dict:
         """
-        Converts the object's attributes to a dictionary.
+        Converts the object's columns to a dictionary.
         Args:
             exclude (list): A list of attribute names to exclude from the dictionary.
+            include (list): A list of attribute names to serialize, defaults to every column.
+
+        Returns:
+            dict: A dictionary containing the object's columns.
+        """
+        return self.serializer(include, exclude).one(self)
+
+    @classmethod
+    def to_dicts(cls, rows, exclude: list = None, include: list = None) -> list:
+        """
+        Converts many objects, or rows selected with `serializer().columns`, to dictionaries.
+        Args:
+            rows (iterable): The model instances or result rows.
+            exclude (list): A list of attribute names to exclude from the dictionaries.
+            include (list): A list of attribute names to serialize, defaults to every column.
 
         Returns:
-            dict: A dictionary containing the object's attributes.
-        """
-        if exclude is None:
-            exclude = []
-        d_out = {key: val for key, val in self.__dict__.items() if key not in exclude}
-        d_out.pop("_sa_instance_state", None)
-        d_out["_id"] = d_out.pop("id", None)  # rename id key to interface with response
-        return d_out
+            list: A dictionary for each row.
+        """
+        return cls.serializer(include, exclude).many(rows)
+
+    @classmethod
+    def fixture_row(cls, fields: dict) -> dict:
+        """
+        Converts fixture fields to column values for a Core bulk insert.
+
+        Unknown keys are dropped and ISO formatted strings are parsed for date
+        and datetime columns. Models that need more, such as hashing a password,
+        override this method.
+
+        Args:
+            fields (dict): The fields of a fixture record.
+
+        Returns:
+            dict: The column values.
+        """
+        converters = cls.__dict__.get('_fixture_converters')
+        if converters is None:
+            converters = {}
+            for column in cls.__table__.columns:
+                if isinstance(column.type, DateTime):
+                    converters[column.key] = datetime.fromisoformat
+                elif isinstance(column.type, Date):
+                    converters[column.key] = date.fromisoformat
+                else:
+                    converters[column.key] = None
+            cls._fixture_converters = converters
+
+        row = {}
+        for key, val in fields.items():
+            if key in converters:
+                convert = converters[key]
+                row[key] = convert(val) if convert and isinstance(val, str) else val
+        return row
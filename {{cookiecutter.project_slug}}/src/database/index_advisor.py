@@ -0,0 +1,338 @@
+"""
+Proposes indexes from the SELECT statements captured at runtime.
+
+SQLAccounting aggregates SELECT statements by fingerprint and flushes them to
+one JSON file per process (see `SQL_FINGERPRINTS_FOLDER`). The advisor merges
+these files, takes the statements with the highest total time and runs EXPLAIN
+on each of them, with placeholder values of the recorded parameter types:
+
+- SQLite: `EXPLAIN QUERY PLAN`, where `SCAN <table>` is a full table scan and
+  `USE TEMP B-TREE FOR ORDER BY` a sort without an index.
+- PostgreSQL: `EXPLAIN`, where `Seq Scan on <table>` is a full table scan and
+  a `Sort` node a sort without an index.
+
+For each scanned table of the metadata, it proposes an index on the columns the
+statement filters on, equality comparisons first, then the first range
+comparison or the ORDER BY columns. Tables whose primary key, unique
+constraints or indexes, declared or reflected, already start with that column
+are left alone. The proposals are written as a Flask-Migrate revision.
+
+Used by `flask database advise-indexes`.
+"""
+import datetime
+import decimal
+import json
+import os
+import re
+import time
+import uuid
+from collections import namedtuple
+
+from alembic import util
+from alembic.autogenerate import render_python_code
+from alembic.operations import ops
+from alembic.script import ScriptDirectory
+from sqlalchemy import exc, inspect
+
+# An index proposed for a statement captured at runtime
+IndexAdvice = namedtuple('IndexAdvice', 'table columns name statement count total_ms reason')
+
+MAX_INDEX_COLUMNS = 3
+MAX_NAME_LENGTH = 63
+
+PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_COLUMN = r'(\w+)\.(\w+)'
+_KEYWORDS = r'(?:WHERE|JOIN|ON|LEFT|RIGHT|INNER|OUTER|FULL|CROSS|ORDER|GROUP|LIMIT|OFFSET|UNION|FOR)\b'
+_TABLES = re.compile(rf'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!{_KEYWORDS})(\w+))?', re.IGNORECASE)
+_WHERE = re.compile(r'\bWHERE\b(.*?)(?=\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|$)',
+                    re.IGNORECASE | re.DOTALL)
+_ORDER_BY = re.compile(r'\bORDER BY\b(.*?)(?=\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|\)|$)', re.IGNORECASE | re.DOTALL)
+_EQUALITY = re.compile(rf'{_COLUMN}\s*(?:=\s*{PLACEHOLDER}|IN\s*\()', re.IGNORECASE)
+_RANGE = re.compile(rf'{_COLUMN}\s*(?:<=|>=|<|>|\bBETWEEN\b|\bLIKE\b)', re.IGNORECASE)
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
+_POSTGRESQL_SCAN = re.compile(r'Seq Scan on (\w+)(?: (\w+))?')
+
+_PLACEHOLDER_VALUES = {
+    'str': '',
+    'int': 0,
+    'float': 0.0,
+    'bool': False,
+    'bytes': bytes(16),
+    'memoryview': bytes(16),
+    'Decimal': decimal.Decimal(0),
+    'datetime': datetime.datetime(2000, 1, 1),
+    'date': datetime.date(2000, 1, 1),
+    'time': datetime.time(0),
+    'UUID': str(uuid.UUID(int=0)),
+}
+
+
+def load_fingerprints(folder, max_age=None):
+    """
+    Merges the fingerprint files written by every process.
+
+    Files older than `max_age`, from processes that stopped long ago, are
+    removed instead of merged, and so are the temporary files left by
+    interrupted flushes.
+
+    Parameters:
+        folder (str): The folder of the fingerprint files.
+        max_age (float): Optional age in seconds past which a file is removed.
+
+    Returns:
+        dict: The statistics of each fingerprint: statement, parameters, count, total_ms and max_ms.
+    """
+    merged = {}
+    if not os.path.isdir(folder):
+        return merged
+    oldest = time.time() - max_age if max_age is not None else None
+    for file_name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file_name)
+        if not file_name.endswith(('.json', '.tmp')):
+            continue
+        if oldest is not None:
+            try:
+                if os.path.getmtime(path) < oldest:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+        if file_name.endswith('.tmp'):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                fingerprints = json.load(file).get('fingerprints', {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skipping fingerprint file {file_name}: {e}")
+            continue
+        for key, entry in fingerprints.items():
+            if key not in merged:
+                merged[key] = dict(entry)
+                continue
+            merged[key]['count'] += entry['count']
+            merged[key]['total_ms'] += entry['total_ms']
+            merged[key]['max_ms'] = max(merged[key]['max_ms'], entry['max_ms'])
+    return merged
+
+
+def placeholder_parameters(types):
+    """
+    Builds parameters of the recorded types, to EXPLAIN a statement without its real values.
+
+    Parameters:
+        types (list or dict): The type name of each parameter.
+
+    Returns:
+        tuple or dict: A placeholder value for each parameter.
+    """
+    if isinstance(types, dict):
+        return {key: _PLACEHOLDER_VALUES.get(name) for key, name in types.items()}
+    return tuple(_PLACEHOLDER_VALUES.get(name) for name in types or ())
+
+
+def explain(connection, statement, parameters):
+    """
+    Returns the query plan of a statement.
+
+    Parameters:
+        connection (Connection): A connection of the database engine.
+        statement (str): The SQL text, as sent to the DBAPI.
+        parameters (tuple or dict): Its parameters.
+
+    Returns:
+        list: The lines of the plan, or None if the database is neither PostgreSQL nor SQLite.
+    """
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in rows]
+    if dialect == 'postgresql':
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        return [row[0] for row in rows]
+    return None
+
+
+def read_plan(dialect, plan):
+    """
+    Finds the full table scans and the sorts without index of a query plan.
+
+    Parameters:
+        dialect (str): The name of the database dialect.
+        plan (list): The lines returned by `explain`.
+
+    Returns:
+        tuple: The set of scanned table names or aliases, and whether rows are sorted without an index.
+    """
+    scanned, sorts = set(), False
+    for line in plan:
+        line = line.strip().lstrip('->').strip()
+        if dialect == 'sqlite':
+            match = _SQLITE_SCAN.match(line)
+            sorts = sorts or line.startswith('USE TEMP B-TREE FOR ORDER BY')
+        else:
+            match = _POSTGRESQL_SCAN.search(line)
+            sorts = sorts or line.startswith(('Sort ', 'Incremental Sort '))
+        if match:
+            scanned.update(name for name in match.groups() if name)
+    return scanned, sorts
+
+
+def referenced_columns(statement):
+    """
+    Finds the columns a statement filters and sorts on.
+
+    Parameters:
+        statement (str): The SQL text.
+
+    Returns:
+        tuple: The table of each alias, then lists of (alias, column) compared for equality, compared by range
+        and sorted on.
+    """
+    statement = statement.replace('"', '').replace('`', '')
+    aliases = {}
+    for table, alias in _TABLES.findall(statement):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    where = ' '.join(_WHERE.findall(statement))
+    order_by = ' '.join(_ORDER_BY.findall(statement))
+    return (
+        aliases,
+        _unique(_EQUALITY.findall(where)),
+        _unique(_RANGE.findall(where)),
+        _unique(re.findall(_COLUMN, order_by)),
+    )
+
+
+def indexed_columns(inspector, table):
+    """
+    Returns the leading columns of the primary key, unique constraints and indexes of a table.
+
+    Both the indexes declared in the metadata and the ones reflected from the database are considered.
+
+    Parameters:
+        inspector (Inspector): An inspector of the database engine.
+        table (Table): The table of the metadata.
+
+    Returns:
+        set: The column names that already lead an index.
+    """
+    leading = {column.name for column in list(table.primary_key.columns)[:1]}
+    leading.update(list(index.columns)[0].name for index in table.indexes if len(index.columns))
+    leading.update(column.name for column in table.columns if column.unique or column.index)
+    if inspector.has_table(table.name):
+        reflected = (inspector.get_indexes(table.name) + inspector.get_unique_constraints(table.name)
+                     + [inspector.get_pk_constraint(table.name)])
+        leading.update(item['column_names'][0] for item in reflected if item.get('column_names'))
+    return leading
+
+
+def index_name(table, columns):
+    """
+    Returns the name of a proposed index, shortened to the PostgreSQL identifier limit.
+
+    Parameters:
+        table (str): The table name.
+        columns (list): The column names.
+
+    Returns:
+        str: The index name.
+    """
+    return f"ix_{table}_{'_'.join(columns)}"[:MAX_NAME_LENGTH]
+
+
+def advise_indexes(engine, metadata, fingerprints, limit=20):
+    """
+    Proposes indexes for the slowest statements that scan tables of the metadata.
+
+    Parameters:
+        engine (Engine): The database engine.
+        metadata (MetaData): The metadata of the models.
+        fingerprints (dict): The statistics returned by `load_fingerprints`.
+        limit (int): The number of statements explained, by decreasing total time.
+
+    Returns:
+        list: IndexAdvice tuples, at most one per table and column list.
+    """
+    inspector = inspect(engine)
+    slowest = sorted(fingerprints.values(), key=lambda entry: entry['total_ms'], reverse=True)[:limit]
+    advice = {}
+    with engine.connect() as connection:
+        for entry in slowest:
+            try:
+                plan = explain(connection, entry['statement'], placeholder_parameters(entry['parameters']))
+            except exc.DBAPIError as e:
+                connection.rollback()
+                print(f"Could not explain statement: {e.orig}")
+                continue
+            connection.rollback()
+            aliases, equality, ranges, order_by = referenced_columns(entry['statement'])
+            if plan is None:
+                scanned, sorts = set(aliases), bool(order_by)
+            else:
+                scanned, sorts = read_plan(engine.dialect.name, plan)
+
+            for alias in scanned:
+                table = metadata.tables.get(aliases.get(alias, alias))
+                if table is None:
+                    continue
+                columns = [column for name, column in equality if name == alias]
+                ranges_on = [column for name, column in ranges if name == alias]
+                order_on = [column for name, column in order_by if name == alias]
+                reason = 'full scan'
+                if ranges_on:
+                    # An index range scan cannot also provide the order, prefer the filter
+                    columns.append(ranges_on[0])
+                elif order_on and (sorts or not columns):
+                    columns += order_on
+                    reason = 'full scan and sort' if sorts else reason
+                columns = [column for column in _unique(columns) if column in table.columns][:MAX_INDEX_COLUMNS]
+                if not columns or columns[0] in indexed_columns(inspector, table):
+                    continue
+                key = (table.name, tuple(columns))
+                if key not in advice:
+                    advice[key] = IndexAdvice(table.name, columns, index_name(table.name, columns),
+                                              entry['statement'], entry['count'], entry['total_ms'], reason)
+    return list(advice.values())
+
+
+def render_migration(advice):
+    """
+    Renders the upgrade and downgrade code of a migration creating the proposed indexes.
+
+    Parameters:
+        advice (list): IndexAdvice tuples.
+
+    Returns:
+        tuple: The Python code of the upgrade and of the downgrade.
+    """
+    upgrade = ops.UpgradeOps([ops.CreateIndexOp(item.name, item.table, item.columns) for item in advice])
+    downgrade = ops.DowngradeOps([ops.DropIndexOp(item.name, table_name=item.table) for item in reversed(advice)])
+    return render_python_code(upgrade), render_python_code(downgrade)
+
+
+def write_migration(config, advice, message):
+    """
+    Writes a Flask-Migrate revision creating the proposed indexes.
+
+    The revision is generated from the migration templates without running
+    `env.py`, so it does not need a database connection.
+
+    Parameters:
+        config (Config): The Alembic configuration of the migrations directory.
+        advice (list): IndexAdvice tuples.
+        message (str): The message of the revision.
+
+    Returns:
+        str: The path of the revision file.
+    """
+    upgrades, downgrades = render_migration(advice)
+    script_directory = ScriptDirectory.from_config(config)
+    script = script_directory.generate_revision(
+        util.rev_id(), message, head='head', refresh=True, upgrades=upgrades, downgrades=downgrades
+    )
+    return script.path
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
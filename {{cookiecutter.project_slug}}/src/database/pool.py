@@ -0,0 +1,167 @@
+"""
+Connection pool metrics.
+
+PoolMetrics swaps the engine's QueuePool for a metered subclass and listens to
+its checkout, checkin and connect events. It counts connections and checkouts,
+tracks how many connections are checked out at once, and records how long
+each checkout waited for a free connection. Waiting is the first sign that the
+pool is exhausted, e.g. when uwsgi workers stall.
+
+The snapshot is published in `app.extensions['metrics']`, which the admin
+metrics endpoint serves.
+"""
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from {{cookiecutter.project_slug}}.extensions import db
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+
+    The wait is stored in the `info` of the connection record, where the
+    checkout listener reads it. PoolMetrics creates a subclass bound to itself
+    in the `metrics` attribute.
+    """
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        record.info['checkout_wait'] = time.perf_counter() - started
+        return record
+
+
+def is_memory_database(uri):
+    """
+    Tells whether a database URI points to an in-memory SQLite database.
+
+    Args:
+        uri (str): The database URI.
+
+    Returns:
+        bool: True for in-memory SQLite databases, which use a single static connection.
+    """
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+
+
+class PoolMetrics:
+    """
+    Flask extension collecting connection pool metrics.
+
+    Must be initialized before `db.init_app`, which creates the engine with
+    the metered pool class.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.poolclass = type('MeteredQueuePool', (MeteredQueuePool,), {'metrics': self})
+        event.listen(self.poolclass, 'connect', self._on_connect)
+        event.listen(self.poolclass, 'checkout', self._on_checkout)
+        event.listen(self.poolclass, 'checkin', self._on_checkin)
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Selects the metered pool for the application's engine and publishes the metrics.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        if not is_memory_database(app.config['SQLALCHEMY_DATABASE_URI']):
+            options.setdefault('poolclass', self.poolclass)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+        app.extensions['pool_metrics'] = self
+        app.extensions.setdefault('metrics', {})['database_pool'] = self.snapshot
+
+    def reset(self):
+        """
+        Resets the counters.
+        """
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_timeout(self, waited):
+        """
+        Records a checkout that timed out waiting for a connection.
+
+        Args:
+            waited (float): The seconds waited before giving up.
+        """
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        waited = connection_record.info.pop('checkout_wait', 0.0)
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self):
+        """
+        Returns the current metrics. Must run inside an application context.
+
+        Returns:
+            dict: The counters, the checkout wait times in milliseconds and the state of the pool.
+        """
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            data = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checked_out': self.checked_out,
+                'max_checked_out': self.max_checked_out,
+                'timeouts': self.timeouts,
+                'wait_avg_ms': round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+        pool = db.engine.pool
+        data['pool'] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+                max_overflow=pool._max_overflow,  # pylint: disable=protected-access
+                timeout=pool.timeout(),
+            )
+        return data
+
+
+pool_metrics = PoolMetrics()
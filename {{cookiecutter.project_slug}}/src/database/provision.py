@@ -0,0 +1,100 @@
+"""
+Contains functions for provisioning the database.
+
+Creating the database is done explicitly with `flask database provision`.
+Once the database is known to exist, a readiness marker is written so that
+later boots do not open extra connections to check for it again.
+
+The marker stores a hash of `SQLALCHEMY_DATABASE_URI`, so pointing the app at
+another database invalidates it. The production configuration (`APP_CONFIG=production`)
+skips the check entirely, since the database is provisioned by deploys;
+`DATABASE_CHECK_ON_BOOT` overrides that default.
+"""
+import hashlib
+import os
+
+from sqlalchemy_utils import create_database, database_exists
+
+
+def _marker_path(app):
+    return app.config.get('DATABASE_READY_MARKER') or os.path.join(app.instance_path, '.database_ready')
+
+
+def _uri_digest(uri):
+    return hashlib.sha256(uri.encode('utf-8')).hexdigest()
+
+
+def is_marked_ready(app):
+    """
+    Checks the readiness marker for the configured database.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        bool: True if the marker matches the configured database URI.
+    """
+    try:
+        with open(_marker_path(app), 'r', encoding='utf-8') as f:
+            return f.read().strip() == _uri_digest(app.config['SQLALCHEMY_DATABASE_URI'])
+    except OSError:
+        return False
+
+
+def mark_ready(app):
+    """
+    Writes the readiness marker for the configured database.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    marker_path = _marker_path(app)
+    try:
+        os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+        tmp_path = f"{marker_path}.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_uri_digest(app.config['SQLALCHEMY_DATABASE_URI']))
+        os.replace(tmp_path, marker_path)
+    except OSError as e:
+        print(f"Unable to write database readiness marker {marker_path}: {e}")
+
+
+def provision_database(app):
+    """
+    Creates the configured database if it does not exist and marks it ready.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        bool: True if the database had to be created.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    created = False
+    if not database_exists(uri):
+        print("db not exist. Creating..")
+        create_database(uri)
+        created = True
+    mark_ready(app)
+    return created
+
+
+def ensure_database(app):
+    """
+    Makes sure the database exists at boot without probing it on every start.
+
+    The database is only checked when `DATABASE_CHECK_ON_BOOT` is enabled and
+    no valid readiness marker exists yet.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    if not app.config.get('DATABASE_CHECK_ON_BOOT', True) or is_marked_ready(app):
+        return
+    provision_database(app)
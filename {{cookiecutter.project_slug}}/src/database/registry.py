@@ -0,0 +1,84 @@
+"""
+Model registry.
+
+Resolves model classes by class name or table name from SQLAlchemy's
+declarative registry, instead of searching the source tree for them.
+The lookup tables are rebuilt only when new models have been mapped.
+"""
+from {{cookiecutter.project_slug}}.extensions import db
+
+
+class ModelRegistry:
+    """
+    Index of the mapped model classes.
+
+    Models are indexed by class name, by `__tablename__` and by their fully
+    qualified name (`module.ClassName`). A class name defined by several
+    modules is ambiguous, and those models must be looked up by their fully
+    qualified name or with the module they are defined in.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self._mapper_count = -1
+        self._by_name = {}
+        self._by_table = {}
+        self._by_path = {}
+        self._ambiguous = {}
+
+    def refresh(self):
+        """
+        Rebuilds the lookup tables if models were mapped since the last build.
+
+        Returns:
+            None
+        """
+        mappers = self.base.registry.mappers
+        if len(mappers) == self._mapper_count:
+            return
+        by_name, by_table, by_path, ambiguous = {}, {}, {}, {}
+        for mapper in mappers:
+            model = mapper.class_
+            path = f'{model.__module__}.{model.__name__}'
+            by_path[path] = model
+            if model.__name__ in ambiguous:
+                ambiguous[model.__name__].append(path)
+            elif model.__name__ in by_name:
+                other = by_name.pop(model.__name__)
+                ambiguous[model.__name__] = [f'{other.__module__}.{other.__name__}', path]
+            else:
+                by_name[model.__name__] = model
+            table_name = getattr(model, '__tablename__', None)
+            if table_name:
+                by_table[table_name] = model
+        self._by_name, self._by_table, self._by_path = by_name, by_table, by_path
+        self._ambiguous = {name: sorted(paths) for name, paths in ambiguous.items()}
+        self._mapper_count = len(mappers)
+
+    def get(self, name, module=None):
+        """
+        Returns a model class by class name, table name or fully qualified name.
+
+        Parameters:
+            name (str): The class name, `__tablename__` or `module.ClassName` of the model.
+            module (str): Optional module the class is defined in, e.g. 'modules.users.models'.
+
+        Returns:
+            class: The model class, or None if it is not mapped.
+
+        Raises:
+            ValueError: If the class name is defined by several modules and
+                none of them was given.
+        """
+        self.refresh()
+        if module:
+            model = self._by_path.get(f'{module}.{name}')
+            if model:
+                return model
+        model = self._by_path.get(name) or self._by_name.get(name) or self._by_table.get(name)
+        if model is None and name in self._ambiguous:
+            raise ValueError(f"Model name {name!r} is ambiguous, use one of: {', '.join(self._ambiguous[name])}.")
+        return model
+
+
+models = ModelRegistry(db.Model)
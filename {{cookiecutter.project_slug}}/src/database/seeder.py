@@ -7,108 +7,399 @@ The JSON files are expected to be located in the fixtures directory of the corre
 
 The seed_database function takes a single argument, which is the list of module names to seed. If the argument is not provided, the function will seed all modules that are currently installed.
 
+Fixtures are read incrementally and inserted in chunks, committing after every chunk. Chunks are written by a
+loader from `database.loaders`: `COPY ... FROM STDIN` on PostgreSQL, and Core `insert()` executemany elsewhere.
+Besides the JSON format above, fixtures ending in `.ndjson` or `.jsonl` hold one `{"models": ..., "fields": {...}}`
+object per line; they are streamed row by row, so memory stays constant whatever their size. JSON fixtures are read
+one `{"models": ..., "fields": [...]}` entry at a time, so memory is only bounded per entry: the whole "fields" list of
+an entry is decoded at once. Split a large model over several entries, or use NDJSON. Progress is saved in a
+checkpoint file after every chunk, and an interrupted seed resumes where it stopped.
+
+Fixture order does not matter. The tables found in the fixtures are sorted into waves from the foreign keys of the
+SQLAlchemy metadata: a table is seeded only after the tables it references, and the tables of one wave are loaded
+concurrently, each on its own pooled connection.
+
 """
 import json
 import os
-import importlib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+
+from flask import current_app
 from {{cookiecutter.project_slug}}.extensions import db
 
+from .loaders import get_loader
+from .registry import models
+
 
 # List of fixture file paths
 FIXTURE_MAP = [
     "modules/users/fixtures/users.json",
 ]
 
+CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
 
-def load_json(file_path):
+# The rows of one model in one fixture file; `names` are the model names used for it in the file
+FixtureUnit = namedtuple('FixtureUnit', 'fixture_path abspath model names')
+
+
+def find_model_class(class_name):
     """
-    Loads JSON data from a file.
+    Looks up a model class in the model registry.
 
     Parameters:
-        file_path (str): The path to the JSON file.
+        class_name (str): The class name, table name or `module.ClassName` of the model.
 
     Returns:
-        list: The loaded JSON data, or an empty list if the file is not found or the JSON format is invalid.
+        class: The model class if found, otherwise None.
+
+    Raises:
+        ValueError: If several modules define a model with this class name.
     """
-    try:
-        root_project = Path(__file__).parent.parent
-        fixture_path = os.path.join(root_project, file_path)
-        with open(fixture_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        print(f"Fixture file not found: {fixture_path}")
-    except json.JSONDecodeError as e:
-        print(f"Invalid JSON format in file: {fixture_path}. Error: {e}")
-    return []
+    return models.get(class_name)
 
 
-def find_model_class(class_name):
+def fixture_abspath(file_path):
     """
-    Dynamically searches and imports a model class within the src directory.
+    Returns the absolute path of a fixture file listed in FIXTURE_MAP.
 
     Parameters:
-        class_name (str): The name of the model class to find.
+        file_path (str): The path relative to the src directory.
 
     Returns:
-        class: The model class if found, otherwise None.
+        str: The absolute path.
     """
-    src_path = Path(__file__).parent.parent
+    return os.path.join(Path(__file__).parent.parent, file_path)
 
-    for root, _, files in os.walk(src_path):
-        for file in files:
-            if file == 'models.py':
-                module_path = os.path.relpath(os.path.join(root, file), src_path)
-                module_name = module_path[:-3].replace(os.path.sep, '.')
 
-                try:
-                    module = importlib.import_module(f'{module_name}')
-                    if hasattr(module, class_name):
-                        return getattr(module, class_name)
-                except ImportError:
-                    continue
-    return None
+def iter_json_array(file):
+    """
+    Yields the items of a top-level JSON array without reading the whole file.
+
+    Parameters:
+        file (file): The file object, opened in text mode.
+
+    Yields:
+        object: Each decoded item of the array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise json.JSONDecodeError("Expected a JSON array", buffer, 0)
+    pos = 1
+    eof = False
+    while True:
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            if end == len(buffer) and not eof:
+                raise json.JSONDecodeError("Item may continue in the next chunk", buffer, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Grow the read size with the item so large items are not re-parsed too often
+            chunk = file.read(max(READ_SIZE, len(buffer) - pos))
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+        buffer, pos = buffer[end:], 0
 
 
-def seed_database(replace=False):
+def iter_fixture_rows(fixture_path, offset=None):
     """
-    Seeds the database with data from fixture files.
+    Streams the rows of a fixture file.
 
     Parameters:
-        replace (bool): If True, clears existing data before seeding.
+        fixture_path (str): The absolute path of the fixture file.
+        offset (int): Byte offset to resume NDJSON fixtures from.
 
-    Returns:
-        None
+    Yields:
+        tuple: The model name, the row fields and the NDJSON byte offset after the row (None for JSON).
     """
-    for fixture_path in FIXTURE_MAP:
-        data = load_json(fixture_path)
+    if fixture_path.endswith(NDJSON_EXTENSIONS):
+        with open(fixture_path, 'rb') as file:
+            if offset:
+                file.seek(offset)
+            for line in iter(file.readline, b''):
+                if line.strip():
+                    record = json.loads(line)
+                    yield record['models'], record['fields'], file.tell()
+        return
 
-        for table_data in data:
+    with open(fixture_path, 'r', encoding='utf-8') as file:
+        for table_data in iter_json_array(file):
             table_name = table_data.get('models')
-            fields_list = table_data.get('fields', [])
+            for fields in table_data.get('fields', []):
+                yield table_name, fields, None
+
+
+def fixture_units(fixture_path):
+    """
+    Scans a fixture file for the models it holds rows for.
+
+    Parameters:
+        fixture_path (str): The fixture path, as listed in FIXTURE_MAP.
+
+    Returns:
+        list: A FixtureUnit for each model, in the order they appear in the file.
+    """
+    abspath = fixture_abspath(fixture_path)
+    if not os.path.exists(abspath):
+        print(f"Fixture file not found: {abspath}")
+        return []
 
-            # Dynamically find the model class
+    seen, names = set(), {}
+    try:
+        for table_name, _, _ in iter_fixture_rows(abspath):
+            if table_name in seen:
+                continue
+            seen.add(table_name)
             model = find_model_class(table_name)
             if not model:
                 print(f"No model found for table: {table_name}")
                 continue
+            names.setdefault(model, set()).add(table_name)
+    except json.JSONDecodeError as e:
+        print(f"Invalid JSON format in file: {abspath}. Error: {e}")
+        return []
+    return [FixtureUnit(fixture_path, abspath, model, frozenset(found)) for model, found in names.items()]
+
+
+def dependency_waves(tables):
+    """
+    Sorts tables into waves, each table coming after the tables it references.
+
+    Self-references are ignored. Tables in a foreign-key cycle are seeded one per wave, by name.
+
+    Parameters:
+        tables (set): The Table objects to sort.
+
+    Returns:
+        list: The waves, each a list of tables sorted by name.
+    """
+    pending = {
+        table: {fk.column.table for fk in table.foreign_keys} & tables - {table}
+        for table in tables
+    }
+    waves = []
+    while pending:
+        ready = sorted((table for table, depends in pending.items() if not depends), key=lambda table: table.name)
+        if not ready:
+            cycle = sorted(pending, key=lambda table: table.name)
+            print(f"Circular foreign keys between {', '.join(table.name for table in cycle)}. "
+                  "Seeding them one after another.")
+            waves.extend([table] for table in cycle)
+            break
+        waves.append(ready)
+        for table in ready:
+            del pending[table]
+        for depends in pending.values():
+            depends.difference_update(ready)
+    return waves
+
+
+def checkpoint_path():
+    """
+    Returns the path of the seeding checkpoint file.
+
+    Returns:
+        str: The path, in the application instance folder.
+    """
+    return os.path.join(current_app.instance_path, '.seed_checkpoint.json')
+
+
+def load_checkpoints(path):
+    """
+    Loads the seeding checkpoints.
+
+    Parameters:
+        path (str): The path of the checkpoint file.
+
+    Returns:
+        dict: The progress of each fixture unit, keyed by '<fixture path>:<table name>'.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_checkpoints(checkpoints, path):
+    """
+    Atomically saves the seeding checkpoints.
+
+    Parameters:
+        checkpoints (dict): The progress of each fixture unit.
+        path (str): The path of the checkpoint file.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+        json.dump(checkpoints, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def insert_chunk(connection, loader, model, rows):
+    """
+    Inserts a chunk of rows with the loader and commits it.
+
+    Parameters:
+        connection (Connection): The database connection.
+        loader (ExecutemanyLoader): The loader writing the rows.
+        model (class): The model class of the rows.
+        rows (list): The fixture rows.
+
+    Returns:
+        bool: True if the chunk was inserted, False if it was rolled back.
+    """
+    try:
+        loader.load(connection, model, rows)
+        return True
+    except Exception as e:
+        connection.rollback()
+        print(f"Data in table {model.__tablename__} already exists. Skipping chunk... ({e.__class__.__name__})")
+        return False
+
+
+def seed_unit(engine, loader, unit, checkpoints, path, lock, chunk_size=CHUNK_SIZE):
+    """
+    Seeds the rows of one model from one fixture file, one chunk at a time, on its own connection.
+
+    Parameters:
+        engine (Engine): The engine to take a connection from.
+        loader (ExecutemanyLoader): The loader writing the rows.
+        unit (FixtureUnit): The fixture file and model to seed.
+        checkpoints (dict): The seeding checkpoints, updated after every chunk.
+        path (str): The path of the checkpoint file.
+        lock (Lock): Guards the checkpoints shared by concurrent units.
+        chunk_size (int): The number of rows inserted per statement and transaction.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    table_name = unit.model.__tablename__
+    key = f"{unit.fixture_path}:{table_name}"
+    with lock:
+        state = dict(checkpoints.get(key, {'rows': 0, 'offset': None}))
+    if state['rows']:
+        print(f"Resuming {table_name} from {unit.fixture_path} after {state['rows']} rows...")
+    print(f"Seeding {table_name} from {unit.fixture_path}...")
+
+    # NDJSON fixtures resume from a byte offset, JSON fixtures by skipping the rows already seeded
+    skip = 0 if state['offset'] else state['rows']
+    inserted = 0
+    rows, offset = [], state['offset']
+
+    with engine.connect() as connection:
+        def flush():
+            nonlocal inserted
+            if rows:
+                if insert_chunk(connection, loader, unit.model, rows):
+                    inserted += len(rows)
+                state['rows'] += len(rows)
+                state['offset'] = offset
+                with lock:
+                    checkpoints[key] = dict(state)
+                    save_checkpoints(checkpoints, path)
+                rows.clear()
+
+        try:
+            for table, fields, row_offset in iter_fixture_rows(unit.abspath, state['offset']):
+                if table not in unit.names:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                rows.append(fields)
+                offset = row_offset
+                if len(rows) >= chunk_size:
+                    flush()
+            flush()
+        except json.JSONDecodeError as e:
+            print(f"Invalid JSON format in file: {unit.abspath}. Error: {e}")
+            return inserted
+
+    print(f"Seeded {inserted} records for {table_name}.")
+    with lock:
+        checkpoints.pop(key, None)
+        save_checkpoints(checkpoints, path)
+    return inserted
+
+
+def seed_database(replace=False, chunk_size=CHUNK_SIZE, restart=False, engine='auto', workers=None):
+    """
+    Seeds the database with data from fixture files, in foreign-key order.
+
+    Parameters:
+        replace (bool): If True, clears existing data before seeding, referencing tables first. On PostgreSQL
+            with the COPY loader, tables are truncated with RESTART IDENTITY CASCADE, which also empties the
+            tables referencing them.
+        chunk_size (int): The number of rows inserted per statement and transaction.
+        restart (bool): If True, ignores the saved checkpoints and seeds every fixture from the start.
+        engine (str): The loader to use: 'auto', 'copy' (PostgreSQL only) or 'executemany'.
+        workers (int): The number of tables loaded concurrently. Defaults to the size of the connection
+            pool. SQLite allows a single writer, so it always loads one table at a time.
+
+    Returns:
+        None
+    """
+    sql_engine = db.engine
+    try:
+        loader = get_loader(engine, sql_engine)
+    except ValueError as e:
+        print(e)
+        return
+
+    units = [unit for fixture_path in FIXTURE_MAP for unit in fixture_units(fixture_path)]
+    tables = {unit.model.__table__: unit.model for unit in units}
+    waves = dependency_waves(set(tables))
+
+    path = checkpoint_path()
+    checkpoints = {} if replace or restart else load_checkpoints(path)
+    if replace:
+        with sql_engine.connect() as connection:
+            for wave in reversed(waves):
+                for table in wave:
+                    print(f"Clearing existing data for {table.name}...")
+                    loader.clear(connection, tables[table])
+
+    if sql_engine.dialect.name == 'sqlite':
+        workers = 1
+    elif not workers:
+        workers = sql_engine.pool.size() if hasattr(sql_engine.pool, 'size') else 1
+
+    lock = threading.Lock()
+    total = 0
+    started = time.perf_counter()
+    for number, wave in enumerate(waves, 1):
+        wave_units = [unit for unit in units if unit.model.__table__ in wave]
+        print(f"Wave {number}: {', '.join(table.name for table in wave)}")
+        with ThreadPoolExecutor(max_workers=min(workers, len(wave_units))) as executor:
+            total += sum(executor.map(
+                lambda unit: seed_unit(sql_engine, loader, unit, checkpoints, path, lock, chunk_size),
+                wave_units,
+            ))
+    elapsed = time.perf_counter() - started
 
-            if replace:
-                print(f"Clearing existing data for {table_name}...")
-                db.session.query(model).delete()
-                db.session.commit()
-                print(f"Existing data for {table_name} cleared.")
-
-            print(f"Seeding {table_name}...")
-            objects = [model(**fields) for fields in fields_list]
-            try:
-                db.session.bulk_save_objects(objects)
-                db.session.commit()
-                print(f"Seeded {len(objects)} records for {table_name}.")
-            except Exception:
-                print(f"Data in table {table_name} already exists. Skipping...")
-            finally:
-                db.session.close()
-
-
-    print("Database seeded successfully.")
+    print(f"Database seeded successfully: {total} rows in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:.0f} rows/s, {loader.name} loader).")
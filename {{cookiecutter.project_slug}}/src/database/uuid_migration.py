@@ -0,0 +1,203 @@
+"""
+Converts existing string UUID columns to UUIDType.
+
+Tables created before UUIDType store their ids as 36-character strings.
+`flask database migrate-uuids` writes a Flask-Migrate revision whose upgrade
+calls `convert_uuid_columns`, so the conversion is applied with
+`flask db upgrade` and recorded like any other schema change. It finds the
+UUIDType columns of the metadata that are still strings in the database and
+converts them in place:
+
+- PostgreSQL: the foreign keys involving them are dropped, the columns are
+  altered to the native `uuid` type and the foreign keys are created again.
+- MySQL and MariaDB: the same, the columns being altered to VARBINARY(36),
+  rewritten as 16 bytes with UNHEX, then altered to BINARY(16). MySQL does
+  not roll back DDL, so back the database up first.
+- SQLite: the values are rewritten as 16-byte blobs, then every table is
+  rebuilt with an Alembic batch operation to change the declared type.
+
+Other databases are rejected with UUIDMigrationError.
+"""
+import uuid
+
+from alembic import util
+from alembic.script import ScriptDirectory
+from sqlalchemy import BINARY, VARBINARY, LargeBinary, String, Text, inspect, text
+from sqlalchemy.dialects import postgresql
+
+from .core import UUIDType
+
+SUPPORTED_DIALECTS = ('postgresql', 'mysql', 'mariadb', 'sqlite')
+
+_REVISION_IMPORTS = """from flask import current_app
+
+from database.uuid_migration import convert_uuid_columns"""
+_REVISION_UPGRADE = "convert_uuid_columns(op, current_app.extensions['migrate'].db.metadata)"
+_REVISION_DOWNGRADE = """# The ids are not converted back to strings, restore a backup instead
+    pass"""
+
+
+class UUIDMigrationError(RuntimeError):
+    """Raised when the UUID columns of a database cannot be converted."""
+
+
+def check_dialect(dialect):
+    """
+    Makes sure the UUID columns of a database can be converted.
+
+    Parameters:
+        dialect (Dialect): The dialect of the database.
+
+    Raises:
+        UUIDMigrationError: If the database is not supported.
+    """
+    if dialect.name not in SUPPORTED_DIALECTS:
+        raise UUIDMigrationError(f"Converting UUID columns is not supported on {dialect.name}, "
+                                 f"only on {', '.join(SUPPORTED_DIALECTS)}.")
+
+
+def uuid_columns(metadata):
+    """
+    Lists the UUIDType columns of the metadata.
+
+    Parameters:
+        metadata (MetaData): The metadata of the models.
+
+    Returns:
+        list: (table name, column name) tuples.
+    """
+    return [(table.name, column.name) for table in metadata.sorted_tables
+            for column in table.columns if isinstance(column.type, UUIDType)]
+
+
+def pending_columns(bind, metadata):
+    """
+    Lists the UUIDType columns still stored as strings in the database.
+
+    Parameters:
+        bind (Engine or Connection): The database engine or connection.
+        metadata (MetaData): The metadata of the models.
+
+    Returns:
+        list: (table name, column name) tuples.
+    """
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    pending = []
+    for table_name, column_name in uuid_columns(metadata):
+        if table_name not in tables:
+            continue
+        reflected = {column['name']: column for column in inspector.get_columns(table_name)}
+        column = reflected.get(column_name)
+        if column is not None and isinstance(column['type'], (String, Text)):
+            pending.append((table_name, column_name))
+    return pending
+
+
+def convert_uuid_columns(operations, metadata):
+    """
+    Converts the string UUID columns of existing tables to UUIDType, from a migration.
+
+    Parameters:
+        operations (Operations): The Alembic operations of the migration, i.e. `op`.
+        metadata (MetaData): The metadata of the models.
+
+    Returns:
+        list: The converted columns, as 'table.column' strings.
+
+    Raises:
+        UUIDMigrationError: If the database is not supported.
+    """
+    connection = operations.get_bind()
+    check_dialect(connection.dialect)
+    pending = pending_columns(connection, metadata)
+    if not pending:
+        return []
+    if connection.dialect.name == 'sqlite':
+        _convert_sqlite(operations, pending)
+    else:
+        _convert_altering_columns(operations, pending)
+    return [f"{table}.{column}" for table, column in pending]
+
+
+def write_migration(config, message):
+    """
+    Writes a Flask-Migrate revision converting the string UUID columns.
+
+    The revision is generated from the migration templates without running
+    `env.py`, so it does not need a database connection.
+
+    Parameters:
+        config (Config): The Alembic configuration of the migrations directory.
+        message (str): The message of the revision.
+
+    Returns:
+        str: The path of the revision file.
+    """
+    script_directory = ScriptDirectory.from_config(config)
+    script = script_directory.generate_revision(
+        util.rev_id(), message, head='head', refresh=True,
+        imports=_REVISION_IMPORTS, upgrades=_REVISION_UPGRADE, downgrades=_REVISION_DOWNGRADE,
+    )
+    return script.path
+
+
+def _foreign_keys(inspector, pending):
+    pending_set = set(pending)
+    foreign_keys = []
+    for table_name in inspector.get_table_names():
+        for fk in inspector.get_foreign_keys(table_name):
+            if (any((table_name, column) in pending_set for column in fk['constrained_columns'])
+                    or any((fk['referred_table'], column) in pending_set for column in fk['referred_columns'])):
+                foreign_keys.append((table_name, fk))
+    return foreign_keys
+
+
+def _convert_altering_columns(operations, pending):
+    connection = operations.get_bind()
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+    foreign_keys = _foreign_keys(inspector, pending)
+    reflected = {(table_name, column['name']): column
+                 for table_name in {table_name for table_name, _ in pending}
+                 for column in inspector.get_columns(table_name)}
+
+    for table_name, fk in foreign_keys:
+        operations.drop_constraint(fk['name'], table_name, type_='foreignkey')
+    for table_name, column in pending:
+        existing = reflected[(table_name, column)]
+        if connection.dialect.name == 'postgresql':
+            operations.alter_column(table_name, column, type_=postgresql.UUID(), existing_type=existing['type'],
+                                    existing_nullable=existing['nullable'], postgresql_using=f"{quote(column)}::uuid")
+            continue
+        # MySQL cannot cast the text form to binary in place, go through a column wide enough for both
+        operations.alter_column(table_name, column, type_=VARBINARY(36), existing_type=existing['type'],
+                                existing_nullable=existing['nullable'])
+        operations.execute(text(f"UPDATE {quote(table_name)} SET {quote(column)} = UNHEX(REPLACE({quote(column)}, "
+                                f"'-', '')) WHERE LENGTH({quote(column)}) = 36"))
+        operations.alter_column(table_name, column, type_=BINARY(16), existing_type=VARBINARY(36),
+                                existing_nullable=existing['nullable'])
+    for table_name, fk in foreign_keys:
+        rules = fk.get('options', {})
+        operations.create_foreign_key(fk['name'], table_name, fk['referred_table'], fk['constrained_columns'],
+                                      fk['referred_columns'], ondelete=rules.get('ondelete'),
+                                      onupdate=rules.get('onupdate'))
+
+
+def _convert_sqlite(operations, pending):
+    connection = operations.get_bind()
+    quote = connection.dialect.identifier_preparer.quote
+    for table_name, column in pending:
+        table, name = quote(table_name), quote(column)
+        values = connection.execute(text(f"SELECT DISTINCT {name} FROM {table} WHERE typeof({name}) = 'text'"))
+        params = [{'old': value, 'new': uuid.UUID(value).bytes} for (value,) in values]
+        if params:
+            connection.execute(text(f"UPDATE {table} SET {name} = :new WHERE {name} = :old"), params)
+
+    tables = {}
+    for table_name, column in pending:
+        tables.setdefault(table_name, []).append(column)
+    for table_name, columns in tables.items():
+        with operations.batch_alter_table(table_name, recreate='always') as batch:
+            for column in columns:
+                batch.alter_column(column, type_=LargeBinary(16))
@@ -0,0 +1,163 @@
+"""
+This module keeps a content-addressed store of extracted module archives.
+
+Archives are identified by their SHA-256 digest. Each archive is extracted
+once into `MODULE_ARTIFACT_STORE/<digest>` and module folders are copied from
+there, so re-uploading or redeploying an identical archive does not unzip it
+again. The manifest (`modules.json`) is read straight from the archive.
+
+Module folders are copies, so the store is only a cache: `prune_store` keeps
+the `MODULE_ARTIFACT_KEEP` most recently used archives of each package and
+removes the older ones.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+CHUNK_SIZE = 1024 * 1024
+DIGEST_FILE = '.artifact'
+
+
+def archive_digest(zip_path):
+    """
+    Compute the SHA-256 digest of an archive.
+
+    :param zip_path: The path to the zip file.
+
+    :returns: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(zip_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_archive_manifest(zip_ref):
+    """
+    Find the module package of an archive and read its manifest without extracting it.
+
+    :param zip_ref: The opened ZipFile.
+
+    :returns: A tuple of the package folder name and the manifest dict (None if missing).
+
+    :raises ValueError: If the archive does not contain a package.
+    """
+    names = zip_ref.namelist()
+    packages = [name.split('/')[0] for name in names if '/' in name and name.endswith('__init__.py')]
+    if not packages:
+        raise ValueError("Module archive does not contain a package.")
+    package = packages[0]
+    manifest_name = f'{package}/modules.json'
+    if manifest_name not in names:
+        return package, None
+    return package, json.loads(zip_ref.read(manifest_name).decode('utf-8'))
+
+
+def installed_digest(module_path):
+    """
+    Return the digest of the archive a module folder was installed from.
+
+    :param module_path: The path to the module folder.
+
+    :returns: The hex digest, or None if unknown.
+    """
+    try:
+        with open(os.path.join(module_path, DIGEST_FILE), encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def extract_to_store(zip_ref, digest, store):
+    """
+    Extract an archive into the store unless it is already there.
+
+    :param zip_ref: The opened ZipFile.
+    :param digest: The digest of the archive.
+    :param store: The root folder of the artifact store.
+
+    :returns: A tuple of the extracted tree path and whether it was already cached.
+    """
+    tree = os.path.join(store, digest)
+    if os.path.isdir(tree):
+        # Marks the archive as recently used for prune_store
+        os.utime(tree)
+        return tree, True
+    os.makedirs(store, exist_ok=True)
+    tmp_tree = f"{tree}.{uuid.uuid4().hex}.tmp"
+    zip_ref.extractall(tmp_tree)
+    try:
+        os.rename(tmp_tree, tree)
+    except OSError:
+        # Another worker stored the same archive first
+        shutil.rmtree(tmp_tree, ignore_errors=True)
+    return tree, False
+
+
+def materialize(tree, package, module_path, digest):
+    """
+    Copy a package from the store into the modules folder, replacing the old one.
+
+    The new folder is prepared next to the target and swapped in with renames,
+    so the module is never seen half copied.
+
+    :param tree: The extracted tree in the store.
+    :param package: The package folder name inside the tree.
+    :param module_path: The destination module folder.
+    :param digest: The digest of the archive, recorded in the module folder.
+
+    :returns: None
+    """
+    parent = os.path.dirname(module_path) or '.'
+    token = uuid.uuid4().hex
+    tmp_path = os.path.join(parent, f'.{package}.{token}.new')
+    old_path = os.path.join(parent, f'.{package}.{token}.old')
+
+    shutil.copytree(os.path.join(tree, package), tmp_path)
+    with open(os.path.join(tmp_path, DIGEST_FILE), 'w', encoding='utf-8') as f:
+        f.write(digest)
+
+    if os.path.exists(module_path):
+        os.rename(module_path, old_path)
+    os.rename(tmp_path, module_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _tree_packages(tree):
+    try:
+        entries = list(os.scandir(tree))
+    except OSError:
+        return None
+    packages = sorted(entry.name for entry in entries
+                      if entry.is_dir() and os.path.exists(os.path.join(entry.path, '__init__.py')))
+    return tuple(packages) or None
+
+
+def prune_store(store, keep):
+    """
+    Remove the extracted archives of each package beyond the `keep` most recently used.
+
+    :param store: The root folder of the artifact store.
+    :param keep: The number of archives kept per package.
+
+    :returns: The number of removed archives.
+    """
+    try:
+        entries = [entry for entry in os.scandir(store) if entry.is_dir() and not entry.name.endswith('.tmp')]
+    except FileNotFoundError:
+        return 0
+    by_package = {}
+    for entry in entries:
+        packages = _tree_packages(entry.path)
+        if packages is not None:
+            by_package.setdefault(packages, []).append((entry.stat().st_mtime, entry.path))
+    removed = 0
+    for trees in by_package.values():
+        trees.sort(reverse=True)
+        for _, tree in trees[keep:]:
+            shutil.rmtree(tree, ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,292 @@
+"""
+This module runs module installations in the background.
+
+Uploaded archives are streamed to disk with a size limit, checked against
+zip bombs and path traversal, then installed by a queued job: a Celery task
+when `MODULE_INSTALL_BACKEND` is 'celery', or a single-threaded in-process
+executor otherwise.
+
+The progress of every job is kept in a small JSON file under
+`UPLOAD_FOLDER/jobs`, so any worker can report it through the status endpoint.
+The uploaded archive is removed once its job finished, and the status files of
+jobs finished more than `MODULE_JOB_RETENTION` seconds ago are pruned, as are
+the archives of the artifact store beyond `MODULE_ARTIFACT_KEEP` per package.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from {{cookiecutter.project_slug}}.extensions import {% if cookiecutter.use_celery == 'y' %}celery, {% endif %}db
+
+from .artifacts import prune_store
+from .views import install_module
+
+CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ModuleUploadError(ValueError):
+    """Raised when an uploaded module archive is rejected."""
+
+
+def save_upload(file, upload_folder, max_size):
+    """
+    Stream an uploaded file to disk, enforcing a maximum size.
+
+    :param file: The uploaded FileStorage.
+    :param upload_folder: The folder where the file is saved.
+    :param max_size: The maximum size in bytes.
+
+    :returns: The path of the saved file.
+
+    :raises ModuleUploadError: If the file is larger than `max_size`.
+    """
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(upload_folder, f"{uuid.uuid4().hex}-{filename}")
+    written = 0
+    try:
+        with open(filepath, 'wb') as f:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    raise ModuleUploadError(f"Module archive exceeds {max_size} bytes.")
+                f.write(chunk)
+    except Exception:
+        os.remove(filepath)
+        raise
+    return filepath
+
+
+def check_archive(zip_path, max_uncompressed_size, max_ratio, max_files):
+    """
+    Reject archives that are zip bombs or that write outside the modules folder.
+
+    :param zip_path: The path to the zip file.
+    :param max_uncompressed_size: The maximum total uncompressed size in bytes.
+    :param max_ratio: The maximum compression ratio of a single entry.
+    :param max_files: The maximum number of entries.
+
+    :returns: None
+
+    :raises ModuleUploadError: If the archive is rejected.
+    """
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            entries = zip_ref.infolist()
+    except zipfile.BadZipFile as e:
+        raise ModuleUploadError(f"Invalid zip file: {e}") from e
+
+    if len(entries) > max_files:
+        raise ModuleUploadError(f"Module archive has more than {max_files} entries.")
+
+    total = 0
+    for entry in entries:
+        name = entry.filename
+        if name.startswith(('/', '\\')) or '..' in name.replace('\\', '/').split('/'):
+            raise ModuleUploadError(f"Unsafe path in module archive: {name}")
+        total += entry.file_size
+        if total > max_uncompressed_size:
+            raise ModuleUploadError(f"Module archive expands to more than {max_uncompressed_size} bytes.")
+        if entry.compress_size and entry.file_size / entry.compress_size > max_ratio:
+            raise ModuleUploadError(f"Suspicious compression ratio for {name}.")
+
+    if not any('/' in entry.filename and entry.filename.endswith('__init__.py') for entry in entries):
+        raise ModuleUploadError("Module archive does not contain a package.")
+
+
+def _job_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f"{secure_filename(job_id)}.json")
+
+
+def write_status(jobs_dir, status):
+    """
+    Atomically write the status of a job.
+
+    :param jobs_dir: The folder holding the job status files.
+    :param status: The status dict, with at least an `id` key.
+
+    :returns: None
+    """
+    os.makedirs(jobs_dir, exist_ok=True)
+    path = _job_path(jobs_dir, status['id'])
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def read_status(jobs_dir, job_id):
+    """
+    Read the status of a job.
+
+    :param jobs_dir: The folder holding the job status files.
+    :param job_id: The id of the job.
+
+    :returns: The status dict, or None if the job is unknown.
+    """
+    try:
+        with open(_job_path(jobs_dir, job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def prune_jobs(jobs_dir, retention):
+    """
+    Remove the status files of the jobs finished more than `retention` seconds ago.
+
+    :param jobs_dir: The folder holding the job status files.
+    :param retention: The number of seconds a finished job is kept.
+
+    :returns: The number of removed status files.
+    """
+    removed = 0
+    cutoff = time.time() - retention
+    try:
+        entries = list(os.scandir(jobs_dir))
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        if not entry.name.endswith('.json'):
+            continue
+        status = read_status(jobs_dir, entry.name[:-len('.json')])
+        if status is None or status.get('finished_at', cutoff) >= cutoff:
+            continue
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def jobs_folder(app):
+    """
+    Return the folder holding the job status files.
+
+    :param app: The Flask application instance.
+
+    :returns: The path of the folder.
+    """
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+
+
+def run_install(job_id, zip_path, jobs_dir):
+    """
+    Install a module archive, recording each step in the job status.
+
+    Must run inside an application context.
+
+    :param job_id: The id of the job.
+    :param zip_path: The path to the uploaded zip file.
+    :param jobs_dir: The folder holding the job status files.
+
+    :returns: None
+    """
+    status = read_status(jobs_dir, job_id) or {'id': job_id, 'steps': []}
+    status['state'] = 'running'
+
+    def progress(step):
+        status['steps'].append({'step': step, 'at': time.time()})
+        write_status(jobs_dir, status)
+
+    progress('started')
+    config = current_app.config
+    try:
+        check_archive(
+            zip_path,
+            config['MODULE_MAX_UNCOMPRESSED_SIZE'],
+            config['MODULE_MAX_COMPRESSION_RATIO'],
+            config['MODULE_MAX_FILES'],
+        )
+        progress('validated')
+        install_module(zip_path, progress=progress)
+        status['state'] = 'done'
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Failed to install module {zip_path}: {e}")
+        status['state'] = 'failed'
+        status['error'] = str(e)
+    finally:
+        status['finished_at'] = time.time()
+        write_status(jobs_dir, status)
+        try:
+            os.remove(zip_path)
+        except FileNotFoundError:
+            pass
+        prune_jobs(jobs_dir, config['MODULE_JOB_RETENTION'])
+        prune_store(config['MODULE_ARTIFACT_STORE'], config['MODULE_ARTIFACT_KEEP'])
+
+
+def _run_in_app(app, job_id, zip_path, jobs_dir):
+    with app.app_context():
+        run_install(job_id, zip_path, jobs_dir)
+
+
+def _get_executor():
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            # One job at a time, installs extract into the shared modules folder
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='module-install')
+        return _executor
+{% if cookiecutter.use_celery == 'y' %}
+
+_worker_app = None
+
+
+@celery.task(name='modules.manager.install')
+def install_module_task(job_id, zip_path, jobs_dir):
+    """
+    Celery task installing a module archive.
+
+    :param job_id: The id of the job.
+    :param zip_path: The path to the uploaded zip file.
+    :param jobs_dir: The folder holding the job status files.
+
+    :returns: None
+    """
+    global _worker_app  # pylint: disable=global-statement
+    if _worker_app is None:
+        from {{cookiecutter.project_slug}} import create_app  # pylint: disable=import-outside-toplevel
+        _worker_app = create_app()
+    _run_in_app(_worker_app, job_id, zip_path, jobs_dir)
+{% endif %}
+
+def queue_install(app, zip_path, filename):
+    """
+    Queue the installation of an uploaded module archive.
+
+    :param app: The Flask application instance.
+    :param zip_path: The path to the uploaded zip file.
+    :param filename: The original name of the uploaded file.
+
+    :returns: The id of the job.
+    """
+    job_id = uuid.uuid4().hex
+    jobs_dir = jobs_folder(app)
+    write_status(jobs_dir, {
+        'id': job_id,
+        'filename': filename,
+        'state': 'queued',
+        'steps': [{'step': 'uploaded', 'at': time.time()}],
+    })
+{%- if cookiecutter.use_celery == 'y' %}
+    if app.config.get('MODULE_INSTALL_BACKEND') == 'celery':
+        install_module_task.delay(job_id, zip_path, jobs_dir)
+        return job_id
+{%- endif %}
+    _get_executor().submit(_run_in_app, app, job_id, zip_path, jobs_dir)
+    return job_id
@@ -6,10 +6,9 @@ The models defined here include:
 - Log: Represents a log entry with details about events or actions.
 """
 
-import uuid
 from sqlalchemy.sql import func
 
-from database.core import Mixin
+from database.core import Mixin, UUIDType, new_id
 from {{cookiecutter.project_slug}}.extensions import db
 
 
@@ -21,7 +20,7 @@ class Module(Mixin, db.Model):
     """
     __tablename__ = "general_modules"
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     name = db.Column(db.String(50), unique=True, nullable=False)
     version = db.Column(db.String(20), default='1.0.0')  # Versioning
     enabled = db.Column(db.Boolean, default=False)
@@ -38,7 +37,7 @@ class Log(Mixin, db.Model):
     """
     __tablename__ = "general_modules_logs"
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     action = db.Column(db.String(100), nullable=False)
     timestamp = db.Column(db.DateTime, default=func.now())
-    module_id = db.Column(db.String(36), db.ForeignKey('general_modules.id'), nullable=False)
+    module_id = db.Column(UUIDType, db.ForeignKey('general_modules.id'), nullable=False)
@@ -4,13 +4,13 @@ This module provides a blueprint for managing modules.
 It provides a web interface for managing (enabling/disabling) and installing modules.
 """
 
-import os
-
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from werkzeug.exceptions import RequestEntityTooLarge
 
+from .installer import ModuleUploadError, jobs_folder, queue_install, read_status, save_upload
 from .models import Module, Log
-from .views import enable_module, disable_module, install_module
+from .views import enable_module, disable_module
 
 
 module_blueprint = Blueprint('modules', __name__, template_folder='templates', url_prefix='/modules')
@@ -38,10 +38,14 @@ def module():
         elif action == 'upload':
             file = request.files['file']
             if file and file.filename.endswith('.zip'):
-                filepath = os.path.join(os.path.abspath(os.getenv("UPLOAD_FOLDER", 'uploads')), file.filename)
-                file.save(filepath)
-                install_module(filepath)
-                flash(f'Module {file.filename} installed successfully!', 'success')
+                try:
+                    filepath = save_upload(file, current_app.config['UPLOAD_FOLDER'],
+                                           current_app.config['MODULE_MAX_UPLOAD_SIZE'])
+                except ModuleUploadError as e:
+                    flash(str(e), 'danger')
+                    return redirect(url_for('modules.module'))
+                job_id = queue_install(current_app._get_current_object(), filepath, file.filename)
+                flash(f'Module {file.filename} queued for installation (job {job_id}).', 'success')
 
         return redirect(url_for('modules.module'))
 
@@ -51,3 +55,41 @@ def module():
     modules = Module.query.all()
     logs = Log.query.order_by(Log.timestamp.desc()).limit(10).all()
     return render_template('manager.html', modules=modules, logs=logs)
+
+
+@module_blueprint.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    """
+    Reject a request body larger than `MAX_CONTENT_LENGTH` before it is parsed.
+    """
+    flash(f"Module archive exceeds {current_app.config['MODULE_MAX_UPLOAD_SIZE']} bytes.", 'danger')
+    return redirect(url_for('modules.module'))
+
+
+@module_blueprint.route('/manager/jobs/<job_id>/', methods=['GET'])
+@login_required
+def install_status(job_id):
+    """
+    Report the progress of a module installation job.
+
+    Returns the job state ('queued', 'running', 'done' or 'failed') and the
+    completed steps with their timestamps.
+    """
+    status = read_status(jobs_folder(current_app), job_id)
+    if status is None:
+        return jsonify({"message": "Job not found."}), 404
+    return jsonify(status), 200
+
+
+@module_blueprint.route('/manager/metrics/', methods=['GET'])
+@login_required
+def metrics():
+    """
+    Report the runtime metrics of the application, such as the database connection pool.
+
+    Only available to admins.
+    """
+    if not current_user.is_admin:
+        return jsonify({"message": "Forbidden."}), 403
+    providers = current_app.extensions.get('metrics', {})
+    return jsonify({name: snapshot() for name, snapshot in providers.items()}), 200
@@ -16,9 +16,12 @@ import zipfile
 from flask import current_app
 from packaging.version import Version
 
+from database.registry import models
 from {{cookiecutter.project_slug}}.extensions import db
+from {{cookiecutter.project_slug}}.registry import reload_modules
 from {{cookiecutter.project_slug}}.utils import log_action
 
+from .artifacts import archive_digest, extract_to_store, installed_digest, materialize, read_archive_manifest
 from .models import Module
 
 
@@ -26,37 +29,39 @@ def enable_module(module_name):
     """
     Enable a module.
 
+    The module is registered in this worker right away and in the other
+    workers on their next generation check, without a restart.
+
     :param module_name: The name of the module to enable.
 
-    :returns: A message indicating that the server is restarting.
+    :returns: None
     """
     module_entry = Module.query.filter_by(name=module_name).first()
 
     if module_entry and not module_entry.enabled:
-        importlib.import_module(f'modules.{module_name}.modules')
         module_entry.enabled = True
         db.session.commit()
         log_action("Enabled Module", module_entry.id)
-        return "Restarting Flask..."
+        reload_modules(current_app)
 
 
 def disable_module(module_name):
     """
     Disable a module.
 
+    The module routes are removed from this worker right away and from the
+    other workers on their next generation check.
+
     :param module_name: The name of the module to disable.
 
     :returns: None
     """
     module_entry = Module.query.filter_by(name=module_name).first()
     if module_entry and module_entry.enabled:
-        rules_to_remove = [rule for rule in current_app.url_map.iter_rules() if rule.endpoint.startswith(module_name)]
-        for rule in rules_to_remove:
-            current_app.url_map._rules.remove(rule)
-            current_app.view_functions.pop(rule.endpoint, None)
         module_entry.enabled = False
         db.session.commit()
         log_action("Disabled Module", module_entry.id)
+        reload_modules(current_app)
 
 
 def load_fixtures(module_path):
@@ -71,51 +76,74 @@ def load_fixtures(module_path):
     if os.path.exists(fixtures_path):
         with open(fixtures_path, encoding='utf-8') as f:
             data = json.load(f)
-            for model_name, records in data.items():
-                module_name = module_path.split("/")[-1]
-                model_module = importlib.import_module(f'modules.{module_name}.models')
-                model_class = getattr(model_module, model_name)
-                for record in records:
-                    db.session.add(model_class(**record))
-            db.session.commit()
+        module_name = os.path.basename(os.path.normpath(module_path))
+        models_module = f'modules.{module_name}.models'
+        importlib.import_module(models_module)
+        for model_name, records in data.items():
+            model_class = models.get(model_name, module=models_module)
+            for record in records:
+                db.session.add(model_class(**record))
+        db.session.commit()
 
 
-def install_module(zip_path):
+def install_module(zip_path, progress=None):
     """
     Install a module from a zip file.
 
+    The manifest is read from the archive itself, and the archive is only
+    extracted (once per digest, into the artifact store) when the module
+    folder does not already hold this exact archive. The recorded version is
+    only bumped when the archive is newer.
+
     :param zip_path: The path to the zip file containing the module.
+    :param progress: Optional callable receiving the name of each completed step.
 
     :returns: None
     """
+    progress = progress or (lambda step: None)
+
+    digest = archive_digest(zip_path)
+    progress('hashed')
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall('modules')
-        extracted_dirs = [name for name in zip_ref.namelist() if '/' in name and '__init__.py' in name]
-        module_path = os.path.join('modules', extracted_dirs[0].split('/')[0])
-        modules_json_path = os.path.join(module_path, 'modules.json')
-        module_name = extracted_dirs[0].split('/')[0]
-        if os.path.exists(modules_json_path):
-            with open(modules_json_path, encoding='utf-8') as f:
-                data = json.load(f)
-                next_version = data['version']
-
-                module_entry = Module.query.filter_by(name=data['name']).first()
-                if module_entry:
-                    current_version = module_entry.version
-                    if Version(next_version) > Version(current_version):
-                        shutil.rmtree(module_path)
-                        module_entry.version = data['version']
-                        db.session.commit()
-                        log_action(f"Updated Module {data['name']}", module_entry.id)
-                        return
-                    log_action(f"Module {data['name']} no changes.", module_entry.id)
-                    return
-                new_module = Module(name=data['name'], enabled=True, version=next_version)
-                db.session.add(new_module)
-                db.session.commit()
-                load_fixtures(os.path.join('modules', module_name))
-                log_action(f"Installed Module {data['name']}", new_module.id)
+        module_name, data = read_archive_manifest(zip_ref)
+        module_path = os.path.join('modules', module_name)
+        if data is None:
+            return
+        next_version = data['version']
+
+        module_entry = Module.query.filter_by(name=data['name']).first()
+        if module_entry:
+            if installed_digest(module_path) == digest:
+                log_action(f"Module {data['name']} no changes.", module_entry.id)
+                progress('unchanged')
                 return
+            # The folder is missing (e.g. a fresh container) or holds other code
+            tree, cached = extract_to_store(zip_ref, digest, current_app.config['MODULE_ARTIFACT_STORE'])
+            progress('cached' if cached else 'extracted')
+            materialize(tree, module_name, module_path, digest)
+            if Version(next_version) > Version(module_entry.version):
+                module_entry.version = next_version
+                db.session.commit()
+                log_action(f"Updated Module {data['name']}", module_entry.id)
+                progress('updated')
+            else:
+                log_action(f"Restored Module {data['name']} files", module_entry.id)
+                progress('restored')
+            reload_modules(current_app)
+            return
+
+        tree, cached = extract_to_store(zip_ref, digest, current_app.config['MODULE_ARTIFACT_STORE'])
+        progress('cached' if cached else 'extracted')
+        materialize(tree, module_name, module_path, digest)
+        new_module = Module(name=data['name'], enabled=True, version=next_version)
+        db.session.add(new_module)
+        db.session.commit()
+        progress('registered')
+        load_fixtures(module_path)
+        progress('fixtures_loaded')
+        log_action(f"Installed Module {data['name']}", new_module.id)
+        reload_modules(current_app)
+        progress('enabled')
 
 
 def create_module(name):
@@ -202,22 +230,16 @@ def create_module(name):
                 elif file == "models.py":
                     f.write(
                         "# Define your models here\n"
-                        "import uuid\n"
-                        "\n"
                         "from sqlalchemy.sql import func\n"
                         "\n"
-                        "from database.core import Mixin\n"
+                        "from database.core import Mixin, UUIDType, new_id\n"
                         f"from {current_app.import_name}.extensions import db\n"
                         "\n\n"
                         f"class {module_name}(Mixin, db.Model):\n"
                         "\n"
                         f"    __tablename__ = '{module_name_underscore}'\n"
                         "\n"
-                        "    id = db.Column(\n"
-                        "        db.String(36),\n"
-                        "        primary_key=True,\n"
-                        "        default=lambda: str(uuid.uuid4())\n"
-                        "    )\n"
+                        "    id = db.Column(UUIDType, primary_key=True, default=new_id)\n"
                     )
                 elif file == "modules.py":
                     f.write(
@@ -229,7 +251,8 @@ def create_module(name):
                 elif file == "modules.json":
                     data = {
                         "version": "1.0.0",
-                        "name": module_name_underscore
+                        "name": module_name_underscore,
+                        "lazy": False
                     }
                     json.dump(data, f, indent=4)
             print(f"File created: {file_path}")
@@ -4,22 +4,27 @@ This module defines the database models for users in the application.
 The models defined here include:
 - User: Represents a user with personal details, authentication info, and other attributes.
 - Organization: Represents an organization with details, related to a user as admin.
+
+UserIdentity is not a model: it is the detached snapshot of a User that the
+user loader serves from `identity_cache`.
 """
-import uuid
 from flask_login import UserMixin
 from sqlalchemy.sql import func
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.security import generate_password_hash
 
-from database.core import Mixin
-from {{ cookiecutter.project_slug }}.extensions import db
+from database.core import Mixin, UUIDType, new_id
+from {{ cookiecutter.project_slug }}.extensions import db, identity_cache, password_hasher
 
 
 class User(Mixin, db.Model, UserMixin):
     """Person Table."""
 
     __tablename__ = "person"
+    __serializer_exclude__ = frozenset({"password"})
+    # Keyset pagination of /users/all/ walks this index
+    __table_args__ = (db.Index("ix_person_created_at_id", "created_at", "id"),)
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
@@ -35,13 +40,16 @@ class User(Mixin, db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
-    def __init__(self, active, display_name, email, signed_in_provider,
-                 is_admin, is_super_admin, date_joined, password=None,
+    def __init__(self, active, email, signed_in_provider,
+                 is_admin, is_super_admin, date_joined=None, password=None,
                  picture=None, date_of_birth=None, phone_number=None,
-                 user_id=None):
+                 user_id=None, first_name=None, last_name=None):
         if user_id:
             self.id = user_id
-        self.display_name = display_name
+        if date_joined:
+            self.date_joined = date_joined
+        self.first_name = first_name
+        self.last_name = last_name
         self.active = active
         self.is_admin = is_admin
         self.is_super_admin = is_super_admin
@@ -54,18 +62,57 @@ class User(Mixin, db.Model, UserMixin):
         if password:
             self.set_password(password)
 
+    @classmethod
+    def fixture_row(cls, fields):
+        """Convert fixture fields to column values, hashing the password."""
+        fields = dict(fields)
+        if 'user_id' in fields:
+            fields['id'] = fields.pop('user_id')
+        row = super().fixture_row(fields)
+        if row.get('password'):
+            # Inline: the seeder hashes a whole chunk in one process
+            row['password'] = generate_password_hash(row['password'], method=password_hasher.method)
+        return row
+
     def save(self):
         """Save the user instance to the database."""
+        user_id = self.id  # None for a new user, nothing is cached for it yet
         db.session.add(self)
         db.session.commit()
+        if user_id:
+            identity_cache.invalidate(str(user_id))
 
-    def set_password(self, password):
-        """Hash and set the user's password."""
-        self.password = generate_password_hash(password, method='pbkdf2:sha512')
+    def delete(self):
+        """Delete the user instance from the database."""
+        user_id = self.id
+        db.session.delete(self)
+        db.session.commit()
+        identity_cache.invalidate(str(user_id))
 
-    def check_password(self, password):
-        """Verify a password against the stored hash."""
-        return check_password_hash(self.password, password)
+    @classmethod
+    def identity(cls, user_id):
+        """Load the snapshot of a user, without the password, or None if there is no such user."""
+        serializer = cls.serializer()
+        row = db.session.execute(db.select(*serializer.columns).where(cls.id == user_id)).first()
+        return serializer.many([row])[0] if row else None
+
+    def set_password(self, password):
+        """Hash and set the user's password, in the password hashing pool."""
+        self.password = password_hasher.hash(password)
+
+    def check_password(self, password, rehash=True):
+        """Verify a password against the stored hash.
+
+        When the password matches and the hash was made with other parameters
+        than `PASSWORD_HASH_METHOD`, it is replaced and saved, unless `rehash` is False.
+        """
+        if not password_hasher.verify(self.password, password):
+            return False
+        if rehash and password_hasher.needs_rehash(self.password):
+            self.set_password(password)
+            self.save()
+            password_hasher.count_rehash()
+        return True
 
     def is_active(self):
         """Return True if the user is active."""
@@ -75,16 +122,51 @@ class User(Mixin, db.Model, UserMixin):
         return f"<User {self.email}>"
 
 
+class UserIdentity(UserMixin):
+    """
+    Detached snapshot of a User, as served to Flask-Login.
+
+    The fields of the serialized user are read as attributes, e.g.
+    `current_user.is_admin`. Call `load()` for the User itself.
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def id(self):
+        """The id of the user."""
+        return self._data['_id']
+
+    @property
+    def is_active(self):
+        """Return True if the user is active."""
+        return self._data['active']
+
+    def load(self):
+        """Return the User of this snapshot, attached to the current session."""
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f"<UserIdentity {self._data['email']}>"
+
+
 class Organization(Mixin, db.Model):
     """Organization Table."""
 
     __tablename__ = "person_organization"
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     name = db.Column(db.String(150), nullable=False)
     organization_email = db.Column(db.String(150), unique=True, nullable=False)
     picture = db.Column(db.String(255))
-    admin_id = db.Column(db.String(36), db.ForeignKey('person.id'), nullable=False)
+    admin_id = db.Column(UUIDType, db.ForeignKey('person.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -9,16 +9,27 @@ Imports:
     - flasgger: A library for generating Swagger documentation.
 """
 
-from datetime import timedelta
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
 from flasgger import swag_from
-from flask import Blueprint, request, render_template, jsonify, redirect, session, url_for
+from flask import (
+    Blueprint, Response, request, render_template, jsonify, redirect, session, stream_with_context, url_for
+)
 from flask_jwt_extended import create_access_token, create_refresh_token, set_access_cookies, unset_jwt_cookies
 from flask_login import login_user, logout_user
 
-from {{ cookiecutter.project_slug }}.extensions import login_manager
-from modules.users.models import User
+from database.core import is_uuid
+from {{ cookiecutter.project_slug }}.extensions import db, identity_cache, login_manager, login_throttle
+from {{ cookiecutter.project_slug }}.extensions.passwords import PasswordHasherBusy
+from modules.users.models import User, UserIdentity
 from modules.users.views import create_user
 
+USERS_PAGE_SIZE = 100
+USERS_MAX_PAGE_SIZE = 1000
+USERS_STREAM_BATCH = 1000
+
 users_blueprint = Blueprint(
     "users", __name__, template_folder="templates", url_prefix="/users"
 )
@@ -29,13 +40,19 @@ def load_user(user_id):
     """
     This function is used by Flask-Login to load a user by their id.
 
+    The snapshot of the user is served from `identity_cache`, which `User.save()`
+    and `User.delete()` invalidate.
+
     Args:
-        user_id (int): The id of the user to load.
+        user_id (str): The id of the user to load.
 
     Returns:
-        A User object, or None if no user with the given id could be found.
+        A UserIdentity, or None if no user with the given id could be found.
     """
-    return User.query.get(user_id)
+    if not is_uuid(user_id):
+        return None
+    data = identity_cache.get_or_load(str(user_id), lambda: User.identity(user_id))
+    return UserIdentity(data) if data else None
 
 
 @users_blueprint.route("/login/", methods=["POST", "GET"])
@@ -68,6 +85,10 @@ def login():
             description: OK.
         401:
             description: User is not able to sign in.
+        429:
+            description: Too many sign in attempts from this client or for this account, retry later.
+        503:
+            description: Too many passwords are being checked, retry later.
     """
     if request.method == "GET":
         # Serve the login page for web users
@@ -83,9 +104,19 @@ def login():
         email = request.form.get("email", "").strip()
         password = request.form.get("password", "").strip()
 
+    # Before the lookup and the hash, so throttled attempts cost almost nothing
+    retry_after = login_throttle.check(request.remote_addr, email)
+    if retry_after:
+        return jsonify({"message": "Too many sign in attempts, retry later."}), 429, {"Retry-After": str(retry_after)}
+
     user = User.query.filter_by(email=email).first()
 
-    if user and user.check_password(password):
+    try:
+        valid = user is not None and user.check_password(password)
+    except PasswordHasherBusy:
+        return jsonify({"message": "Too many sign in attempts, retry later."}), 503, {"Retry-After": "1"}
+
+    if valid:
         # Check if the user is enabled
         if user.active:
             if request.is_json:
@@ -174,6 +205,8 @@ def register_user():
             description: All fields are required.
         500:
             description: Error creating new user
+        503:
+            description: Too many passwords are being hashed, retry later.
     """
     first_name = request.json.get("first_name")
     last_name = request.json.get("last_name")
@@ -270,14 +303,14 @@ def logout_current_user():
 )
 def enable_user():
     user_id = request.json.get("id")
-    user = User.query.get(user_id)
+    user = User.query.get(user_id) if is_uuid(user_id) else None
     if not user:
         return jsonify({"message": "User not found."}), 404
 
-    if user.enabled:
+    if user.active:
         return jsonify({"message": "User is already enabled."}), 200
 
-    user.enabled = True
+    user.active = True
     user.save()
     return jsonify({"message": f"User {user.email} enabled successfully."}), 200
 
@@ -304,14 +337,14 @@ def enable_user():
 )
 def disable_user():
     user_id = request.json.get("id")
-    user = User.query.get(user_id)
+    user = User.query.get(user_id) if is_uuid(user_id) else None
     if not user:
         return jsonify({"message": "User not found."}), 404
 
-    if not user.enabled:
+    if not user.active:
         return jsonify({"message": "User is already disabled."}), 200
 
-    user.enabled = False
+    user.active = False
     user.save()
     return jsonify({"message": f"User {user.email} disabled successfully."}), 200
 
@@ -338,7 +371,7 @@ def disable_user():
 )
 def delete_user():
     user_id = request.args.get("id")
-    user = User.query.get(user_id)
+    user = User.query.get(user_id) if is_uuid(user_id) else None
     if not user:
         return jsonify({"message": "User not found."}), 404
 
@@ -353,34 +386,145 @@ def delete_user():
 @swag_from(
     {
         "tags": ["users"],
+        "parameters": [
+            {
+                "name": "limit",
+                "in": "query",
+                "type": "integer",
+                "default": USERS_PAGE_SIZE,
+                "description": f"Users per page, at most {USERS_MAX_PAGE_SIZE}.",
+            },
+            {
+                "name": "after",
+                "in": "query",
+                "type": "string",
+                "description": "The next_cursor of the previous page.",
+            },
+            {
+                "name": "stream",
+                "in": "query",
+                "type": "boolean",
+                "description": "Stream every user as NDJSON, ignoring limit and after.",
+            },
+        ],
         "responses": {
             200: {
-                "description": "All users fetched successfully",
+                "description": "A page of users, ordered by creation date",
                 "schema": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "_id": {"type": "string"},
-                            "active": {"type": "boolean"},
-                            "created_at": {"type": "string", "format": "date-time"},
-                            "date_joined": {"type": "string", "format": "date-time"},
-                            "date_of_birth": {"type": "string", "format": "date"},
-                            "email": {"type": "string"},
-                            "first_name": {"type": "string"},
-                            "last_name": {"type": "string"},
-                            "password": {"type": "string"},
-                            "phone_number": {"type": "string"},
-                            "picture": {"type": "string"},
-                            "signed_in_provider": {"type": "string"},
-                            "updated_at": {"type": "string", "format": "date-time"},
+                    "type": "object",
+                    "properties": {
+                        "users": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "_id": {"type": "string"},
+                                    "active": {"type": "boolean"},
+                                    "created_at": {"type": "string", "format": "date-time"},
+                                    "date_joined": {"type": "string", "format": "date-time"},
+                                    "date_of_birth": {"type": "string", "format": "date"},
+                                    "email": {"type": "string"},
+                                    "first_name": {"type": "string"},
+                                    "last_name": {"type": "string"},
+                                    "phone_number": {"type": "string"},
+                                    "picture": {"type": "string"},
+                                    "signed_in_provider": {"type": "string"},
+                                    "updated_at": {"type": "string", "format": "date-time"},
+                                },
+                            },
                         },
+                        "next_cursor": {"type": "string"},
                     },
                 },
-            }
+            },
+            400: {"description": "Invalid limit or cursor"},
         },
     }
 )
 def get_all_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users]), 200
+    serializer = User.serializer()
+    # Select the serialized columns only, skipping the construction of User instances
+    query = db.select(*serializer.columns).order_by(User.created_at, User.id)
+
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return Response(stream_with_context(stream_users(serializer, query)), mimetype="application/x-ndjson")
+
+    try:
+        limit = int(request.args.get("limit", USERS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"message": "Invalid limit."}), 400
+    if not 0 < limit <= USERS_MAX_PAGE_SIZE:
+        return jsonify({"message": f"limit must be between 1 and {USERS_MAX_PAGE_SIZE}."}), 400
+
+    after = request.args.get("after")
+    if after:
+        try:
+            created_at, user_id = decode_cursor(after)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor."}), 400
+        query = query.where(db.tuple_(User.created_at, User.id) > (created_at, user_id))
+
+    # One extra row tells whether there is a next page
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return jsonify({"users": serializer.many(rows), "next_cursor": next_cursor}), 200
+
+
+def encode_cursor(created_at, user_id):
+    """
+    Encodes the position of a user in the keyset order as an opaque cursor.
+
+    Args:
+        created_at (datetime): The creation date of the user.
+        user_id (str): The id of the user.
+
+    Returns:
+        str: The cursor.
+    """
+    raw = json.dumps([created_at.isoformat(), user_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by encode_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The creation date and the id of the user.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        created_at, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        created_at = datetime.fromisoformat(created_at)
+    except (binascii.Error, UnicodeError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not is_uuid(user_id):
+        raise ValueError("Invalid cursor")
+    return created_at, str(user_id)
+
+
+def stream_users(serializer, query):
+    """
+    Yields every user as a line of NDJSON, fetching them in batches.
+
+    The batches are fetched while the response is sent, after the request
+    hooks ran, so SQLAccounting does not count these statements.
+
+    Args:
+        serializer (Serializer): The User serializer.
+        query (Select): The ordered select of the serialized columns.
+
+    Yields:
+        str: The JSON lines of a batch of users.
+    """
+    result = db.session.execute(query.execution_options(yield_per=USERS_STREAM_BATCH))
+    for rows in result.partitions():
+        yield "".join(json.dumps(user, default=str) + "\n" for user in serializer.many(rows))
@@ -6,10 +6,13 @@ Functions:
     - create_user: Create a new user and send a registration email.
 """
 import os
+from datetime import date
+
 from flask import current_app
 from flask_mail import Message
 
 from {{ cookiecutter.project_slug }}.extensions import mail
+from {{ cookiecutter.project_slug }}.extensions.passwords import PasswordHasherBusy
 from modules.users.models import User
 
 
@@ -23,7 +26,7 @@ def create_user(first_name, last_name, email, picture, password, date_of_birth,
         email (str): User's email address.
         picture (str): User's profile picture URL.
         password (str): User's password.
-        date_of_birth (datetime.date): User's date of birth.
+        date_of_birth (datetime.date or str): User's date of birth, or its ISO 8601 string.
         phone_number (str): User's phone number.
         signed_in_provider (str): User's signed-in provider.
 
@@ -61,20 +64,25 @@ def create_user(first_name, last_name, email, picture, password, date_of_birth,
             print(e)
         return {'status': False, 'message': "Unable to register user.", 'code': 200}
 
-    user = User(
-        password=password,
-        active=True,  # Assuming new users are active by default
-        first_name=first_name,
-        last_name=last_name,
-        email=email,
-        date_of_birth=date_of_birth,
-        phone_number=phone_number,
-        signed_in_provider=signed_in_provider,
-        picture=picture,
-        is_admin=False,
-        is_super_admin=False
-    )
-    user.set_password(password)
+    if isinstance(date_of_birth, str):
+        date_of_birth = date.fromisoformat(date_of_birth)
+    try:
+        # The password is hashed once, by the constructor
+        user = User(
+            password=password,
+            active=True,  # Assuming new users are active by default
+            first_name=first_name,
+            last_name=last_name,
+            email=email,
+            date_of_birth=date_of_birth,
+            phone_number=phone_number,
+            signed_in_provider=signed_in_provider,
+            picture=picture,
+            is_admin=False,
+            is_super_admin=False
+        )
+    except PasswordHasherBusy:
+        return {'status': False, 'message': "Too many registrations in progress, retry later.", 'code': 503}
 
     try:
         user.save()
@@ -0,0 +1,57 @@
+"""
+Shared setup of the test suite.
+
+The configuration is read from the environment when the application package
+is imported, so the variables it requires get test defaults here.
+"""
+import os
+from datetime import date
+
+import pytest
+
+os.environ.setdefault('FLASK_DEBUG', '0')
+os.environ.setdefault('JWT_COOKIE_SECURE', 'False')
+os.environ.setdefault('SESSION_PERMANENT', 'False')
+os.environ.setdefault('SESSION_USE_SIGNER', 'True')
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+os.environ.setdefault('DATABASE_CHECK_ON_BOOT', 'False')
+
+# The application package must be imported before `database` and `modules`, which import each other
+from {{cookiecutter.project_slug}} import create_app  # noqa: E402  # pylint: disable=wrong-import-position
+from {{cookiecutter.project_slug}}.extensions import db  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An application on an empty in-memory database, run from a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    application = create_app()
+    application.config['TESTING'] = True
+    with application.app_context():
+        db.create_all()
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """A test client of the application."""
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Creates active users with a password, returning their id."""
+    from modules.users.models import User  # pylint: disable=import-outside-toplevel
+
+    def make(email, password='secret', **fields):
+        fields.setdefault('phone_number', f"+1555{abs(hash(email)) % 10 ** 7:07d}")
+        with app.app_context():
+            user = User(active=fields.pop('active', True), email=email, signed_in_provider='email',
+                        is_admin=False, is_super_admin=False, password=password, first_name='Test',
+                        last_name='User', date_of_birth=date(2000, 1, 1), **fields)
+            user.save()
+            return str(user.id)
+    return make
@@ -0,0 +1,71 @@
+"""
+Tests of the content-addressed store of module archives.
+"""
+import hashlib
+import json
+import os
+import zipfile
+
+from modules.manager.artifacts import (
+    archive_digest, extract_to_store, installed_digest, materialize, prune_store, read_archive_manifest
+)
+
+
+def make_archive(path, package='blog', version='1.0.0'):
+    files = {
+        f'{package}/__init__.py': '',
+        f'{package}/views.py': f'VERSION = {version!r}\n',
+        f'{package}/modules.json': json.dumps({'name': package, 'version': version}),
+    }
+    with zipfile.ZipFile(path, 'w') as zip_ref:
+        for name, content in files.items():
+            # A fixed timestamp, so identical contents make identical archives
+            zip_ref.writestr(zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0)), content)
+    return str(path)
+
+
+def install(zip_path, store, modules):
+    digest = archive_digest(zip_path)
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        package, _ = read_archive_manifest(zip_ref)
+        tree, cached = extract_to_store(zip_ref, digest, str(store))
+    materialize(tree, package, str(modules / package), digest)
+    return digest, cached
+
+
+def test_archive_digest_is_the_sha256_of_the_file(tmp_path):
+    zip_path = make_archive(tmp_path / 'blog.zip')
+
+    with open(zip_path, 'rb') as f:
+        assert archive_digest(zip_path) == hashlib.sha256(f.read()).hexdigest()
+
+
+def test_materialize_replaces_the_module_folder(tmp_path):
+    store, modules = tmp_path / 'store', tmp_path / 'modules'
+    modules.mkdir()
+    assert installed_digest(str(modules / 'blog')) is None
+
+    first, cached = install(make_archive(tmp_path / 'v1.zip'), store, modules)
+    assert not cached and installed_digest(str(modules / 'blog')) == first
+    second, _ = install(make_archive(tmp_path / 'v2.zip', version='2.0.0'), store, modules)
+    assert install(make_archive(tmp_path / 'v2-again.zip', version='2.0.0'), store, modules) == (second, True)
+
+    assert installed_digest(str(modules / 'blog')) == second
+    assert (modules / 'blog' / 'views.py').read_text() == "VERSION = '2.0.0'\n"
+    assert os.listdir(modules) == ['blog']
+
+
+def test_prune_store_keeps_the_most_recent_archives_of_each_package(tmp_path):
+    store, modules = tmp_path / 'store', tmp_path / 'modules'
+    modules.mkdir()
+    digests = []
+    for index in range(4):
+        digest, _ = install(make_archive(tmp_path / f'blog{index}.zip', version=f'1.0.{index}'), store, modules)
+        os.utime(store / digest, (index, index))
+        digests.append(digest)
+    other, _ = install(make_archive(tmp_path / 'shop.zip', package='shop'), store, modules)
+
+    assert prune_store(str(store), keep=2) == 2
+
+    assert sorted(os.listdir(store)) == sorted(digests[2:] + [other])
+    assert installed_digest(str(modules / 'blog')) == digests[3]
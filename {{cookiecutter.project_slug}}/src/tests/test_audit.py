@@ -0,0 +1,72 @@
+"""
+Tests of the audit log rows written in the background.
+"""
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, func, select
+from sqlalchemy.exc import OperationalError
+
+from {{cookiecutter.project_slug}}.extensions.audit import AuditLog
+
+metadata = MetaData()
+entries = Table('audit_entry', metadata, Column('id', Integer, primary_key=True),
+                Column('action', String(50), nullable=False))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def app(engine):
+    app = Flask(__name__)
+    app.config['AUDIT_LOG_BATCH_SIZE'] = 10
+    app.extensions['sqlalchemy'] = SimpleNamespace(engine=engine)
+    return app
+
+
+def count_entries(engine):
+    with engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(entries))
+
+
+def test_a_rejected_row_does_not_drop_its_batch(app, engine):
+    audit = AuditLog(app)
+    actions = ['login', 'logout', None, 'login', 'logout']
+
+    batch = [(entries, {'action': action}) for action in actions]
+    audit._write_batch(app, engine, batch)  # pylint: disable=protected-access
+
+    assert count_entries(engine) == 4
+    snapshot = audit.snapshot()
+    assert (snapshot['written'], snapshot['failed'], snapshot['split_batches']) == (4, 1, 1)
+    audit.close()
+
+
+def test_transient_errors_are_retried(app, engine, monkeypatch):
+    audit = AuditLog(app)
+    audit.retry_delay = 0
+    insert = audit._insert  # pylint: disable=protected-access
+    failures = [OperationalError('INSERT', {}, Exception('connection lost'))]
+
+    def flaky_insert(engine, rows):
+        if failures:
+            raise failures.pop()
+        insert(engine, rows)
+
+    monkeypatch.setattr(audit, '_insert', flaky_insert)
+    with app.app_context():
+        for action in ('login', 'logout'):
+            audit.write(entries, {'action': action})
+        assert audit.flush(timeout=5)
+
+    assert count_entries(engine) == 2
+    snapshot = audit.snapshot()
+    assert (snapshot['written'], snapshot['failed'], snapshot['retries']) == (2, 0, 1)
+    audit.close()
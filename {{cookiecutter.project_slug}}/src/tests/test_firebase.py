@@ -0,0 +1,76 @@
+"""
+Tests of the cache of verified Firebase ID tokens.
+"""
+import time
+
+import pytest
+from firebase_admin import auth as firebase_auth
+
+from {{cookiecutter.project_slug}}.extensions.firebase import Firebase
+
+
+class Verifier:
+    """Stands for `firebase_auth.verify_id_token`, decoding tokens that expire at `now + 60`."""
+
+    def __init__(self, now):
+        self.now = now
+        self.calls = []
+
+    def __call__(self, token, app=None):  # pylint: disable=unused-argument
+        self.calls.append(token)
+        return {'uid': token, 'exp': self.now[0] + 60}
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    return clock
+
+
+@pytest.fixture
+def verifier(monkeypatch, now):
+    verify = Verifier(now)
+    monkeypatch.setattr(firebase_auth, 'verify_id_token', verify)
+    return verify
+
+
+def test_tokens_are_verified_once_until_they_expire(now, verifier):
+    firebase = Firebase()
+
+    claims = firebase.verify_id_token('token-a')
+    now[0] += 59
+    assert firebase.verify_id_token('token-a') is claims
+    assert verifier.calls == ['token-a']
+
+    now[0] += 1
+    assert firebase.verify_id_token('token-a')['exp'] == now[0] + 60
+    assert verifier.calls == ['token-a', 'token-a']
+    snapshot = firebase.snapshot()
+    assert (snapshot['hits'], snapshot['misses'], snapshot['expired']) == (1, 2, 1)
+
+
+def test_the_least_recently_used_token_is_evicted(verifier):
+    firebase = Firebase()
+    firebase.token_cache_size = 2
+
+    for token in ('token-a', 'token-b', 'token-a', 'token-c'):
+        firebase.verify_id_token(token)
+
+    assert firebase.snapshot()['size'] == 2 and firebase.snapshot()['evictions'] == 1
+    firebase.verify_id_token('token-a')
+    firebase.verify_id_token('token-b')
+    assert verifier.calls == ['token-a', 'token-b', 'token-c', 'token-b']
+
+
+def test_invalid_tokens_are_not_cached(monkeypatch):
+    def reject(token, app=None):  # pylint: disable=unused-argument
+        raise ValueError('Invalid token')
+
+    monkeypatch.setattr(firebase_auth, 'verify_id_token', reject)
+    firebase = Firebase()
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            firebase.verify_id_token('forged')
+    assert firebase.snapshot()['misses'] == 2 and firebase.snapshot()['size'] == 0
@@ -0,0 +1,113 @@
+"""
+Tests of the identity snapshots cached for the user loader.
+"""
+import time
+
+import pytest
+
+from {{cookiecutter.project_slug}}.extensions.identity_cache import IdentityCache
+
+
+class FakeRedis:
+    """The Redis commands used by the shared tier, on a dictionary."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):  # pylint: disable=unused-argument
+        self.data[key] = value.encode()
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+
+def make_cache(tmp_path, shared=None, ttl=30.0):
+    cache = IdentityCache()
+    cache.ttl = ttl
+    cache.generation_file = str(tmp_path / '.identity_generation')
+    if shared is not None:
+        cache._shared = shared  # pylint: disable=protected-access
+    return cache
+
+
+class Loader:
+    """Returns a new snapshot of a user on every call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'_id': 'u1', 'active': True, 'version': self.calls}
+
+
+def test_hits_are_served_without_loading(tmp_path):
+    cache, loader = make_cache(tmp_path), Loader()
+
+    assert cache.get_or_load('u1', loader) == cache.get_or_load('u1', loader)
+
+    assert loader.calls == 1
+    assert (cache.snapshot()['hits'], cache.snapshot()['misses']) == (1, 1)
+
+
+def test_snapshots_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache, loader = make_cache(tmp_path, ttl=30.0), Loader()
+    cache.get_or_load('u1', loader)
+
+    now[0] += 29
+    assert cache.get_or_load('u1', loader)['version'] == 1
+    now[0] += 1
+    assert cache.get_or_load('u1', loader)['version'] == 2
+    assert cache.snapshot()['expirations'] == 1
+
+
+def test_a_snapshot_loaded_during_an_invalidation_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+
+    def stale_loader():
+        # The user changes while its old row is being loaded
+        cache.invalidate('u1')
+        return {'_id': 'u1', 'active': True}
+
+    assert cache.get_or_load('u1', stale_loader)['active']
+    assert cache.get_or_load('u1', lambda: {'_id': 'u1', 'active': False})['active'] is False
+
+
+@pytest.mark.parametrize('shared', [False, True], ids=['generation_file', 'redis'])
+def test_an_invalidation_clears_the_other_workers(tmp_path, shared):
+    redis = FakeRedis() if shared else None
+    worker, other_worker = make_cache(tmp_path, redis), make_cache(tmp_path, redis)
+    loader = Loader()
+    worker.get_or_load('u1', loader)
+    other_worker.get_or_load('u1', loader)
+
+    other_worker.invalidate('u1')
+
+    # Without Redis, each worker loaded its own snapshot before
+    assert worker.get_or_load('u1', loader)['version'] == (2 if shared else 3)
+    assert worker.snapshot()['remote_invalidations'] == 1
+
+
+def test_load_user_round_trip(app, make_user):
+    from modules.users.urls import load_user  # pylint: disable=import-outside-toplevel
+
+    user_id = make_user('bob@example.com')
+    with app.test_request_context():
+        identity = load_user(user_id)
+        assert identity.email == 'bob@example.com' and identity.is_active
+        assert load_user(user_id).email == 'bob@example.com'
+
+        stored = identity.load()
+        stored.active = False
+        stored.save()
+
+        assert not load_user(user_id).is_active
+        assert load_user('not-a-uuid') is None
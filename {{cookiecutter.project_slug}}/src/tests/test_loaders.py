@@ -0,0 +1,80 @@
+"""
+Tests of the seeder loading backends.
+"""
+import os
+
+import pytest
+from sqlalchemy import JSON, Column, Integer, String, create_engine, func, select
+from sqlalchemy.orm import declarative_base
+
+from database.core import Mixin
+from database.loaders import CopyLoader, ExecutemanyLoader, copy_value
+
+Base = declarative_base()
+
+
+class Item(Mixin, Base):
+    __tablename__ = 'loader_item'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    note = Column(String(50))
+    data = Column(JSON)
+
+
+class SQLiteCopyLoader(CopyLoader):
+    """Replays the COPY text format with INSERT statements on the SQLite DBAPI connection."""
+
+    def copy(self, dbapi_connection, statement, buffer):
+        table, columns = statement[len('COPY '):].split(' FROM STDIN')[0].split(' (')
+        columns = columns.rstrip(')').split(', ')
+        rows = [[None if value == '\\N' else value for value in line.split('\t')]
+                for line in buffer.read().splitlines()]
+        placeholders = ', '.join('?' for _ in columns)
+        dbapi_connection.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'loaders.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def count_items(engine):
+    with engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(Item.__table__))
+
+
+def test_copy_value_formats_json_columns():
+    assert copy_value({'a': 1, 'tags': ['x\ty']}) == '{"a": 1, "tags": ["x\\\\ty"]}'
+    assert copy_value([1, None]) == '[1, null]'
+    assert copy_value(None) == '\\N' and copy_value(False) == 'f'
+
+
+@pytest.mark.parametrize('loader', [ExecutemanyLoader(), SQLiteCopyLoader()], ids=['executemany', 'copy'])
+def test_load_commits_rows_without_sql_defaults(engine, loader):
+    rows = [{'id': index, 'name': f'item {index}', 'note': None, 'data': {'index': index, 'tags': ['a']}}
+            for index in range(1, 4)]
+
+    with engine.connect() as connection:
+        loader.load(connection, Item, rows)
+
+    assert count_items(engine) == 3
+    with engine.connect() as connection:
+        assert connection.scalar(select(Item.data).where(Item.id == 2)) == {'index': 2, 'tags': ['a']}
+
+
+@pytest.mark.skipif(not os.getenv('TEST_POSTGRES_URI'), reason='Set TEST_POSTGRES_URI to a psycopg2 URI')
+def test_copy_loader_commits_on_postgresql():
+    engine = create_engine(os.environ['TEST_POSTGRES_URI'])
+    Base.metadata.create_all(engine)
+    try:
+        with engine.connect() as connection:
+            CopyLoader().clear(connection, Item)
+            CopyLoader().load(connection, Item, [{'id': 1, 'name': 'item 1'}, {'id': 2, 'name': 'item\t2'}])
+        assert count_items(engine) == 2
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
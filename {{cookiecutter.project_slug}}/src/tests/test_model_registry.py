@@ -0,0 +1,42 @@
+"""
+Tests of the lookup of model classes by name.
+"""
+import pytest
+from sqlalchemy import Column, Integer
+from sqlalchemy.orm import declarative_base
+
+from database.registry import ModelRegistry
+
+
+def make_model(base, module, table_name):
+    return type('Post', (base,), {
+        '__module__': module,
+        '__tablename__': table_name,
+        'id': Column(Integer, primary_key=True),
+    })
+
+
+def test_models_are_found_by_class_table_and_qualified_name():
+    base = declarative_base()
+    post = make_model(base, 'modules.blog.models', 'blog_post')
+    registry = ModelRegistry(base)
+
+    assert registry.get('Post') is post
+    assert registry.get('blog_post') is post
+    assert registry.get('modules.blog.models.Post') is post
+    assert registry.get('Comment') is None
+
+
+def test_an_ambiguous_class_name_requires_the_module():
+    base = declarative_base()
+    blog_post = make_model(base, 'modules.blog.models', 'blog_post')
+    registry = ModelRegistry(base)
+    assert registry.get('Post') is blog_post
+
+    forum_post = make_model(base, 'modules.forum.models', 'forum_post')
+
+    with pytest.raises(ValueError, match='modules.blog.models.Post, modules.forum.models.Post'):
+        registry.get('Post')
+    assert registry.get('Post', module='modules.forum.models') is forum_post
+    assert registry.get('modules.blog.models.Post') is blog_post
+    assert registry.get('forum_post') is forum_post
@@ -0,0 +1,22 @@
+"""
+Tests of the password hashing process pool.
+"""
+import os
+import signal
+
+from {{cookiecutter.project_slug}}.extensions.passwords import PasswordHasher
+
+
+def test_a_broken_pool_is_replaced():
+    hasher = PasswordHasher()
+    hasher.method = 'pbkdf2:sha256:1000'
+    hasher.workers = 1
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+
+    # pylint: disable=protected-access
+    for pid in list(hasher._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+    assert hasher.snapshot()['pool_restarts'] == 1
+    hasher._executor.shutdown()
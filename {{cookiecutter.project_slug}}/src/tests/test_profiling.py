@@ -0,0 +1,11 @@
+"""
+Tests of the startup phases recorded by create_app.
+"""
+
+
+def test_each_extension_is_timed_in_its_own_phase(app):
+    timings = app.extensions['startup_profiler'].timings
+
+    for name in ('pool_metrics', 'db', 'replicas', 'login_manager', 'identity_cache', 'password_hasher',
+                 'login_throttle', 'sql_accounting', 'audit_log'):
+        assert f'{name}.init_app' in timings
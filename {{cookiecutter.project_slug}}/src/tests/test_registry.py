@@ -0,0 +1,115 @@
+"""
+Tests of the module registry reload across workers and of lazy modules.
+"""
+import importlib
+import shutil
+import sys
+
+import pytest
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from {{cookiecutter.project_slug}}.registry import ModuleMiddleware, ModuleRegistry, bump_generation, read_generation
+from {{cookiecutter.project_slug}}.routing import ModularFlask
+
+
+def make_registry(tmp_path, loaded=('demo',)):
+    for name in loaded:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / '__init__.py').write_text('')
+    registry = ModuleRegistry(str(tmp_path))
+    registry.generation_file = str(tmp_path / '.modules_generation')
+    registry.loaded = {name: object() for name in loaded}
+    return registry
+
+
+def test_sync_keeps_modules_when_the_query_fails(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    registry = make_registry(tmp_path)
+    unregistered = []
+
+    def fail(app):
+        raise OperationalError('SELECT', {}, Exception('server closed the connection'))
+
+    monkeypatch.setattr(registry, 'enabled_module_names', fail)
+    monkeypatch.setattr(registry, 'unregister', lambda app, name: unregistered.append(name))
+    bump_generation(registry.generation_file)
+
+    assert registry.sync(app) is False
+    assert not unregistered
+    assert set(registry.loaded) == {'demo'}
+    assert registry.generation is None
+
+
+def test_poll_retries_a_failed_sync(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    registry = make_registry(tmp_path)
+    results = [OperationalError('SELECT', {}, Exception('timeout')), set()]
+    unregistered = []
+
+    def enabled_module_names(app):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(registry, 'enabled_module_names', enabled_module_names)
+    monkeypatch.setattr(registry, 'unregister', lambda app, name: unregistered.append(name))
+    bump_generation(registry.generation_file)
+
+    registry.poll(app)
+    assert not unregistered
+    registry._next_poll = 0.0
+    registry.poll(app)
+    assert unregistered == ['demo']
+    assert registry.generation == read_generation(registry.generation_file)
+
+
+def write_lazy_module(modules_dir, name, views):
+    package = modules_dir / 'modules' / name
+    package.mkdir(parents=True)
+    (package / '__init__.py').write_text('')
+    (package / 'modules.json').write_text('{"lazy": true}')
+    (package / 'modules.py').write_text(
+        "from flask import Blueprint\n\n\n"
+        "def register():\n"
+        f"    blueprint = Blueprint({name!r}, __name__, url_prefix='/{name}')\n"
+        f"    blueprint.add_url_rule('/', 'index', lambda: {views!r})\n"
+        "    return blueprint\n"
+    )
+    return package
+
+
+@pytest.fixture
+def lazy_modules(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    for module in [module for module in sys.modules if module.startswith('modules.lazy_blog')]:
+        del sys.modules[module]
+
+
+def test_lazy_modules_are_registered_on_their_first_request(lazy_modules):
+    name = 'lazy_blog'
+    package = write_lazy_module(lazy_modules, name, 'lazy')
+    (package / 'modules.py').write_text('raise ImportError("broken")\n')
+
+    app = ModularFlask(__name__)
+    registry = ModuleRegistry(str(lazy_modules / 'modules'))
+    registry.generation_file = str(lazy_modules / '.modules_generation')
+    registry.register(app, name)
+    app.wsgi_app = ModuleMiddleware(app.wsgi_app, app, registry)
+    client = app.test_client()
+    assert registry.lazy == {f'/{name}': name}
+    assert client.get('/').status_code == 404
+
+    # A failed import is retried on the next request
+    assert client.get(f'/{name}/').status_code == 404
+    assert registry.lazy == {f'/{name}': name}
+    shutil.rmtree(package)
+    write_lazy_module(lazy_modules, name, 'lazy')
+    sys.modules.pop(f'modules.{name}.modules', None)
+    importlib.invalidate_caches()
+
+    response = client.get(f'/{name}/')
+    assert response.status_code == 200 and response.text == 'lazy'
+    assert not registry.lazy and name in registry.loaded
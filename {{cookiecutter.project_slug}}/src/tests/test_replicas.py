@@ -0,0 +1,70 @@
+"""
+Tests of the routing of reads to the read replicas.
+"""
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Integer, String, insert, select
+
+from {{cookiecutter.project_slug}}.extensions.replicas import ReplicaRouter, RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+class Note(db.Model):
+    __tablename__ = 'replica_note'
+
+    id = Column(Integer, primary_key=True)
+    text = Column(String(50))
+
+
+@pytest.fixture
+def app(tmp_path):
+    application = Flask(__name__)
+    application.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+        SQLALCHEMY_BINDS={f'replica_{index}': f"sqlite:///{tmp_path / f'replica_{index}.db'}" for index in range(2)},
+    )
+    db.init_app(application)
+    ReplicaRouter(application)
+    with application.app_context():
+        for key, engine in db.engines.items():
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(insert(Note).values(text=key or 'primary'))
+        yield application
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def read_texts():
+    return db.session.scalars(select(Note.text).order_by(Note.id)).all()
+
+
+def test_selects_go_to_the_replicas_in_turn(app):
+    assert [read_texts() for _ in range(3)] == [['replica_0'], ['replica_1'], ['replica_0']]
+    assert app.extensions['replica_router'].snapshot()['queries'] == {'replica_0': 2, 'replica_1': 1}
+
+
+def test_reads_after_a_write_go_to_the_primary(app):
+    assert read_texts() == ['replica_0']
+
+    db.session.add(Note(text='written'))
+    db.session.flush()
+
+    assert read_texts() == ['primary', 'written']
+    db.session.commit()
+    assert read_texts() == ['primary', 'written']
+
+
+def test_select_for_update_goes_to_the_primary(app):
+    assert db.session.get_bind(clause=select(Note).with_for_update()) is db.engine
+    assert read_texts() == ['primary']
+
+
+def test_use_primary_pins_the_session(app):
+    db.session().use_primary()
+
+    assert read_texts() == ['primary']
+    assert app.extensions['replica_router'].snapshot()['queries'] == {'primary': 1}
@@ -0,0 +1,48 @@
+"""
+Tests of the URL map indexed by blueprint.
+"""
+from flask import Blueprint
+from werkzeug.routing import Rule, Submount
+
+from {{cookiecutter.project_slug}}.registry import remove_blueprint
+from {{cookiecutter.project_slug}}.routing import ModularFlask, RouteMap
+
+
+def test_rules_added_to_an_existing_endpoint_are_indexed():
+    url_map = RouteMap()
+    url_map.add(Rule('/a/p', endpoint='a.e1'))
+    url_map.add(Rule('/a/q', endpoint='a.e2'))
+    url_map.add(Rule('/a/p2', endpoint='a.e1'))
+
+    assert sorted(rule.rule for rule in url_map.blueprint_rules('a')) == ['/a/p', '/a/p2', '/a/q']
+
+
+def test_rule_factories_are_indexed_with_the_bound_rules():
+    url_map = RouteMap()
+    url_map.add(Submount('/b', [Rule('/x', endpoint='b.x'), Rule('/y', endpoint='b.y')]))
+
+    indexed = url_map.blueprint_rules('b')
+    assert [rule.rule for rule in indexed] == ['/b/x', '/b/y']
+    assert all(rule.map is url_map for rule in indexed)
+
+
+def test_remove_blueprint_removes_every_rule():
+    app = ModularFlask(__name__)
+    blueprint = Blueprint('a', __name__, url_prefix='/a')
+
+    def view():
+        return 'ok'
+
+    blueprint.add_url_rule('/p', 'e1', view)
+    blueprint.add_url_rule('/q', 'e2', view)
+    blueprint.add_url_rule('/p2', 'e1', view)
+    app.register_blueprint(blueprint)
+    app.add_url_rule('/other', 'other', view)
+    client = app.test_client()
+    assert client.get('/a/p2').status_code == 200
+
+    remove_blueprint(app, 'a')
+
+    assert [client.get(path).status_code for path in ('/a/p', '/a/q', '/a/p2')] == [404, 404, 404]
+    assert client.get('/other').status_code == 200
+    assert [route['url'] for route in app.url_map.routes() if route['endpoint'] != 'static'] == ['/other']
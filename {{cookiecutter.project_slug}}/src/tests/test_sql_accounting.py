@@ -0,0 +1,86 @@
+"""
+Tests of the SELECT fingerprints aggregated across requests.
+"""
+import json
+import os
+import threading
+
+from database.index_advisor import load_fingerprints
+from {{cookiecutter.project_slug}}.extensions.sql_accounting import FingerprintStore, RequestStats
+
+STATEMENT = 'SELECT person.id FROM person WHERE person.email = ?'
+
+
+def request_stats(*durations):
+    stats = RequestStats()
+    for elapsed in durations:
+        stats.record(STATEMENT, elapsed, ('someone@example.com',))
+    return stats
+
+
+def test_concurrent_flushes_do_not_fail(tmp_path):
+    store = FingerprintStore(str(tmp_path), flush_interval=0)
+    errors = []
+
+    def serve():
+        for _ in range(200):
+            try:
+                store.add(request_stats(0.001))
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+
+    threads = [threading.Thread(target=serve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.flush()
+
+    assert not errors
+    files = [path.name for path in tmp_path.iterdir()]
+    assert len(files) == 1 and files[0].endswith('.json')
+    entry, = json.loads((tmp_path / files[0]).read_text())['fingerprints'].values()
+    assert entry['count'] == 1600
+    assert entry['parameters'] == ['str']
+
+
+def test_max_ms_is_the_slowest_execution(tmp_path):
+    store = FingerprintStore(str(tmp_path), flush_interval=3600)
+    store.add(request_stats(0.001, 0.001, 0.010))
+    store.add(request_stats(0.004))
+    store.flush()
+
+    entry, = json.loads(next(tmp_path.iterdir()).read_text())['fingerprints'].values()
+    assert entry['count'] == 4
+    assert round(entry['total_ms'], 3) == 16.0
+    assert round(entry['max_ms'], 3) == 10.0
+
+
+def test_failed_flush_is_not_raised(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    store = FingerprintStore(str(blocker / 'fingerprints'), flush_interval=0)
+
+    store.add(request_stats(0.001))
+
+    assert store.flush() is False
+
+
+def test_stale_fingerprint_files_are_removed(tmp_path):
+    store = FingerprintStore(str(tmp_path), flush_interval=3600)
+    store.add(request_stats(0.001))
+    store.flush()
+    current, = tmp_path.iterdir()
+    assert current.name.startswith(f'{os.getpid()}-')
+    stale = tmp_path / '1234-1000.json'
+    stale.write_text(current.read_text())
+    leftover = tmp_path / '1234-1000.json.1.tmp'
+    leftover.write_text('{')
+    for path in (stale, leftover):
+        os.utime(path, (1000, 1000))
+
+    entry, = load_fingerprints(str(tmp_path), max_age=3600).values()
+
+    assert entry['count'] == 1
+    assert [path.name for path in tmp_path.iterdir()] == [current.name]
+    assert load_fingerprints(str(tmp_path / 'missing'), max_age=3600) == {}
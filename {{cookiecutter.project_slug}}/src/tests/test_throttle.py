@@ -0,0 +1,58 @@
+"""
+Tests of the sign in throttling buckets.
+"""
+import time
+
+from {{cookiecutter.project_slug}}.extensions.throttle import LoginThrottle, MemoryBuckets
+
+
+def test_attempts_past_the_burst_are_rejected():
+    throttle = LoginThrottle()
+    throttle.ip_burst = 3
+
+    waits = [throttle.check('10.0.0.1', f'user{index}@example.com') for index in range(4)]
+
+    assert waits[:3] == [0, 0, 0] and waits[3] > 0
+    assert throttle.check('10.0.0.2', 'user0@example.com') == 0
+    assert throttle.snapshot()['rejected_ip'] == 1
+
+
+def test_the_buckets_are_bounded_without_rescanning():
+    buckets = MemoryBuckets(max_keys=1000)
+    started = time.perf_counter()
+    for index in range(20000):
+        buckets.take(f'ip:{index}', 20, 10 / 60)
+    elapsed = time.perf_counter() - started
+
+    assert len(buckets._buckets) == 1000  # pylint: disable=protected-access
+    # A rescan of the buckets on every attempt takes seconds here
+    assert elapsed < 1
+
+
+def test_buckets_are_refilled_by_their_own_rate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    buckets = MemoryBuckets(max_keys=10)
+    buckets.take('ip:10.0.0.1', 20, 1.0)
+    for _ in range(2):
+        buckets.take('account:a', 2, 0.001)
+
+    now[0] += 30
+    # The IP bucket is full again and dropped, the drained account bucket is kept
+    buckets.take('ip:10.0.0.2', 20, 1.0)
+
+    assert list(buckets._buckets) == ['account:a', 'ip:10.0.0.2']  # pylint: disable=protected-access
+    assert buckets.take('account:a', 2, 0.001) > 0
+{% if cookiecutter.use_swagger == 'y' %}
+
+def test_swagger_basic_auth_is_throttled(app, client, make_user):
+    make_user('alice@example.com')
+    app.extensions['login_throttle'].account_burst = 2
+
+    assert client.get('/apispec_1.json').status_code == 401
+    assert client.get('/apispec_1.json', auth=('alice@example.com', 'secret')).status_code == 200
+    statuses = [client.get('/apispec_1.json', auth=('alice@example.com', 'guess')).status_code for _ in range(2)]
+    response = client.get('/apispec_1.json', auth=('alice@example.com', 'secret'))
+
+    assert statuses == [401, 429]
+    assert response.status_code == 429 and int(response.headers['Retry-After']) > 0{% endif %}
@@ -0,0 +1,65 @@
+"""
+Tests of the user endpoints.
+"""
+import json
+
+from {{cookiecutter.project_slug}}.extensions import db
+from modules.users.models import User
+
+
+def stored_password(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).password
+
+
+def test_login_rehashes_a_password_hashed_with_older_parameters(app, client, make_user):
+    hasher = app.extensions['password_hasher']
+    hasher.method = 'pbkdf2:sha256:1000'
+    user_id = make_user('carol@example.com')
+    hasher.method = 'pbkdf2:sha256:2000'
+    rehashes = hasher.snapshot()['rehashes']
+
+    wrong = client.post('/users/login/', data={'email': 'carol@example.com', 'password': 'guess'})
+    assert wrong.status_code == 401
+    assert stored_password(app, user_id).startswith('pbkdf2:sha256:1000$')
+
+    response = client.post('/users/login/', data={'email': 'carol@example.com', 'password': 'secret'})
+
+    assert response.status_code == 302
+    assert stored_password(app, user_id).startswith('pbkdf2:sha256:2000$')
+    assert hasher.snapshot()['rehashes'] == rehashes + 1
+    assert client.post('/users/login/', data={'email': 'carol@example.com', 'password': 'secret'}).status_code == 302
+    assert hasher.snapshot()['rehashes'] == rehashes + 1
+
+
+def test_users_are_listed_by_pages(client, make_user):
+    user_ids = {make_user(f'user{index}@example.com') for index in range(5)}
+
+    pages, after = [], None
+    while True:
+        query = {'limit': 2, **({'after': after} if after else {})}
+        response = client.get('/users/all/', query_string=query)
+        assert response.status_code == 200
+        pages.append([user['_id'] for user in response.json['users']])
+        after = response.json['next_cursor']
+        if after is None:
+            break
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert {user_id for page in pages for user_id in page} == user_ids
+
+
+def test_an_invalid_cursor_or_limit_is_rejected(client):
+    for query in ({'after': 'not-a-cursor'}, {'after': 'WyJ4IiwgMV0='}, {'limit': 0}, {'limit': 'ten'}):
+        assert client.get('/users/all/', query_string=query).status_code == 400
+
+
+def test_users_are_streamed_as_ndjson(client, make_user):
+    user_ids = {make_user(f'user{index}@example.com') for index in range(3)}
+
+    response = client.get('/users/all/', query_string={'stream': 'true'})
+
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    users = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert {user['_id'] for user in users} == user_ids
+    assert {user['email'] for user in users} == {f'user{index}@example.com' for index in range(3)}
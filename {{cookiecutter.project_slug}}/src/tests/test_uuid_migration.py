@@ -0,0 +1,59 @@
+"""
+Tests of UUIDType and the conversion of string UUID columns.
+"""
+import uuid
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Column, ForeignKey, MetaData, String, Table, create_engine, insert, select
+from sqlalchemy.dialects import mssql, sqlite
+from sqlalchemy.exc import StatementError
+
+from database.core import UUIDType, is_uuid
+from database.uuid_migration import UUIDMigrationError, check_dialect, convert_uuid_columns, pending_columns
+
+
+def make_tables(metadata, id_type):
+    parent = Table('parent', metadata, Column('id', id_type, primary_key=True))
+    child = Table('child', metadata, Column('id', id_type, primary_key=True),
+                  Column('parent_id', id_type, ForeignKey('parent.id')))
+    return parent, child
+
+
+def test_convert_uuid_columns_on_sqlite(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'uuids.db'}")
+    old_parent, old_child = make_tables(MetaData(), String(36))
+    old_parent.metadata.create_all(engine)
+    parent_id, child_id = str(uuid.uuid4()), str(uuid.uuid4())
+    with engine.begin() as connection:
+        connection.execute(insert(old_parent).values(id=parent_id))
+        connection.execute(insert(old_child).values(id=child_id, parent_id=parent_id))
+
+    metadata = MetaData()
+    parent, child = make_tables(metadata, UUIDType())
+    with engine.begin() as connection:
+        converted = convert_uuid_columns(Operations(MigrationContext.configure(connection)), metadata)
+
+    assert converted == ['parent.id', 'child.id', 'child.parent_id']
+    assert pending_columns(engine, metadata) == []
+    with engine.connect() as connection:
+        assert connection.execute(select(child.c.parent_id).where(child.c.id == child_id)).scalar() == parent_id
+    engine.dispose()
+
+
+def test_unsupported_dialects_are_rejected():
+    check_dialect(sqlite.dialect())
+    with pytest.raises(UUIDMigrationError):
+        check_dialect(mssql.dialect())
+
+
+def test_malformed_ids_are_not_bound_as_null():
+    engine = create_engine('sqlite://')
+    table = Table('item', MetaData(), Column('id', UUIDType(), primary_key=True))
+    table.metadata.create_all(engine)
+
+    assert not is_uuid('1; DROP TABLE item')
+    assert is_uuid(str(uuid.uuid4()))
+    with engine.connect() as connection, pytest.raises(StatementError):
+        connection.execute(select(table).where(table.c.id == 'not-a-uuid'))
@@ -1,43 +1,67 @@
-import importlib
+import json
 import os
+import time
 
 import click
-from flask import Flask
 from flask.cli import AppGroup
-from sqlalchemy_utils import create_database, database_exists
 
 from database.auto_discover_models import auto_load_models
+from database.index_advisor import advise_indexes, load_fingerprints, render_migration, write_migration
+from database.loaders import LOADERS
+from database.pool import pool_metrics
+from database.provision import ensure_database, provision_database
 from database.seeder import seed_database
-from modules.manager.models import Module
+from database.uuid_migration import UUIDMigrationError, check_dialect, pending_columns
+from database.uuid_migration import write_migration as write_uuid_migration
 from modules.manager.views import create_module
 
 
 from . import views
-from .config import Config
+from .config import get_config
 from .extensions import (
     {% if cookiecutter.use_celery == 'y' %}celery,{% endif %}
+    audit_log,
     cors,
     db,
+    identity_cache,
     migrate,
     {% if cookiecutter.use_swagger == 'y' %}swagger,{% endif %}
     {% if cookiecutter.use_email_service == 'y' %}mail,{% endif %}
     {% if cookiecutter.use_cloud_storage == 'y' %}s3,{% endif %}
     {% if cookiecutter.authentication_type == "Firebase" %}firebase,{% endif %}
     login_manager,
+    login_throttle,
+    password_hasher,
+    replicas,
+    sql_accounting,
     )
+{% if cookiecutter.use_swagger == 'y' %}from .extensions.flasgger import requires_basic_auth{% endif %}
+from .profiling import StartupProfiler, format_report, profile_startup
+from .registry import ModuleRegistry
+from .routing import ModularFlask
 
 
-def create_app(config_class=Config):
-    app = Flask(__name__, root_path=os.path.join(os.getcwd()),
-                instance_relative_config=True)
-    app.config.from_object(config_class)
-    app.config.from_pyfile('config.py', silent=True)
+def create_app(config_class=None):
+    started = time.perf_counter()
+    profiler = StartupProfiler()
 
-    db.init_app(app)
+    with profiler.phase('config'):
+        app = ModularFlask(__name__, root_path=os.path.join(os.getcwd()),
+                           instance_relative_config=True)
+        app.config.from_object(config_class or get_config())
+        app.config.from_pyfile('config.py', silent=True)
+    app.extensions['startup_profiler'] = profiler
 
-    if not database_exists(app.config['SQLALCHEMY_DATABASE_URI']):
-        print("db not exist. Creating..")
-        create_database(app.config['SQLALCHEMY_DATABASE_URI'])
+    with profiler.phase('pool_metrics.init_app'):
+        # Selects the metered pool class, so it must come before db.init_app
+        pool_metrics.init_app(app)
+    with profiler.phase('db.init_app'):
+        db.init_app(app)
+    with profiler.phase('replicas.init_app'):
+        replicas.init_app(app)
+
+    with profiler.phase('ensure_database'):
+        ensure_database(app)
 
     # Inpired from Django's installed_apps. Register when you develop a new module
     # Uploaded modules don't need to be registered here; they will be loaded automatically when enabled in the manager.
@@ -46,46 +70,151 @@ def create_app(config_class=Config):
         'users',
     ]
 
-    load_modules(app, installed_apps)
+    with profiler.phase('load_modules'):
+        load_modules(app, installed_apps)
+
+    with profiler.phase('sql_accounting.init_app'):
+        sql_accounting.init_app(app)
+
+    with profiler.phase('audit_log.init_app'):
+        audit_log.init_app(app)
 
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['STATIC_PATH'], exist_ok=True)
-    os.makedirs('logs', exist_ok=True)
+    with profiler.phase('makedirs'):
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['STATIC_PATH'], exist_ok=True)
+        os.makedirs('logs', exist_ok=True)
 
-    migrate.init_app(app, db)
-    cors.init_app(app, resources={r"/*": {"origins": app.config['ALLOWED_ORIGINS']}})
+    with profiler.phase('migrate.init_app'):
+        migrate.init_app(app, db)
+    with profiler.phase('cors.init_app'):
+        cors.init_app(app, resources={r"/*": {"origins": app.config['ALLOWED_ORIGINS']}})
 
-    {% if cookiecutter.use_swagger == 'y' %}swagger.init_app(app){% endif %}
+    {% if cookiecutter.use_swagger == 'y' %}with profiler.phase('swagger.init_app'):
+        swagger.init_app(app, decorators=[requires_basic_auth]){% endif %}
     {% if cookiecutter.use_celery == 'y' %}# Initialize Celery
-    celery.conf.update(app.config){% endif %}
+    with profiler.phase('celery.conf'):
+        celery.conf.update(app.config){% endif %}
 
     {% if cookiecutter.use_cloud_storage == 'y' %}# Initialize the S3 extension
-    s3.init_app(app){% endif %}
+    with profiler.phase('s3.init_app'):
+        s3.init_app(app){% endif %}
     {% if cookiecutter.use_email_service == 'y' %}# Initialize the Mail
-    mail.init_app(app){% endif %}
+    with profiler.phase('mail.init_app'):
+        mail.init_app(app){% endif %}
     # initialize the login manager
-    login_manager.init_app(app)
+    with profiler.phase('login_manager.init_app'):
+        login_manager.init_app(app)
+    with profiler.phase('identity_cache.init_app'):
+        identity_cache.init_app(app)
+    with profiler.phase('password_hasher.init_app'):
+        password_hasher.init_app(app)
+    with profiler.phase('login_throttle.init_app'):
+        login_throttle.init_app(app)
 
-    {% if cookiecutter.authentication_type == "Firebase" %}firebase.init_app(app){% endif %}
+    {% if cookiecutter.authentication_type == "Firebase" %}with profiler.phase('firebase.init_app'):
+        firebase.init_app(app){% endif %}
 
-    app.register_blueprint(views.bp)
+    with profiler.phase('register_blueprints'):
+        app.register_blueprint(views.bp)
     # app.register_blueprint(module_blueprint, url_prefix='/module')
 
     seed_cli = AppGroup('database')
     generate_module = AppGroup("module")
+    perf_cli = AppGroup('perf')
 
     # Flask CLI command
     @seed_cli.command('seed')
     @click.option('--replace', is_flag=True, help='Clear existing data before seeding.')
-    def run_seed(replace):
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows inserted per statement and commit.')
+    @click.option('--restart', is_flag=True, help='Ignore saved checkpoints and seed from the start.')
+    @click.option('--engine', type=click.Choice(LOADERS), default='auto', show_default=True,
+                  help='Loader: COPY on PostgreSQL, batched executemany elsewhere.')
+    @click.option('--workers', type=int, help='Tables loaded concurrently. Defaults to the connection pool size.')
+    def run_seed(replace, chunk_size, restart, engine, workers):
         """
         Run the database seeder.
 
         Args:
             replace (bool): If True, clear existing data before seeding.
+            chunk_size (int): Rows inserted per statement and commit.
+            restart (bool): If True, ignore saved checkpoints.
+            engine (str): The loader used to write the rows.
+            workers (int): Tables loaded concurrently.
+        """
+        seed_database(replace=replace, chunk_size=chunk_size, restart=restart, engine=engine, workers=workers)
+
+    @seed_cli.command('provision')
+    def run_provision():
+        """
+        Create the database if it does not exist and mark it ready.
+        """
+        if provision_database(app):
+            print("Database created.")
+        else:
+            print("Database already exists.")
+
+    @seed_cli.command('migrate-uuids')
+    @click.option('--message', default='convert string ids to UUID columns', show_default=True,
+                  help='Message of the migration.')
+    def run_migrate_uuids(message):
+        """
+        Write a migration converting the string UUID columns of existing tables to native UUID or 16-byte binary.
+
+        Args:
+            message (str): Message of the migration.
         """
-        seed_database(replace=replace)
+        try:
+            check_dialect(db.engine.dialect)
+        except UUIDMigrationError as e:
+            raise click.ClickException(str(e)) from e
+        pending = pending_columns(db.engine, db.metadata)
+        if not pending:
+            print("No UUID columns to convert.")
+            return
+        print(f"{len(pending)} columns to convert: {', '.join(f'{table}.{column}' for table, column in pending)}")
+        config = migrate.get_config()
+        if not os.path.isdir(config.get_main_option('script_location')):
+            raise click.ClickException("No migrations directory, run `flask db init` to write the migration.")
+        print(f"Migration written to {write_uuid_migration(config, message)}, apply it with `flask db upgrade`.")
+
+    @seed_cli.command('advise-indexes')
+    @click.option('--limit', default=20, show_default=True, help='Number of slowest statements explained.')
+    @click.option('--dry-run', is_flag=True, help='Print the proposed indexes without writing a migration.')
+    @click.option('--message', default='add indexes proposed by advise-indexes', show_default=True,
+                  help='Message of the migration.')
+    def run_advise_indexes(limit, dry_run, message):
+        """
+        Propose indexes for the slowest captured queries and write them as a migration.
+
+        Args:
+            limit (int): Number of slowest statements explained.
+            dry_run (bool): If True, only print the proposed indexes.
+            message (str): Message of the migration.
+        """
+        if sql_accounting.fingerprints is not None:
+            sql_accounting.fingerprints.flush()
+        folder = app.config.get('SQL_FINGERPRINTS_FOLDER') or os.path.join(app.instance_path, 'query_fingerprints')
+        fingerprints = load_fingerprints(folder, app.config.get('SQL_FINGERPRINTS_MAX_AGE'))
+        if not fingerprints:
+            print(f"No query fingerprints in {folder}. Enable SQL_FINGERPRINTS and serve some traffic first.")
+            return
+        advice = advise_indexes(db.engine, db.metadata, fingerprints, limit=limit)
+        if not advice:
+            print(f"No missing index found in the {min(limit, len(fingerprints))} slowest statements.")
+            return
+        for item in advice:
+            print(f"{item.name} on {item.table}({', '.join(item.columns)}): {item.reason}, "
+                  f"{item.count} executions, {item.total_ms:.1f}ms total")
+            print(f"    {' '.join(item.statement.split())[:200]}")
+        config = migrate.get_config()
+        if dry_run or not os.path.isdir(config.get_main_option('script_location')):
+            upgrades, _ = render_migration(advice)
+            print('\n'.join(line.strip() for line in upgrades.splitlines()))
+            if not dry_run:
+                print("No migrations directory, run `flask db init` to write the migration.")
+            return
+        print(f"Migration written to {write_migration(config, advice, message)}")
 
     @seed_cli.command('auto_discover')
     def run_auto_load_models():
@@ -105,9 +234,37 @@ def create_app(config_class=Config):
         """
         create_module(name)
 
+    @perf_cli.command('startup')
+    @click.option('--format', 'output_format', type=click.Choice(['text', 'json']), default='text',
+                  help='Report format.')
+    @click.option('--output', type=click.Path(dir_okay=False), help='Write the report to a file.')
+    @click.option('--limit', default=20, show_default=True, help='Number of packages listed in the text report.')
+    def run_startup_profile(output_format, output, limit):
+        """
+        Profile create_app phase by phase in a fresh interpreter.
+
+        Args:
+            output_format (str): Either 'text' or 'json'.
+            output (str): Optional path of the file to write the report to.
+            limit (int): Number of packages listed in the text report.
+        """
+        report = profile_startup(app.import_name)
+        if output_format == 'json':
+            content = json.dumps(report, indent=4)
+        else:
+            content = format_report(report, limit=limit)
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(content + "\n")
+        click.echo(content)
+
     app.cli.add_command(seed_cli)
     app.cli.add_command(generate_module)
+    app.cli.add_command(perf_cli)
 
+    profiler.timings['create_app'] = time.perf_counter() - started
+    if app.debug:
+        profiler.report()
     return app
 
 
@@ -115,32 +272,18 @@ def load_modules(app, installed_apps=None):
     """
     Loads modules from the 'modules' directory and registers them with the Flask app.
 
+    Enabled modules are resolved with a single query and each module is imported once.
+    The registry is kept in `app.extensions['module_registry']`.
+
     Args:
         app (Flask): The Flask application instance.
         installed_apps (list): A list of installed app names. Defaults to an empty list.
 
     Returns:
-        None
+        ModuleRegistry: The registry holding the loaded modules.
     """
-    modules_dir = 'modules'
-
-    if installed_apps is not None:
-        for module_name in installed_apps:
-            try:
-                module = importlib.import_module(f'modules.{module_name}.modules')
-                if hasattr(module, 'register'):
-                    app.register_blueprint(module.register())
-                    importlib.reload(module)
-            except Exception as e:
-                print(e)
-
-    for module_name in os.listdir(modules_dir):
-        module_path = os.path.join(modules_dir, module_name)
-        with app.app_context():
-            if os.path.isdir(module_path) and os.path.exists(os.path.join(module_path, '__init__.py')):
-                module_entry = Module.query.filter_by(name=module_name, enabled=True).first()
-                if module_entry:
-                    module = importlib.import_module(f'modules.{module_name}.modules')
-                    if hasattr(module, 'register'):
-                        app.register_blueprint(module.register())
-                        importlib.reload(module)
+    registry = ModuleRegistry('modules', app.extensions.get('startup_profiler'))
+    registry.load(app, installed_apps)
+    registry.report()
+    app.extensions['module_registry'] = registry
+    return registry
@@ -4,9 +4,7 @@ Instance-specific configurations for the Flask application.
 import ast
 import os
 import pytz
-{% if cookiecutter.use_swagger == 'y' %}
-from {{ cookiecutter.project_slug }}.extensions.flasgger import requires_basic_auth, requires_bearer_auth
-{% endif %}
+
 
 class Config:
     """
@@ -50,6 +48,94 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///default.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Set to False when the database is provisioned with `flask database provision`, the default in production
+    DATABASE_CHECK_ON_BOOT = ast.literal_eval(
+        os.getenv('DATABASE_CHECK_ON_BOOT', 'True'))
+    DATABASE_READY_MARKER = os.getenv('DATABASE_READY_MARKER')
+    # Read replicas, comma separated URIs; read-only queries are spread over them
+    DATABASE_REPLICA_URIS = [uri.strip() for uri in os.getenv('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+    SQLALCHEMY_BINDS = {f'replica_{index}': uri for index, uri in enumerate(DATABASE_REPLICA_URIS)}
+    # round_robin or least_loaded (fewest checked out connections)
+    DATABASE_REPLICA_STRATEGY = os.getenv('DATABASE_REPLICA_STRATEGY', 'round_robin')
+    # Connection pool, see https://docs.sqlalchemy.org/en/20/core/pooling.html
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': ast.literal_eval(
+            os.getenv('DATABASE_POOL_PRE_PING', 'True')),
+        'pool_recycle': int(os.getenv('DATABASE_POOL_RECYCLE', '1800')),
+    }
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.getenv('DATABASE_POOL_SIZE', '5')),
+            max_overflow=int(os.getenv('DATABASE_MAX_OVERFLOW', '10')),
+            pool_timeout=float(os.getenv('DATABASE_POOL_TIMEOUT', '30')),
+        )
+
+    # Per-request SQL accounting: Server-Timing header, slow request and N+1 logs
+    SQL_ACCOUNTING = ast.literal_eval(
+        os.getenv('SQL_ACCOUNTING', 'True'))
+    SERVER_TIMING = ast.literal_eval(
+        os.getenv('SERVER_TIMING', 'True'))
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '500'))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', '5'))
+    # SELECT fingerprints read by `flask database advise-indexes`, defaults to instance/query_fingerprints
+    SQL_FINGERPRINTS = ast.literal_eval(
+        os.getenv('SQL_FINGERPRINTS', 'True'))
+    SQL_FINGERPRINTS_FOLDER = os.getenv('SQL_FINGERPRINTS_FOLDER')
+    SQL_FINGERPRINTS_FLUSH_INTERVAL = float(os.getenv('SQL_FINGERPRINTS_FLUSH_INTERVAL', '30'))
+    # Files older than this (seconds) are removed by `flask database advise-indexes`
+    SQL_FINGERPRINTS_MAX_AGE = float(os.getenv('SQL_FINGERPRINTS_MAX_AGE', '604800'))
+
+    # Audit log rows are queued and inserted in batches by a background thread
+    AUDIT_LOG_ASYNC = ast.literal_eval(
+        os.getenv('AUDIT_LOG_ASYNC', 'True'))
+    AUDIT_LOG_QUEUE_SIZE = int(os.getenv('AUDIT_LOG_QUEUE_SIZE', '10000'))
+    AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '500'))
+    AUDIT_LOG_RETRIES = int(os.getenv('AUDIT_LOG_RETRIES', '3'))
+
+    # Snapshots of the logged in users, per process and optionally in Redis across workers
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '30'))
+    USER_CACHE_REDIS_URL = os.getenv('USER_CACHE_REDIS_URL')
+    USER_CACHE_SHARED_TTL = float(os.getenv('USER_CACHE_SHARED_TTL', '300'))
+    # Invalidation marker shared by the workers of a host when USER_CACHE_REDIS_URL is not set
+    USER_CACHE_GENERATION_FILE = os.getenv('USER_CACHE_GENERATION_FILE')
+
+    # Password hashing runs in a process pool; stored hashes with other parameters are replaced on login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha512')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '0'))
+    # The interpreter of the hashing processes, required under uWSGI where sys.executable is uwsgi
+    PASSWORD_HASH_PYTHON = os.getenv('PASSWORD_HASH_PYTHON')
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '5'))
+
+    # Sign in attempts per client IP and per account: burst, then attempts regained per minute
+    LOGIN_THROTTLE = ast.literal_eval(
+        os.getenv('LOGIN_THROTTLE', 'True'))
+    # memory (per process) or redis (shared by the workers, uses REDIS_URL)
+    LOGIN_THROTTLE_BACKEND = os.getenv('LOGIN_THROTTLE_BACKEND', 'memory')
+    LOGIN_THROTTLE_IP_BURST = int(os.getenv('LOGIN_THROTTLE_IP_BURST', '20'))
+    LOGIN_THROTTLE_IP_RATE = float(os.getenv('LOGIN_THROTTLE_IP_RATE', '10'))
+    LOGIN_THROTTLE_ACCOUNT_BURST = int(os.getenv('LOGIN_THROTTLE_ACCOUNT_BURST', '10'))
+    LOGIN_THROTTLE_ACCOUNT_RATE = float(os.getenv('LOGIN_THROTTLE_ACCOUNT_RATE', '5'))
+
+    # Modules
+    # Shared by every worker on the host; enabling/disabling a module bumps it
+    MODULES_GENERATION_FILE = os.getenv('MODULES_GENERATION_FILE')
+    MODULES_RELOAD_INTERVAL = float(os.getenv('MODULES_RELOAD_INTERVAL', '1.0'))
+    # Module uploads
+    MODULE_INSTALL_BACKEND = os.getenv('MODULE_INSTALL_BACKEND', '{% if cookiecutter.use_celery == 'y' %}celery{% else %}thread{% endif %}')
+    MODULE_MAX_UPLOAD_SIZE = int(os.getenv('MODULE_MAX_UPLOAD_SIZE', str(50 * 1024 * 1024)))
+    MODULE_MAX_UNCOMPRESSED_SIZE = int(os.getenv('MODULE_MAX_UNCOMPRESSED_SIZE', str(200 * 1024 * 1024)))
+    MODULE_MAX_COMPRESSION_RATIO = int(os.getenv('MODULE_MAX_COMPRESSION_RATIO', '100'))
+    MODULE_MAX_FILES = int(os.getenv('MODULE_MAX_FILES', '2000'))
+    MODULE_ARTIFACT_STORE = os.path.abspath(
+        os.getenv('MODULE_ARTIFACT_STORE', os.path.join(UPLOAD_FOLDER, 'artifacts')))
+    # Extracted archives kept per module in the artifact store
+    MODULE_ARTIFACT_KEEP = int(os.getenv('MODULE_ARTIFACT_KEEP', '3'))
+    # Seconds the status of a finished install job can still be read
+    MODULE_JOB_RETENTION = int(os.getenv('MODULE_JOB_RETENTION', '86400'))
+    # Bounds every request body before it is parsed, leaving room for the multipart envelope of an upload
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(MODULE_MAX_UPLOAD_SIZE + 1024 * 1024)))
 {% if cookiecutter.use_email_service == 'y' %}
     email_enable = ast.literal_eval(
         os.getenv('EMAIL_ENABLE', 'False'))
@@ -76,6 +162,8 @@ class Config:
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'){% endif %}
 {% if cookiecutter.use_swagger == 'y' %}
+    # The Swagger UI and specs require the credentials of a user, throttled like sign in attempts
+    SWAGGER_BASIC_AUTH = ast.literal_eval(os.getenv('SWAGGER_BASIC_AUTH', 'True'))
     SWAGGER = {
         "openapi": "3.0.2",
         "info": {
@@ -108,4 +196,45 @@ class Config:
     GOOGLE_CREDENTIALS_FILEPATH = os.getenv(
         "GOOGLE_CREDENTIALS_FILEPATH",
         default=DEFAULT_GOOGLE_SDK_FILEPATH)
+    # Verified ID tokens cached until they expire, signing certificates refreshed in the background
+    FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv('FIREBASE_TOKEN_CACHE_SIZE', '4096'))
+    FIREBASE_CERTS_REFRESH_INTERVAL = float(os.getenv('FIREBASE_CERTS_REFRESH_INTERVAL', '3600'))
 {% endif %}
+
+class ProductionConfig(Config):
+    """
+    Configuration settings for production deployments.
+
+    The database is provisioned on deploy with `flask database provision`, so
+    workers do not check it when they boot. SELECT fingerprints are only
+    written when `SQL_FINGERPRINTS` is enabled explicitly.
+    """
+    DATABASE_CHECK_ON_BOOT = ast.literal_eval(
+        os.getenv('DATABASE_CHECK_ON_BOOT', 'False'))
+    SQL_FINGERPRINTS = ast.literal_eval(
+        os.getenv('SQL_FINGERPRINTS', 'False'))
+
+
+CONFIGS = {
+    'development': Config,
+    'production': ProductionConfig,
+}
+
+
+def get_config(name=None):
+    """
+    Returns the configuration class of an environment.
+
+    Args:
+        name (str): 'development' or 'production', defaults to the `APP_CONFIG` environment variable.
+
+    Returns:
+        type: The configuration class.
+
+    Raises:
+        ValueError: If the environment is unknown.
+    """
+    name = name or os.getenv('APP_CONFIG', 'development')
+    if name not in CONFIGS:
+        raise ValueError(f"Unknown APP_CONFIG {name}, expected one of {', '.join(CONFIGS)}.")
+    return CONFIGS[name]
@@ -7,16 +7,28 @@ from flask_sqlalchemy import SQLAlchemy
 {% if cookiecutter.use_cloud_storage == 'y' %}from .s3 import S3Storage{% endif %}
 {% if cookiecutter.authentication_type == "Firebase" %}from .firebase import Firebase{% endif %}
 from flask_login import LoginManager
+from .audit import AuditLog
+from .identity_cache import IdentityCache
 from .jwt import JWTToken
+from .passwords import PasswordHasher
+from .replicas import ReplicaRouter, RoutingSession
+from .sql_accounting import SQLAccounting
+from .throttle import LoginThrottle
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 cors = CORS()
-celery = Celery(__name__, broker='')
+celery = Celery(__name__, broker='', include=['modules.manager.installer'])
 {% if cookiecutter.use_swagger == 'y' %}swagger = Swagger(){% endif %}
 {% if cookiecutter.use_email_service == 'y' %}mail = Mail(){% endif %}
 {% if cookiecutter.use_cloud_storage == 'y' %}s3 = S3Storage(){% endif %}
 {% if cookiecutter.authentication_type == "Firebase" %}firebase = Firebase(){% endif %}
 login_manager = LoginManager()
 jwt = JWTToken()
+replicas = ReplicaRouter()
+sql_accounting = SQLAccounting()
+audit_log = AuditLog()
+identity_cache = IdentityCache()
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
@@ -0,0 +1,223 @@
+"""
+This module writes audit log rows in the background.
+
+AuditLog buffers rows in a bounded in-process queue, drained by a daemon
+thread that inserts them in batches: the rows queued while a batch is being
+written are inserted together, up to `AUDIT_LOG_BATCH_SIZE`, so batches grow
+with the load without delaying rows when idle. Rows are inserted on their own
+connection, so writing an audit row never commits the caller's session, and
+requests no longer wait for the audit transaction.
+
+When the queue is full, the row is written synchronously instead, and the
+caller is slowed down until the writer catches up. Such writes are counted as
+backpressure in the metrics. The queue is flushed when the process exits. With
+`AUDIT_LOG_ASYNC` disabled, every row is written synchronously.
+
+A batch failing on a transient database error, such as a lost connection, is
+retried up to `AUDIT_LOG_RETRIES` times with an exponential backoff. A batch
+that still fails is written row by row, so only the rows the database rejects
+are lost: each of them is logged with its values and counted as failed.
+
+Classes:
+    AuditLog: A Flask extension writing audit rows in batches.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+_STOP = object()
+
+
+class AuditLog:
+    """
+    A Flask extension writing audit rows in batches from a background thread.
+
+    Attributes:
+        asynchronous (bool): Whether rows are queued, or written right away.
+        queue_size (int): The maximum number of queued rows.
+        batch_size (int): The maximum number of rows inserted at once.
+        retries (int): The number of times a batch is retried on a transient error.
+        retry_delay (float): The seconds to wait before the first retry, doubled on each retry.
+    """
+
+    def __init__(self, app=None):
+        self.asynchronous = True
+        self.queue_size = 10000
+        self.batch_size = 500
+        self.retries = 3
+        self.retry_delay = 0.5
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._max_depth = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the configuration and registers the shutdown flush.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.asynchronous = app.config.get('AUDIT_LOG_ASYNC', self.asynchronous)
+        self.queue_size = app.config.get('AUDIT_LOG_QUEUE_SIZE', self.queue_size)
+        self.batch_size = app.config.get('AUDIT_LOG_BATCH_SIZE', self.batch_size)
+        self.retries = app.config.get('AUDIT_LOG_RETRIES', self.retries)
+        self._app = app
+        app.extensions['audit_log'] = self
+        app.extensions.setdefault('metrics', {})['audit_log'] = self.snapshot
+        atexit.register(self.close)
+
+    def write(self, table, row):
+        """
+        Queues a row, or writes it right away when the queue is full or disabled.
+
+        Args:
+            table (Table): The table of the row.
+            row (dict): The column values.
+        """
+        if not self.asynchronous:
+            self._insert(current_app.extensions['sqlalchemy'].engine, [(table, row)])
+            self._count(written=1, sync_writes=1)
+            return
+        pending = self._start()
+        try:
+            pending.put_nowait((table, row))
+        except queue.Full:
+            self._insert(current_app.extensions['sqlalchemy'].engine, [(table, row)])
+            self._count(written=1, sync_writes=1, backpressure=1)
+            return
+        depth = pending.qsize()
+        with self._lock:
+            self._counts['queued'] += 1
+            self._max_depth = max(self._max_depth, depth)
+
+    def flush(self, timeout=None):
+        """
+        Waits until the rows queued so far are written.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait, None to wait until done.
+
+        Returns:
+            bool: True if the rows were written in time.
+        """
+        if not self._running():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """
+        Writes the queued rows and stops the background thread.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait for the writer.
+        """
+        if not self._running():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def snapshot(self):
+        """
+        Returns the counters since the application started.
+
+        Returns:
+            dict: The queued, written and failed rows, the batches, the retries, the
+            batches written row by row, the synchronous and backpressure writes,
+            and the current and maximum queue depths.
+        """
+        with self._lock:
+            data = {key: self._counts[key] for key in
+                    ('queued', 'written', 'failed', 'batches', 'retries', 'split_batches', 'sync_writes',
+                     'backpressure')}
+            data['max_depth'] = self._max_depth
+        data['depth'] = self._queue.qsize() if self._running() else 0
+        return data
+
+    def _running(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _start(self):
+        with self._lock:
+            # A forked worker does not inherit the thread of its parent
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(self.queue_size)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._app, self._queue), name='audit-log', daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _run(self, app, pending):
+        with app.app_context():
+            engine = app.extensions['sqlalchemy'].engine
+        batch = []
+        while True:
+            item = pending.get()
+            if isinstance(item, tuple):
+                batch.append(item)
+                # Rows queued while the previous batch was written go together
+                if len(batch) < self.batch_size and not pending.empty():
+                    continue
+            if batch:
+                self._write_batch(app, engine, batch)
+                batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def _write_batch(self, app, engine, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                self._insert(engine, batch)
+            except Exception as e:  # pylint: disable=broad-except
+                if attempt == self.retries or not _transient(e):
+                    app.logger.warning(f"Could not write {len(batch)} audit log rows, writing them one by one: {e}")
+                    break
+                self._count(retries=1)
+                time.sleep(self.retry_delay * 2 ** attempt)
+            else:
+                self._count(written=len(batch), batches=1)
+                return
+        self._count(split_batches=1)
+        for table, row in batch:
+            try:
+                self._insert(engine, [(table, row)])
+            except Exception:  # pylint: disable=broad-except
+                app.logger.exception(f"Dropped an audit log row of {table.name}: {row}")
+                self._count(failed=1)
+            else:
+                self._count(written=1)
+
+    def _insert(self, engine, rows):
+        by_table = {}
+        for table, row in rows:
+            by_table.setdefault(table, []).append(row)
+        with engine.begin() as connection:
+            for table, values in by_table.items():
+                connection.execute(table.insert(), values)
+
+    def _count(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
+
+
+def _transient(error):
+    # Lost connections and failovers may succeed later, rejected rows never will
+    return isinstance(error, OperationalError) or (isinstance(error, DBAPIError) and error.connection_invalidated)
@@ -3,11 +3,26 @@ Contains the Firebase class.
 
 This class provides methods to interact with the Firebase Admin SDK.
 
+Verified ID tokens are cached by the SHA-256 of the token until their `exp`
+claim, in a bounded LRU of `FIREBASE_TOKEN_CACHE_SIZE` entries, so a client
+reusing its token is verified by a dictionary lookup instead of an RSA
+signature check. As with `verify_id_token` without `check_revoked`, a revoked
+token is accepted until it expires.
+
+The Google signing certificates are fetched by a background thread when the
+first token is verified, then every `FIREBASE_CERTS_REFRESH_INTERVAL` seconds,
+so that requests never wait for them.
 """
+import hashlib
 import os
 import functools
+import threading
+import time
+from collections import Counter, OrderedDict
+
 from firebase_admin import auth as firebase_auth
 from firebase_admin import credentials, initialize_app, firestore
+from firebase_admin._token_gen import ID_TOKEN_CERT_URI
 
 from flask import current_app, request, jsonify
 
@@ -44,6 +59,13 @@ class Firebase(object):
         self.creds = None
         self.app = None
         self.db = None
+        self.token_cache_size = 4096
+        self.certs_refresh_interval = 3600.0
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._refresher = None
+        self._refresher_pid = None
 
         if app is not None:
             self.init_app(app)
@@ -69,6 +91,10 @@ class Firebase(object):
         If an error occurs while initializing the Firebase client, it logs
         the error using the Flask app's logger.
         """
+        self.token_cache_size = app.config.get('FIREBASE_TOKEN_CACHE_SIZE', self.token_cache_size)
+        self.certs_refresh_interval = app.config.get('FIREBASE_CERTS_REFRESH_INTERVAL', self.certs_refresh_interval)
+        app.extensions['firebase'] = self
+        app.extensions.setdefault('metrics', {})['firebase_tokens'] = self.snapshot
         try:
             print('Initializing Firebase...')
             if not os.path.isfile(app.config.get('GOOGLE_CREDENTIALS_FILEPATH')):
@@ -82,6 +108,89 @@ class Firebase(object):
         finally:
             print('Firebase initialized.')
 
+    def verify_id_token(self, token):
+        """
+        Verifies a Firebase ID token, from the cache when it was verified before.
+
+        Parameters:
+            token (str): The ID token.
+
+        Returns:
+            dict: The decoded claims of the token.
+
+        Raises:
+            ValueError: If the token is invalid or expired, from `firebase_auth.verify_id_token`.
+        """
+        self._start_refresher()
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._tokens.move_to_end(key)
+                    self._counts['hits'] += 1
+                    return entry[1]
+                del self._tokens[key]
+                self._counts['expired'] += 1
+            self._counts['misses'] += 1
+
+        claims = firebase_auth.verify_id_token(token, app=self.app)
+        if self.token_cache_size > 0:
+            with self._lock:
+                self._tokens[key] = (claims['exp'], claims)
+                while len(self._tokens) > self.token_cache_size:
+                    self._tokens.popitem(last=False)
+                    self._counts['evictions'] += 1
+        return claims
+
+    def refresh_certificates(self):
+        """
+        Fetches the Google signing certificates into the HTTP cache of the token verifier.
+
+        The request bypasses the cache, so the certificates are renewed before they expire.
+        """
+        # pylint: disable=protected-access
+        verifier = firebase_auth._get_client(self.app)._token_verifier
+        verifier.request(url=ID_TOKEN_CERT_URI, headers={'Cache-Control': 'no-cache'})
+        self._count(certs_refreshes=1)
+
+    def snapshot(self):
+        """
+        Returns the counters of the token cache.
+
+        Returns:
+            dict: The hits, misses, expired and evicted tokens, the certificate refreshes and the size.
+        """
+        with self._lock:
+            data = {key: self._counts[key] for key in
+                    ('hits', 'misses', 'expired', 'evictions', 'certs_refreshes', 'certs_errors')}
+            data['size'] = len(self._tokens)
+        return data
+
+    def _start_refresher(self):
+        if self._refresher_pid == os.getpid() or self.app is None or self.certs_refresh_interval <= 0:
+            return
+        with self._lock:
+            # A forked worker does not inherit the thread of its parent
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._refresher = threading.Thread(target=self._refresh_loop, name='firebase-certs', daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh_certificates()
+            except Exception:  # pylint: disable=broad-except
+                self._count(certs_errors=1)
+            time.sleep(self.certs_refresh_interval)
+
+    def _count(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
+
 
 def firebase_auth_required(func):
     """
@@ -100,8 +209,12 @@ def firebase_auth_required(func):
         if not auth_header or not auth_header.startswith("Bearer "):
             return jsonify({"error": "Missing or invalid token"}), 401
         token = auth_header.split(" ")[1]
+        firebase = current_app.extensions.get('firebase')
         try:
-            decoded_token = firebase_auth.verify_id_token(token)
+            if firebase is not None:
+                decoded_token = firebase.verify_id_token(token)
+            else:
+                decoded_token = firebase_auth.verify_id_token(token)
             request.user = decoded_token  # Attach user info to request
         except Exception as e:
             return jsonify({"error": "Invalid token", "details": str(e)}), 401
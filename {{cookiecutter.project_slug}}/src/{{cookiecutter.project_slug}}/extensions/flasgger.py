@@ -1,7 +1,9 @@
-from flask import request, Response
+from flask import current_app, request, Response
 from functools import wraps
 
 from modules.users.models import User
+from .passwords import PasswordHasherBusy
+from . import login_throttle
 
 
 def requires_basic_auth(f):
@@ -10,9 +12,10 @@ def requires_basic_auth(f):
     def check_auth(email, password):
         user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
-            return True
-        return False
+        try:
+            return user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            return False
 
     def authenticate():
         return Response(
@@ -22,16 +25,17 @@ def requires_basic_auth(f):
 
     @wraps(f)
     def decorated(*args, **kwargs):
-        # NOTE: This example will require Basic Auth only when you run the
-        # app directly. For unit tests, we can't block it from getting the
-        # Swagger specs so we just allow it to go thru without auth.
-        # The following two lines of code wouldn't be needed in a normal
-        # production environment.
-        if __name__ != "__main__":
+        # SWAGGER_BASIC_AUTH=False serves the Swagger specs without credentials, e.g. in local development
+        if not current_app.config.get('SWAGGER_BASIC_AUTH', True):
             return f(*args, **kwargs)
 
         auth = request.authorization
-        if not auth or not check_auth(auth.username, auth.password):
+        if not auth:
+            return authenticate()
+        retry_after = login_throttle.check(request.remote_addr, auth.username)
+        if retry_after:
+            return Response("Too many sign in attempts.", 429, {"Retry-After": str(retry_after)})
+        if not check_auth(auth.username, auth.password):
             return authenticate()
         return f(*args, **kwargs)
 
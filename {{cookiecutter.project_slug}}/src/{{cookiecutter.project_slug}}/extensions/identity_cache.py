@@ -0,0 +1,229 @@
+"""
+This module caches the identities loaded on every authenticated request.
+
+IdentityCache keeps JSON ready snapshots in a bounded per-process LRU whose
+entries expire after `USER_CACHE_TTL` seconds. When `USER_CACHE_REDIS_URL` is
+set, a Redis tier shared by the workers sits behind it, with entries expiring
+after `USER_CACHE_SHARED_TTL` seconds: a worker missing locally reads the
+snapshot another worker stored before going to the database.
+
+Invalidating a key drops it from the local tier and from Redis, and bumps an
+invalidation generation shared by the workers: a counter in Redis when it is
+configured, else the `USER_CACHE_GENERATION_FILE` marker of the host, like the
+module generation marker. Every lookup compares the shared generation with the
+one it last saw, and a worker seeing it changed clears its local tier, so a
+disabled or deleted user is not served from another worker's cache. When the
+Redis counter cannot be read, lookups go to the database.
+
+Classes:
+    IdentityCache: A Flask extension caching identity snapshots.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+_UNKNOWN = object()
+
+
+class IdentityCache:
+    """
+    A Flask extension caching identity snapshots in an LRU with a TTL, and optionally in Redis.
+
+    Attributes:
+        maxsize (int): The maximum number of snapshots kept per process, 0 disables the cache.
+        ttl (float): The number of seconds a snapshot is kept per process.
+        shared_ttl (float): The number of seconds a snapshot is kept in Redis.
+        prefix (str): The prefix of the Redis keys.
+        generation_file (str): The path of the invalidation marker shared by the workers without Redis.
+    """
+
+    def __init__(self, app=None):
+        self.maxsize = 1024
+        self.ttl = 30.0
+        self.shared_ttl = 300.0
+        self.prefix = 'identity:'
+        self.generation_file = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._generation = 0
+        self._seen_generation = None
+        self._shared = None
+        self._shared_errors = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the configuration and connects the shared tier when configured.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.maxsize = app.config.get('USER_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.shared_ttl = app.config.get('USER_CACHE_SHARED_TTL', self.shared_ttl)
+        self.generation_file = (app.config.get('USER_CACHE_GENERATION_FILE')
+                                or os.path.join(app.instance_path, '.identity_generation'))
+        url = app.config.get('USER_CACHE_REDIS_URL')
+        if url:
+            import redis  # pylint: disable=import-outside-toplevel
+            self._shared = redis.Redis.from_url(url, socket_timeout=0.1)
+            self._shared_errors = (redis.RedisError,)
+        app.extensions['identity_cache'] = self
+        app.extensions.setdefault('metrics', {})['identity_cache'] = self.snapshot
+
+    @property
+    def enabled(self):
+        """
+        bool: Whether snapshots are cached.
+        """
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached snapshot of a key, loading and caching it on a miss.
+
+        Args:
+            key (str): The key, e.g. the id of a user.
+            loader (callable): Returns the snapshot, or None if there is none. None is not cached.
+
+        Returns:
+            dict: The snapshot, or None.
+        """
+        if not self.enabled:
+            return loader()
+        shared_generation = self._shared_generation()
+        if shared_generation is _UNKNOWN:
+            # The cached snapshots may have been invalidated by another worker
+            self._count(misses=1)
+            return loader()
+        value = self._get_local(key, shared_generation)
+        if value is not None:
+            return value
+        generation = self._generation
+        value = self._get_shared(key)
+        if value is None:
+            self._count(misses=1)
+            value = loader()
+            # A snapshot loaded while something was invalidated may predate the change
+            if (value is None or generation != self._generation
+                    or self._shared_generation() != shared_generation):
+                return value
+            self._set_shared(key, value)
+        self._set_local(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        """
+        Drops a key from the local and shared tiers, e.g. after the user changed,
+        and makes the other workers clear their local tier.
+
+        Args:
+            key (str): The key to drop.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self._counts['invalidations'] += 1
+        if self._shared is None:
+            from ..registry import bump_generation  # pylint: disable=import-outside-toplevel
+            bump_generation(self.generation_file)
+            return
+        try:
+            self._shared.incr(self.prefix + 'generation')
+            self._shared.delete(self.prefix + key)
+        except self._shared_errors:
+            self._count(shared_errors=1)
+
+    def clear(self):
+        """
+        Drops every snapshot of the local tier.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        """
+        Returns the counters since the application started.
+
+        Returns:
+            dict: The hits of each tier, the misses, evictions, expirations, invalidations,
+            the local tier clears caused by other workers and the size.
+        """
+        with self._lock:
+            data = {key: self._counts[key] for key in
+                    ('hits', 'shared_hits', 'misses', 'evictions', 'expirations', 'invalidations',
+                     'remote_invalidations', 'shared_errors')}
+            data['size'] = len(self._entries)
+        lookups = data['hits'] + data['shared_hits'] + data['misses']
+        data['hit_ratio'] = round((data['hits'] + data['shared_hits']) / lookups, 3) if lookups else 0.0
+        data['shared'] = self._shared is not None
+        return data
+
+    def _shared_generation(self):
+        if self._shared is None:
+            from ..registry import read_generation  # pylint: disable=import-outside-toplevel
+            return read_generation(self.generation_file)
+        try:
+            return self._shared.get(self.prefix + 'generation')
+        except self._shared_errors:
+            self._count(shared_errors=1)
+            return _UNKNOWN
+
+    def _get_local(self, key, shared_generation):
+        with self._lock:
+            if shared_generation != self._seen_generation:
+                # Another worker invalidated a snapshot, which may be any of these
+                self._entries.clear()
+                self._seen_generation = shared_generation
+                self._generation += 1
+                self._counts['remote_invalidations'] += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self._counts['expirations'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts['hits'] += 1
+            return value
+
+    def _set_local(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counts['evictions'] += 1
+
+    def _get_shared(self, key):
+        if self._shared is None:
+            return None
+        try:
+            data = self._shared.get(self.prefix + key)
+        except self._shared_errors:
+            self._count(shared_errors=1)
+            return None
+        if data is None:
+            return None
+        self._count(shared_hits=1)
+        return json.loads(data)
+
+    def _set_shared(self, key, value):
+        if self._shared is None:
+            return
+        try:
+            self._shared.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.shared_ttl)))
+        except self._shared_errors:
+            self._count(shared_errors=1)
+
+    def _count(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
@@ -0,0 +1,235 @@
+"""
+This module hashes and verifies passwords in a dedicated process pool.
+
+Password hashing is deliberately expensive. Run inline, a burst of logins
+keeps the request threads of a worker busy on the CPU and starves the other
+requests. With `PASSWORD_HASH_WORKERS` above 0, PasswordHasher runs
+`generate_password_hash` and `check_password_hash` in a pool of that many
+processes instead, while the request thread waits without holding the GIL.
+
+At most `PASSWORD_HASH_MAX_PENDING` operations are queued or running at once.
+A request that cannot get a slot within `PASSWORD_HASH_QUEUE_TIMEOUT` seconds
+fails with PasswordHasherBusy rather than piling up behind the storm.
+
+`PASSWORD_HASH_METHOD` sets the algorithm and its cost, e.g.
+'pbkdf2:sha512:1000000' or 'scrypt:32768:8:1'. `needs_rehash` tells whether a
+stored hash was made with other parameters, so it can be replaced on the next
+successful login.
+
+By default `PASSWORD_HASH_WORKERS` is 0 and hashing runs inline in the caller.
+Enable the pool for a server running many request threads per process, e.g.
+the threaded development server; a server scaling with one process per worker
+already spreads the hashes over the CPUs. Each worker process starts its own
+pool.
+
+The processes are spawned: they run `PASSWORD_HASH_PYTHON`, by default the
+current interpreter, and import the main module again, which is why `run.py`
+does not create the application when imported as `__mp_main__`. Under uWSGI
+`sys.executable` is the uwsgi binary, so set `PASSWORD_HASH_PYTHON` to the
+Python of the virtualenv there. A pool broken by a killed process is
+replaced, and the operation retried once on the new pool.
+
+Classes:
+    PasswordHasherBusy: Raised when the pool has no free slot in time.
+    PasswordHasher: A Flask extension hashing passwords in a process pool.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many password operations are pending."""
+
+
+def normalize_method(method):
+    """
+    Spells out the default parameters of a hash method, as they are stored in hashes.
+
+    Args:
+        method (str): A method of `generate_password_hash`, e.g. 'pbkdf2:sha512'.
+
+    Returns:
+        str: The method with all its parameters, e.g. 'pbkdf2:sha512:1000000'.
+    """
+    name, *args = method.split(':')
+    if name == 'pbkdf2':
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS}"
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+        return ':'.join(['scrypt'] + args + defaults[len(args):])
+    return method
+
+
+class PasswordHasher:
+    """
+    A Flask extension hashing and verifying passwords in a bounded process pool.
+
+    Attributes:
+        method (str): The hash method and its cost parameters.
+        workers (int): The number of processes, 0 to hash inline.
+        python (str): The interpreter the processes run, None for the current one.
+        max_pending (int): The maximum number of queued or running operations.
+        queue_timeout (float): The number of seconds to wait for a slot.
+    """
+
+    def __init__(self, app=None):
+        self.method = normalize_method('pbkdf2:sha512')
+        self.workers = 0
+        self.python = None
+        self.max_pending = 32
+        self.queue_timeout = 5.0
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._pending = 0
+        self._max_pending_seen = 0
+        self._wait_total = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the hash method and the pool size from the configuration.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.method = normalize_method(app.config.get('PASSWORD_HASH_METHOD', self.method))
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.python = app.config.get('PASSWORD_HASH_PYTHON') or self.python
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', self.queue_timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+        app.extensions.setdefault('metrics', {})['password_hasher'] = self.snapshot
+
+    def hash(self, password):
+        """
+        Hashes a password with the configured method.
+
+        Args:
+            password (str): The plain text password.
+
+        Returns:
+            str: The hash to store.
+
+        Raises:
+            PasswordHasherBusy: If no slot is free within `queue_timeout`.
+        """
+        self._count(hashes=1)
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """
+        Checks a password against a stored hash.
+
+        Args:
+            pwhash (str): The stored hash.
+            password (str): The plain text password.
+
+        Returns:
+            bool: True if the password matches.
+
+        Raises:
+            PasswordHasherBusy: If no slot is free within `queue_timeout`.
+        """
+        self._count(verifications=1)
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """
+        Tells whether a stored hash was made with another method or other parameters.
+
+        Args:
+            pwhash (str): The stored hash.
+
+        Returns:
+            bool: True if the hash should be replaced.
+        """
+        return pwhash.split('$', 1)[0] != self.method
+
+    def count_rehash(self):
+        """
+        Counts a hash replaced after a successful login.
+        """
+        self._count(rehashes=1)
+
+    def snapshot(self):
+        """
+        Returns the state of the pool and the counters since the application started.
+
+        Returns:
+            dict: The pending and maximum pending operations, the operations per kind,
+            the rejected ones, the replaced pools and the average wait for a slot
+            in milliseconds.
+        """
+        with self._lock:
+            data = {key: self._counts[key] for key in
+                    ('hashes', 'verifications', 'rehashes', 'rejected', 'pool_restarts')}
+            operations = data['hashes'] + data['verifications']
+            data.update(
+                method=self.method.split(':', 1)[0],
+                workers=self.workers,
+                pending=self._pending,
+                max_pending=self.max_pending,
+                max_pending_seen=self._max_pending_seen,
+                wait_avg_ms=round(self._wait_total / operations * 1000, 3) if operations else 0.0,
+            )
+        return data
+
+    def _run(self, func, *args):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count(rejected=1)
+            raise PasswordHasherBusy("Too many password operations pending.")
+        try:
+            with self._lock:
+                self._pending += 1
+                self._max_pending_seen = max(self._max_pending_seen, self._pending)
+                self._wait_total += time.perf_counter() - started
+            if self.workers <= 0:
+                return func(*args)
+            executor = self._pool()
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                self._discard(executor)
+                return self._pool().submit(func, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def _pool(self):
+        with self._lock:
+            # A forked worker cannot use the pool of its parent
+            if self._executor is None or self._pid != os.getpid():
+                # Spawned processes do not inherit the locks held by the threads of this one
+                context = multiprocessing.get_context('spawn')
+                if self.python:
+                    context.set_executable(self.python)
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            # Another thread may have replaced the broken pool already
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._counts['pool_restarts'] += 1
+        executor.shutdown(wait=False)
+
+    def _count(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
@@ -0,0 +1,149 @@
+"""
+This module routes read-only queries to read replicas.
+
+Replicas are SQLAlchemy binds named `replica_<n>`, configured through
+`DATABASE_REPLICA_URIS`. RoutingSession, the session class of `db`, sends
+plain SELECTs on the primary's tables to a replica chosen by ReplicaRouter,
+round-robin or least loaded. Writes, SELECT ... FOR UPDATE and every query
+after them go to the primary: once a session has written, it stays pinned to
+the primary, and since Flask-SQLAlchemy scopes sessions to the application
+context, reads after a write within a request see that write.
+
+Classes:
+    RoutingSession: A Flask-SQLAlchemy session routing reads to replicas.
+    ReplicaRouter: A Flask extension choosing the replica of each read.
+"""
+import itertools
+import threading
+from collections import Counter
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+REPLICA_PREFIX = 'replica_'
+STRATEGIES = ('round_robin', 'least_loaded')
+
+
+class RoutingSession(Session):
+    """
+    A session sending read-only queries to a replica when replicas are configured.
+    """
+
+    def use_primary(self):
+        """
+        Pins the session to the primary, e.g. before reads that must not lag behind.
+
+        Call it on the current session: `db.session().use_primary()`.
+        """
+        self.info['use_primary'] = True
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        """
+        Returns the engine for a query: a replica for reads, the primary otherwise.
+
+        Args:
+            mapper (Mapper): The mapper of the queried entity, if any.
+            clause (ClauseElement): The statement, if any.
+            bind (Engine): An explicit engine, returned as is.
+
+        Returns:
+            Engine: The engine to execute on.
+        """
+        if bind is not None:
+            return bind
+        engine = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        router = current_app.extensions.get('replica_router')
+        if router is None or not router.binds or engine is not self._db.engine:
+            return engine
+        is_read = (
+            not self._flushing
+            and clause is not None
+            and clause.is_select
+            and getattr(clause, '_for_update_arg', None) is None
+        )
+        if not is_read or self.info.get('use_primary'):
+            # Keep this session on the primary, so later reads see the write
+            self.info['use_primary'] = True
+            router.count('primary')
+            return engine
+        return router.choose(self._db.engines)
+
+
+class ReplicaRouter:
+    """
+    A Flask extension choosing the replica that serves each read.
+
+    Attributes:
+        binds (list): The bind keys of the replicas.
+        strategy (str): 'round_robin' or 'least_loaded'.
+    """
+
+    def __init__(self, app=None):
+        self.binds = []
+        self.strategy = 'round_robin'
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._queries = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the replica binds and the routing strategy from the configuration.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Raises:
+            ValueError: If the strategy is unknown.
+        """
+        self.strategy = app.config.get('DATABASE_REPLICA_STRATEGY', 'round_robin')
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy {self.strategy}, expected one of {', '.join(STRATEGIES)}.")
+        self.binds = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {}
+                            if key and key.startswith(REPLICA_PREFIX))
+        app.extensions['replica_router'] = self
+        if self.binds:
+            app.extensions.setdefault('metrics', {})['database_replicas'] = self.snapshot
+
+    def count(self, key):
+        """
+        Counts a query routed to the primary or to a replica.
+
+        Args:
+            key (str): 'primary' or the bind key of a replica.
+        """
+        with self._lock:
+            self._queries[key] += 1
+
+    def choose(self, engines):
+        """
+        Returns the replica engine to read from.
+
+        Args:
+            engines (Mapping): The engines of the application, by bind key.
+
+        Returns:
+            Engine: The chosen replica.
+        """
+        if self.strategy == 'least_loaded':
+            key = min(self.binds, key=lambda bind: _checked_out(engines[bind]))
+        else:
+            key = self.binds[next(self._next) % len(self.binds)]
+        self.count(key)
+        return engines[key]
+
+    def snapshot(self):
+        """
+        Returns the number of queries routed to the primary and to each replica.
+
+        Returns:
+            dict: The strategy and the query counts.
+        """
+        with self._lock:
+            return {'strategy': self.strategy, 'queries': dict(self._queries)}
+
+
+def _checked_out(engine):
+    checkedout = getattr(engine.pool, 'checkedout', None)
+    return checkedout() if checkedout else 0
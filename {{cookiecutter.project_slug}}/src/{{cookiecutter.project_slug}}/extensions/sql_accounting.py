@@ -0,0 +1,343 @@
+"""
+This module accounts for the SQL statements issued by each request.
+
+SQLAccounting listens to `before_cursor_execute` and `after_cursor_execute`
+on every engine, primary and replicas alike. For each request it counts the
+statements, sums their duration and counts how often each statement was
+repeated. Statements are compared by their SQL text, which for parameterized
+queries is the same whatever the values: a statement repeated
+`SQL_N_PLUS_ONE_THRESHOLD` times is the mark of an N+1 pattern, e.g. a lazy
+loaded relationship such as `Organization.admin` accessed in a loop.
+
+The numbers are sent in a `Server-Timing` header, requests slower than
+`SLOW_REQUEST_MS` are logged with their SQL breakdown, and likely N+1 patterns
+are logged as warnings. Statements run while a streamed response is iterated,
+e.g. by `stream_users`, execute after `after_request` and are not counted.
+
+When `SQL_FINGERPRINTS` is enabled, SELECT statements are also aggregated
+across requests by fingerprint (executions, total and max duration) and
+flushed every `SQL_FINGERPRINTS_FLUSH_INTERVAL` seconds to a JSON file per
+process in `SQL_FINGERPRINTS_FOLDER`, where `flask database advise-indexes`
+reads them. Only the types of the parameters are kept, never their values.
+The files are named after the pid and the start of the process, so a recycled
+pid does not overwrite the file of an earlier process, and files older than
+`SQL_FINGERPRINTS_MAX_AGE` are removed when they are read. Fingerprints are
+off by default in production.
+
+Classes:
+    RequestStats: The SQL statistics of one request.
+    FingerprintStore: SELECT statistics aggregated across requests.
+    SQLAccounting: A Flask extension collecting them.
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestStats:
+    """
+    The SQL statistics of one request.
+
+    Attributes:
+        started (float): The start of the request, from `time.perf_counter()`.
+        count (int): The number of statements executed.
+        duration (float): The total time spent executing them, in seconds.
+        statements (Counter): The number of executions of each statement.
+        durations (Counter): The total duration of each statement, in seconds.
+        longest (dict): The duration of the slowest execution of each statement, in seconds.
+        parameters (dict): The parameters of the first execution of each statement.
+    """
+
+    __slots__ = ('started', 'count', 'duration', 'statements', 'durations', 'longest', 'parameters')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.durations = Counter()
+        self.longest = {}
+        self.parameters = {}
+
+    def record(self, statement, elapsed, parameters=None):
+        """
+        Records the execution of a statement.
+
+        Args:
+            statement (str): The SQL text of the statement.
+            elapsed (float): Its duration in seconds.
+            parameters (tuple or dict): Its DBAPI parameters.
+        """
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+        self.durations[statement] += elapsed
+        if elapsed > self.longest.get(statement, 0.0):
+            self.longest[statement] = elapsed
+        if statement not in self.parameters:
+            self.parameters[statement] = parameters
+
+    def repeated(self, threshold):
+        """
+        Returns the statements executed at least `threshold` times.
+
+        Args:
+            threshold (int): The minimum number of executions.
+
+        Returns:
+            list: (statement, executions) tuples, most repeated first.
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+
+
+def fingerprint(statement):
+    """
+    Normalizes a statement so that its variants share one fingerprint.
+
+    Whitespace is collapsed and expanded IN lists are reduced to one placeholder.
+
+    Args:
+        statement (str): The SQL text.
+
+    Returns:
+        str: The fingerprint.
+    """
+    return _IN_LIST.sub('(?)', ' '.join(statement.split()))
+
+
+def parameter_types(parameters):
+    """
+    Returns the type names of statement parameters, keeping their shape.
+
+    Args:
+        parameters (tuple or dict): The DBAPI parameters.
+
+    Returns:
+        list or dict: The type name of each parameter.
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return []
+
+
+class FingerprintStore:
+    """
+    SELECT statistics aggregated by fingerprint, flushed to a file per process.
+
+    The file is `<folder>/<pid>-<started>.json`, where `started` is the time
+    of the first flush of the process, so forked workers get their own file.
+
+    Attributes:
+        folder (str): The folder of the fingerprint files.
+        flush_interval (float): The minimum number of seconds between two flushes.
+        logger (Logger): Where failed flushes are logged.
+    """
+
+    def __init__(self, folder, flush_interval=30.0, logger=None):
+        self.folder = folder
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._entries = {}
+        self._flushed = time.monotonic()
+        self._pid = None
+        self._file_name = None
+
+    def add(self, stats):
+        """
+        Merges the SELECT statements of a request.
+
+        Args:
+            stats (RequestStats): The statistics of the request.
+        """
+        with self._lock:
+            for statement, count in stats.statements.items():
+                if not statement.lstrip()[:6].upper() == 'SELECT':
+                    continue
+                key = fingerprint(statement)
+                elapsed_ms = stats.durations[statement] * 1000
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = {
+                        'statement': statement,
+                        'parameters': parameter_types(stats.parameters.get(statement)),
+                        'count': 0,
+                        'total_ms': 0.0,
+                        'max_ms': 0.0,
+                    }
+                entry['count'] += count
+                entry['total_ms'] += elapsed_ms
+                entry['max_ms'] = max(entry['max_ms'], stats.longest[statement] * 1000)
+            now = time.monotonic()
+            due = now - self._flushed >= self.flush_interval
+            if due:
+                # Claimed under the lock, so one request flushes per interval
+                self._flushed = now
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the statistics of this process to its file in `folder`.
+
+        Runs from the request hooks and at exit, so errors are logged rather than raised.
+
+        Returns:
+            bool: True if the statistics were written.
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self._entries:
+                    return False
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._file_name = f'{self._pid}-{int(time.time())}.json'
+                data = json.dumps({'pid': self._pid, 'fingerprints': self._entries})
+                self._flushed = time.monotonic()
+            path = os.path.join(self.folder, self._file_name)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                if self.logger is not None:
+                    self.logger.warning(f"Could not write query fingerprints to {path}: {e}")
+                return False
+        return True
+
+
+def _summary(statement, limit=200):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else f"{statement[:limit]}..."
+
+
+class SQLAccounting:
+    """
+    A Flask extension accounting for the SQL statements of each request.
+
+    Attributes:
+        slow_request_ms (float): Requests slower than this are logged.
+        n_plus_one_threshold (int): Repetitions of a statement flagged as a likely N+1.
+        server_timing (bool): Whether the `Server-Timing` header is sent.
+    """
+
+    def __init__(self, app=None):
+        self.slow_request_ms = 500.0
+        self.n_plus_one_threshold = 5
+        self.server_timing = True
+        self._listening = False
+        self._lock = threading.Lock()
+        self._totals = Counter()
+        self.fingerprints = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the SQLAlchemy listeners and the request hooks.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        if not app.config.get('SQL_ACCOUNTING', True):
+            return
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_MS', self.slow_request_ms)
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        self.server_timing = app.config.get('SERVER_TIMING', self.server_timing)
+        if app.config.get('SQL_FINGERPRINTS', True):
+            folder = app.config.get('SQL_FINGERPRINTS_FOLDER') or os.path.join(app.instance_path, 'query_fingerprints')
+            self.fingerprints = FingerprintStore(folder, app.config.get('SQL_FINGERPRINTS_FLUSH_INTERVAL', 30.0),
+                                                 app.logger)
+            atexit.register(self.fingerprints.flush)
+
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            self._listening = True
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['sql_accounting'] = self
+        app.extensions.setdefault('metrics', {})['sql'] = self.snapshot
+
+    def _start_request(self):
+        g.sql_stats = RequestStats()
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.duration * 1000
+
+        if self.server_timing:
+            response.headers.add(
+                'Server-Timing', f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+            )
+
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        slow = total_ms >= self.slow_request_ms
+        with self._lock:
+            self._totals['requests'] += 1
+            self._totals['queries'] += stats.count
+            self._totals['slow_requests'] += slow
+            self._totals['n_plus_one'] += len(repeated)
+        if self.fingerprints is not None:
+            self.fingerprints.add(stats)
+
+        logger = current_app.logger
+        for statement, count in repeated:
+            logger.warning(
+                f"Likely N+1 on {request.method} {request.path}: statement executed {count} times: "
+                f"{_summary(statement)}"
+            )
+        if slow:
+            top = ', '.join(
+                f"{stats.statements[statement]}x {duration * 1000:.1f}ms {_summary(statement, 80)}"
+                for statement, duration in stats.durations.most_common(3)
+            )
+            logger.warning(
+                f"Slow request {request.method} {request.path}: {total_ms:.1f}ms, "
+                f"{stats.count} queries in {db_ms:.1f}ms. Slowest: {top or 'none'}"
+            )
+        return response
+
+    def snapshot(self):
+        """
+        Returns the totals since the application started.
+
+        Returns:
+            dict: The numbers of requests, queries, slow requests and N+1 patterns.
+        """
+        with self._lock:
+            return {key: self._totals[key] for key in ('requests', 'queries', 'slow_requests', 'n_plus_one')}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and 'sql_stats' in g:
+        context.sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'sql_started', None)
+    if started is None:
+        return
+    stats = g.get('sql_stats') if has_request_context() else None
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started, parameters)
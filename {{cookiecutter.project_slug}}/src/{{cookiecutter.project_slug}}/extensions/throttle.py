@@ -0,0 +1,226 @@
+"""
+This module throttles sign in attempts before any password is checked.
+
+Every attempt takes a token from two buckets: one per client IP and one per
+account. A bucket holds up to `burst` tokens and refills at `rate` tokens per
+minute. An attempt finding either bucket empty is rejected with the number of
+seconds until the next token, without a database lookup or a password hash.
+The account bucket is only drawn once the IP bucket allowed the attempt, so a
+throttled client does not lock the account it targets.
+
+Two backends keep the buckets:
+
+- 'memory': an ordered dictionary per process, least recently used first.
+  Buckets refilled to capacity are dropped from its head as attempts come in,
+  and past `max_keys` the least recently used buckets are evicted, so a flood
+  of new keys costs constant time per attempt.
+- 'redis': one hash per bucket, updated atomically by a Lua script with the
+  server clock, so all workers share the buckets. Uses `REDIS_URL`. When Redis
+  is unreachable, attempts are allowed and counted as backend errors.
+
+Classes:
+    MemoryBuckets: Token buckets kept in the process.
+    RedisBuckets: Token buckets kept in Redis.
+    LoginThrottle: A Flask extension throttling sign in attempts.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+BACKENDS = ('memory', 'redis')
+
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(bucket[1]) or capacity
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - stamp) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class MemoryBuckets:
+    """
+    Token buckets kept in an ordered dictionary of the process.
+
+    Every bucket keeps its own capacity and rate, so IP and account buckets
+    are refilled and dropped by their own limits.
+
+    Attributes:
+        max_keys (int): The number of buckets above which the least recently used are evicted.
+    """
+
+    errors = ()
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """
+        Takes a token from a bucket.
+
+        Args:
+            key (str): The key of the bucket.
+            capacity (int): The maximum number of tokens.
+            rate (float): The tokens added per second.
+
+        Returns:
+            float: 0 if a token was taken, else the seconds until the next token.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp, _, _ = self._buckets.pop(key, (capacity, now, capacity, rate))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now, capacity, rate)
+            self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Buckets refilled to capacity are the same as missing ones
+        while self._buckets:
+            tokens, stamp, capacity, rate = next(iter(self._buckets.values()))
+            if tokens + (now - stamp) * rate < capacity and len(self._buckets) <= self.max_keys:
+                return
+            self._buckets.popitem(last=False)
+
+
+class RedisBuckets:
+    """
+    Token buckets kept in Redis, shared by every worker.
+
+    Attributes:
+        prefix (str): The prefix of the Redis keys.
+    """
+
+    def __init__(self, url, prefix='login_throttle:'):
+        import redis  # pylint: disable=import-outside-toplevel
+        self.prefix = prefix
+        self.errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(url, socket_timeout=0.1)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        """
+        Takes a token from a bucket.
+
+        Args:
+            key (str): The key of the bucket.
+            capacity (int): The maximum number of tokens.
+            rate (float): The tokens added per second.
+
+        Returns:
+            float: 0 if a token was taken, else the seconds until the next token.
+        """
+        return float(self._take(keys=[self.prefix + key], args=[capacity, rate]))
+
+
+class LoginThrottle:
+    """
+    A Flask extension throttling sign in attempts per client IP and per account.
+
+    Attributes:
+        enabled (bool): Whether attempts are throttled.
+        ip_burst (int): The attempts a client IP can make at once.
+        ip_rate (float): The attempts per minute a client IP regains.
+        account_burst (int): The attempts an account can receive at once.
+        account_rate (float): The attempts per minute an account regains.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.ip_burst = 20
+        self.ip_rate = 10.0
+        self.account_burst = 10
+        self.account_rate = 5.0
+        self.backend = MemoryBuckets()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the limits and selects the backend.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Raises:
+            ValueError: If the backend is unknown, or is 'redis' without `REDIS_URL`.
+        """
+        self.enabled = app.config.get('LOGIN_THROTTLE', self.enabled)
+        self.ip_burst = app.config.get('LOGIN_THROTTLE_IP_BURST', self.ip_burst)
+        self.ip_rate = app.config.get('LOGIN_THROTTLE_IP_RATE', self.ip_rate)
+        self.account_burst = app.config.get('LOGIN_THROTTLE_ACCOUNT_BURST', self.account_burst)
+        self.account_rate = app.config.get('LOGIN_THROTTLE_ACCOUNT_RATE', self.account_rate)
+        backend = app.config.get('LOGIN_THROTTLE_BACKEND', 'memory')
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown login throttle backend {backend}, expected one of {', '.join(BACKENDS)}.")
+        if backend == 'redis':
+            if not app.config.get('REDIS_URL'):
+                raise ValueError("The redis login throttle backend requires REDIS_URL.")
+            self.backend = RedisBuckets(app.config['REDIS_URL'])
+        else:
+            self.backend = MemoryBuckets()
+        app.extensions['login_throttle'] = self
+        app.extensions.setdefault('metrics', {})['login_throttle'] = self.snapshot
+
+    def check(self, ip, account):
+        """
+        Takes a token for a sign in attempt.
+
+        Args:
+            ip (str): The address of the client.
+            account (str): The account signed in to, e.g. an email. Compared case-insensitively.
+
+        Returns:
+            int: 0 if the attempt may proceed, else the seconds to wait before the next one.
+        """
+        if not self.enabled:
+            return 0
+        account = hashlib.sha256((account or '').strip().lower().encode()).hexdigest()[:32]
+        try:
+            wait = self.backend.take(f"ip:{ip}", self.ip_burst, self.ip_rate / 60)
+            if wait:
+                self._count(rejected_ip=1)
+                return math.ceil(wait)
+            wait = self.backend.take(f"account:{account}", self.account_burst, self.account_rate / 60)
+            if wait:
+                self._count(rejected_account=1)
+                return math.ceil(wait)
+        except self.backend.errors:
+            self._count(backend_errors=1)
+        self._count(allowed=1)
+        return 0
+
+    def snapshot(self):
+        """
+        Returns the counters since the application started.
+
+        Returns:
+            dict: The allowed attempts, the rejected ones per bucket and the backend errors.
+        """
+        with self._lock:
+            data = {key: self._counts[key] for key in ('allowed', 'rejected_ip', 'rejected_account', 'backend_errors')}
+        data['backend'] = 'redis' if isinstance(self.backend, RedisBuckets) else 'memory'
+        return data
+
+    def _count(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
@@ -0,0 +1,219 @@
+"""
+Startup profiling for the application.
+
+`create_app()` records the duration of each of its phases in a StartupProfiler.
+The `flask perf startup` command boots the app in a fresh interpreter with
+`-X importtime` and combines those phase timings with the import cost of each
+top-level package into a sorted report.
+
+Classes:
+    StartupProfiler: Records the duration of named startup phases.
+
+A phase named `<parent>.<child>`, e.g. `load_modules.query`, is nested in the
+phase `<parent>` when there is one: its time is already part of the parent's,
+so reports indent it under the parent instead of listing it next to it.
+
+Functions:
+    parent_phase(timings, name): Finds the phase a phase is nested in.
+    nested_phases(timings, by_duration): Orders phases with each nested one under its parent.
+    format_phase(name, depth): Pads a phase name, indenting nested phases.
+    profile_startup(import_name): Boots the app in a subprocess and profiles it.
+    format_report(report, limit): Formats a startup report as text.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+PROFILE_SCRIPT = """
+import json, sys
+from {import_name} import create_app
+app = create_app()
+with open(sys.argv[1], 'w', encoding='utf-8') as f:
+    json.dump(app.extensions['startup_profiler'].timings, f)
+"""
+
+
+class StartupProfiler:
+    """
+    Records the duration of named startup phases.
+
+    Attributes:
+        timings (dict): Duration in seconds of each phase, in the order they ran.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the duration of a startup phase.
+
+        Args:
+            name (str): The name of the phase, used in the timing report.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self):
+        """
+        Prints the duration of each startup phase.
+
+        Returns:
+            None
+        """
+        print(f"Application started in {self.timings.get('create_app', 0.0) * 1000:.1f}ms")
+        timings = {name: duration for name, duration in self.timings.items() if name != 'create_app'}
+        for name, duration, depth in nested_phases(timings):
+            print(f"  {format_phase(name, depth)} {duration * 1000:8.1f}ms")
+
+
+def parent_phase(timings, name):
+    """
+    Finds the phase a phase is nested in.
+
+    Args:
+        timings (dict): Duration of each phase.
+        name (str): The name of the phase.
+
+    Returns:
+        str: The name of the closest recorded parent phase, or None for a top-level phase.
+    """
+    parent = name.rpartition('.')[0]
+    while parent:
+        if parent in timings:
+            return parent
+        parent = parent.rpartition('.')[0]
+    return None
+
+
+def nested_phases(timings, by_duration=False):
+    """
+    Orders phases so that each nested phase follows its parent.
+
+    Args:
+        timings (dict): Duration of each phase.
+        by_duration (bool): Whether siblings are sorted by decreasing duration, rather than kept in order.
+
+    Returns:
+        list: A (name, duration, depth) tuple per phase, depth being 0 for top-level phases.
+    """
+    children = defaultdict(list)
+    for name in timings:
+        children[parent_phase(timings, name)].append(name)
+
+    ordered = []
+
+    def visit(parent, depth):
+        names = children[parent]
+        if by_duration:
+            names = sorted(names, key=timings.get, reverse=True)
+        for name in names:
+            ordered.append((name, timings[name], depth))
+            visit(name, depth + 1)
+
+    visit(None, 0)
+    return ordered
+
+
+def format_phase(name, depth):
+    """
+    Pads a phase name for a report, indenting nested phases under their parent.
+
+    Args:
+        name (str): The name of the phase.
+        depth (int): The nesting depth of the phase.
+
+    Returns:
+        str: The indented name, padded to a fixed width.
+    """
+    if depth:
+        name = '  ' * (depth - 1) + '- ' + name.rpartition('.')[2]
+    return f"{name:<32}"
+
+
+def parse_importtime(output):
+    """
+    Sums the `-X importtime` self time of every top-level package.
+
+    Args:
+        output (str): The stderr of an interpreter started with `-X importtime`.
+
+    Returns:
+        dict: Self time in seconds keyed by top-level package name.
+    """
+    packages = defaultdict(float)
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, _, name = line[len('import time:'):].split('|', 2)
+            packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+        except ValueError:
+            continue  # header line
+    return dict(packages)
+
+
+def profile_startup(import_name):
+    """
+    Boots the application in a fresh interpreter and profiles it.
+
+    Args:
+        import_name (str): The import name of the application package.
+
+    Returns:
+        dict: The report with `total`, `phases` and `imports`, each sorted by duration. Nested phases
+        follow their parent, which `parents` maps them to; only top-level phases add up.
+
+    Raises:
+        RuntimeError: If the application fails to start.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        timings_path = os.path.join(tmp_dir, 'timings.json')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT.format(import_name=import_name), timings_path],
+            capture_output=True, text=True, cwd=os.getcwd(), check=False,
+        )
+        if result.returncode != 0 or not os.path.exists(timings_path):
+            raise RuntimeError(f"Application failed to start:\n{result.stderr[-2000:]}")
+        with open(timings_path, encoding='utf-8') as f:
+            timings = json.load(f)
+
+    imports = parse_importtime(result.stderr)
+    total = timings.pop('create_app', 0.0)
+    phases = nested_phases(timings, by_duration=True)
+    return {
+        'total': total,
+        'import_total': sum(imports.values()),
+        'phases': {name: duration for name, duration, _ in phases},
+        'parents': {name: parent_phase(timings, name) for name, _, depth in phases if depth},
+        'imports': dict(sorted(imports.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def format_report(report, limit=20):
+    """
+    Formats a startup report as text.
+
+    Args:
+        report (dict): The report returned by `profile_startup`.
+        limit (int): The maximum number of packages to list.
+
+    Returns:
+        str: The formatted report.
+    """
+    lines = [f"create_app: {report['total'] * 1000:.1f}ms", "", "Phases:"]
+    for name, duration, depth in nested_phases(report['phases']):
+        lines.append(f"  {format_phase(name, depth)} {duration * 1000:8.1f}ms")
+    lines += ["", f"Imports (self time, {report['import_total'] * 1000:.1f}ms total):"]
+    for name, duration in list(report['imports'].items())[:limit]:
+        lines.append(f"  {name:<32} {duration * 1000:8.1f}ms")
+    return "\n".join(lines)
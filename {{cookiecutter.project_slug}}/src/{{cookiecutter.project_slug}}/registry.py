@@ -0,0 +1,487 @@
+"""
+Module registry for the application.
+
+The registry discovers the modules available in the `modules` directory,
+resolves which of them are enabled with a single database query and
+registers their blueprints with the Flask application.
+
+A module can opt in to lazy loading by setting `"lazy": true` in its
+`modules.json`. Only its URL prefix is registered at startup and the module
+itself is imported on the first request under that prefix.
+
+Enabling or disabling a module bumps a generation marker shared by all the
+workers of a host. Each worker polls the marker and rebuilds its URL map when
+it changes, so modules are switched on and off without a restart.
+
+Classes:
+    ModuleRegistry: Loads and keeps track of the registered modules.
+    ModuleMiddleware: WSGI middleware that keeps the registered modules up to date.
+
+Functions:
+    scan_modules_dir(modules_dir): Lists the module packages found in a directory.
+    read_manifest(modules_dir, module_name): Reads a module's `modules.json`.
+    read_generation(path): Reads the module generation marker.
+    bump_generation(path): Changes the module generation marker.
+    remove_blueprint(app, name): Removes a blueprint and its routes from the app.
+    reload_modules(app): Applies enabled/disabled modules in every worker.
+"""
+import importlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from modules.manager.models import Module
+from sqlalchemy.exc import SQLAlchemyError
+
+from .extensions import db
+from .profiling import StartupProfiler
+
+_scan_cache = {}
+
+
+def scan_modules_dir(modules_dir='modules'):
+    """
+    Lists the module packages found in the given directory.
+
+    The result is cached and only refreshed when the directory modification
+    time changes, so repeated calls (e.g. from several app factories) do not
+    hit the filesystem again.
+
+    Args:
+        modules_dir (str): The directory containing the modules.
+
+    Returns:
+        tuple: The names of the directories that contain an `__init__.py` file.
+    """
+    try:
+        mtime = os.stat(modules_dir).st_mtime_ns
+    except FileNotFoundError:
+        return ()
+
+    cached = _scan_cache.get(modules_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    names = []
+    with os.scandir(modules_dir) as entries:
+        for entry in entries:
+            if (entry.is_dir() and not entry.name.startswith('.')
+                    and os.path.exists(os.path.join(entry.path, '__init__.py'))):
+                names.append(entry.name)
+    names = tuple(sorted(names))
+    _scan_cache[modules_dir] = (mtime, names)
+    return names
+
+
+def read_manifest(modules_dir, module_name):
+    """
+    Reads the `modules.json` manifest of a module.
+
+    Args:
+        modules_dir (str): The directory containing the modules.
+        module_name (str): The name of the module package.
+
+    Returns:
+        dict: The manifest content, or an empty dict if it is missing or invalid.
+    """
+    manifest_path = os.path.join(modules_dir, module_name, 'modules.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Invalid JSON format in file: {manifest_path}. Error: {e}")
+        return {}
+
+
+@contextmanager
+def setup_unlocked(app):
+    """
+    Allows setup methods such as `register_blueprint` after the first request.
+
+    Flask refuses to change the app once it has handled a request. Callers must
+    hold their own lock so that no two threads change the URL map at the same time.
+
+    This flips the private `Flask._got_first_request` flag that
+    `Flask._check_setup_finished` reads in the pinned Flask 3.1; check it still
+    exists when upgrading Flask.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    got_first_request = app._got_first_request
+    app._got_first_request = False
+    try:
+        yield
+    finally:
+        app._got_first_request = got_first_request
+
+
+def read_generation(path):
+    """
+    Reads the module generation marker.
+
+    Args:
+        path (str): The path of the generation file.
+
+    Returns:
+        tuple: An opaque value that changes whenever the marker is bumped, or None.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def bump_generation(path):
+    """
+    Changes the module generation marker so every worker reloads its modules.
+
+    The file is replaced atomically, so workers never read a partial write.
+
+    Args:
+        path (str): The path of the generation file.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+
+def remove_blueprint(app, name):
+    """
+    Removes a blueprint, its routes, views and hooks from the app.
+
+    The blueprint's rules are looked up in the URL map index, and the rebuilt
+    map is swapped in at once, so requests being routed concurrently always
+    see a consistent map.
+
+    Args:
+        app (Flask): The Flask application instance.
+        name (str): The name of the blueprint.
+
+    Returns:
+        None
+    """
+    app.url_map, removed = app.url_map.without_blueprint(name)
+    for rule in removed:
+        app.view_functions.pop(rule.endpoint, None)
+
+    app.blueprints.pop(name, None)
+    for registry in (app.before_request_funcs, app.after_request_funcs, app.teardown_request_funcs,
+                     app.url_default_functions, app.url_value_preprocessors,
+                     app.template_context_processors, app.error_handler_spec):
+        registry.pop(name, None)
+
+
+class ModuleRegistry:
+    """
+    Loads the installed and enabled modules and registers their blueprints.
+
+    Attributes:
+        modules_dir (str): The directory containing the uploaded modules.
+        installed (set): The names of the installed apps, which are always loaded.
+        loaded (dict): Maps each registered module name to its `modules` package.
+        blueprints (dict): Maps each registered module name to its blueprint name.
+        lazy (dict): Maps the URL prefix of each pending lazy module to its name.
+        profiler (StartupProfiler): Records the duration of each loading phase.
+        generation_file (str): The path of the generation marker shared by the workers.
+        reload_interval (float): Minimum number of seconds between two marker checks.
+    """
+
+    def __init__(self, modules_dir='modules', profiler=None):
+        self.modules_dir = modules_dir
+        self.installed = set()
+        self.loaded = {}
+        self.blueprints = {}
+        self.lazy = {}
+        self.profiler = profiler or StartupProfiler()
+        self.generation_file = None
+        self.reload_interval = 1.0
+        self.generation = None
+        self._next_poll = 0.0
+        self._lock = threading.RLock()
+
+    def phase(self, name):
+        """
+        Measures the duration of a module loading phase.
+
+        Args:
+            name (str): The name of the phase, used in the timing report.
+        """
+        return self.profiler.phase(f'load_modules.{name}')
+
+    def enabled_module_names(self, app):
+        """
+        Fetches the names of all enabled modules in one query.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Returns:
+            set: The names of the enabled modules.
+
+        Raises:
+            SQLAlchemyError: If the query fails, e.g. when the table does not exist yet.
+        """
+        with app.app_context():
+            # A generation bump means the primary changed; a lagging replica could miss it
+            db.session().use_primary()
+            rows = Module.query.with_entities(Module.name).filter_by(enabled=True).all()
+        return {row.name for row in rows}
+
+    def _import_and_register(self, app, module_name):
+        module = importlib.import_module(f'modules.{module_name}.modules')
+        if not hasattr(module, 'register'):
+            return False
+        blueprint = module.register()
+        app.register_blueprint(blueprint)
+        self.loaded[module_name] = module
+        self.blueprints[module_name] = blueprint.name
+        return True
+
+    def register(self, app, module_name):
+        """
+        Imports a module once and registers its blueprint with the app.
+
+        Args:
+            app (Flask): The Flask application instance.
+            module_name (str): The name of the module package.
+
+        Returns:
+            bool: True if the module blueprint was registered.
+        """
+        if module_name in self.loaded:
+            return False
+        manifest = read_manifest(self.modules_dir, module_name)
+        if manifest.get('lazy'):
+            prefix = '/' + manifest.get('url_prefix', module_name).strip('/')
+            self.lazy[prefix] = module_name
+            return False
+        return self._import_and_register(app, module_name)
+
+    def unregister(self, app, module_name):
+        """
+        Removes a module's blueprint and routes from the app.
+
+        Args:
+            app (Flask): The Flask application instance.
+            module_name (str): The name of the module package.
+
+        Returns:
+            None
+        """
+        for prefix, name in tuple(self.lazy.items()):
+            if name == module_name:
+                del self.lazy[prefix]
+        blueprint_name = self.blueprints.pop(module_name, None)
+        self.loaded.pop(module_name, None)
+        if blueprint_name:
+            remove_blueprint(app, blueprint_name)
+
+    def match_lazy(self, path):
+        """
+        Finds the pending lazy module serving the given path.
+
+        Args:
+            path (str): The request path.
+
+        Returns:
+            str: The prefix of the lazy module, or None.
+        """
+        for prefix in tuple(self.lazy):
+            if path == prefix or path.startswith(prefix + '/'):
+                return prefix
+        return None
+
+    def load_lazy(self, app, prefix):
+        """
+        Imports a lazy module and registers its blueprint.
+
+        Args:
+            app (Flask): The Flask application instance.
+            prefix (str): The URL prefix of the lazy module.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            module_name = self.lazy.pop(prefix, None)
+            if module_name is None:
+                return
+            start = time.perf_counter()
+            try:
+                with setup_unlocked(app):
+                    self._import_and_register(app, module_name)
+                print(f"Lazily loaded module {module_name} in {(time.perf_counter() - start) * 1000:.1f}ms")
+            except Exception as e:
+                # Retried on the next request under the prefix, instead of 404 until a restart
+                self.lazy[prefix] = module_name
+                app.logger.error(f"Failed to load module {module_name}: {e}")
+
+    def sync(self, app):
+        """
+        Registers newly enabled modules and removes disabled ones.
+
+        The generation is only recorded once the enabled modules are known, so
+        a sync that failed to query them is retried on the next poll instead of
+        unregistering every module.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Returns:
+            bool: True if the modules were synced, False if the enabled modules could not be fetched.
+        """
+        with self._lock:
+            # Read first, so a bump made while syncing triggers another sync
+            generation = read_generation(self.generation_file)
+            try:
+                enabled = self.enabled_module_names(app)
+            except SQLAlchemyError as e:
+                app.logger.error(f"Could not fetch the enabled modules, keeping the loaded ones: {e}")
+                return False
+            importlib.invalidate_caches()
+            available = set(scan_modules_dir(self.modules_dir))
+            wanted = (available & enabled) - self.installed
+            current = (set(self.loaded) | set(self.lazy.values())) - self.installed
+
+            with setup_unlocked(app):
+                for module_name in current - wanted:
+                    self.unregister(app, module_name)
+                for module_name in sorted(wanted - current):
+                    try:
+                        self.register(app, module_name)
+                    except Exception as e:
+                        app.logger.error(f"Failed to load module {module_name}: {e}")
+            self.generation = generation
+            return True
+
+    def poll(self, app):
+        """
+        Reloads the modules if another worker changed the generation marker.
+
+        The marker is checked at most once every `reload_interval` seconds.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.reload_interval
+        if read_generation(self.generation_file) != self.generation:
+            self.sync(app)
+
+    def load(self, app, installed_apps=None):
+        """
+        Registers the installed apps and the enabled uploaded modules.
+
+        Args:
+            app (Flask): The Flask application instance.
+            installed_apps (list): A list of installed app names.
+
+        Returns:
+            None
+        """
+        self.generation_file = (app.config.get('MODULES_GENERATION_FILE')
+                                or os.path.join(app.instance_path, '.modules_generation'))
+        self.reload_interval = app.config.get('MODULES_RELOAD_INTERVAL', 1.0)
+        self.generation = read_generation(self.generation_file)
+        self.installed = set(installed_apps or [])
+
+        with self.phase('installed_apps'):
+            for module_name in installed_apps or []:
+                try:
+                    self.register(app, module_name)
+                except Exception as e:
+                    print(e)
+
+        with self.phase('scan'):
+            available = scan_modules_dir(self.modules_dir)
+
+        if available:
+            with self.phase('query'):
+                try:
+                    enabled = self.enabled_module_names(app)
+                except SQLAlchemyError as e:
+                    # The modules table does not exist before the first migration
+                    print(e)
+                    enabled = set()
+        else:
+            enabled = set()
+
+        with self.phase('register'):
+            for module_name in available:
+                if module_name in enabled:
+                    try:
+                        self.register(app, module_name)
+                    except Exception as e:
+                        print(e)
+
+        app.wsgi_app = ModuleMiddleware(app.wsgi_app, app, self)
+
+    def report(self):
+        """
+        Prints a summary of the loaded modules and the duration of each loading phase.
+
+        Returns:
+            None
+        """
+        prefix = 'load_modules.'
+        timings = {name[len(prefix):]: duration for name, duration in self.profiler.timings.items()
+                   if name.startswith(prefix)}
+        total = sum(timings.values())
+        print(f"Loaded {len(self.loaded)} modules ({len(self.lazy)} lazy) in {total * 1000:.1f}ms")
+        for name, duration in timings.items():
+            print(f"  {name:<16} {duration * 1000:8.1f}ms")
+
+
+def reload_modules(app):
+    """
+    Applies the enabled/disabled modules in this worker and signals the others.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    registry = app.extensions['module_registry']
+    bump_generation(registry.generation_file)
+    registry.sync(app)
+
+
+class ModuleMiddleware:
+    """
+    WSGI middleware that keeps the registered modules up to date.
+
+    Before a request reaches Flask, it reloads the modules when the generation
+    marker changed and imports the lazy module serving the request path, so
+    routing, blueprint hooks and error handlers behave as for eagerly loaded
+    modules.
+    """
+
+    def __init__(self, wsgi_app, app, registry):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self.registry = registry
+
+    def __call__(self, environ, start_response):
+        self.registry.poll(self.app)
+        if self.registry.lazy:
+            prefix = self.registry.match_lazy(environ.get('PATH_INFO', ''))
+            if prefix is not None:
+                self.registry.load_lazy(self.app, prefix)
+        return self.wsgi_app(environ, start_response)
@@ -0,0 +1,145 @@
+"""
+URL routing for the application.
+
+The application uses a URL map that indexes its rules by blueprint, so that a
+module's routes can be found and removed without scanning every rule, and that
+caches the payload served by the `/routes` endpoint.
+
+Classes:
+    RuleList: A rule factory yielding rules that were already created.
+    RouteMap: A werkzeug Map that indexes its rules by blueprint.
+    ModularFlask: The Flask application class using RouteMap.
+"""
+from collections import defaultdict
+
+from flask import Flask
+from werkzeug.routing import Map, RuleFactory
+
+
+class RuleList(RuleFactory):
+    """
+    A rule factory yielding a list of rules that were already created.
+
+    Rule factories such as Submount create new rules on every `get_rules` call,
+    so RouteMap expands them once and hands the result to the Map.
+
+    Attributes:
+        rules (list): The rules to add.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get_rules(self, map):  # pylint: disable=redefined-builtin
+        """
+        Yields the rules.
+
+        Args:
+            map (Map): The map the rules are added to.
+
+        Returns:
+            Iterator: The rules.
+        """
+        return iter(self.rules)
+
+
+class RouteMap(Map):
+    """
+    A URL map that indexes its rules by blueprint name.
+
+    Attributes:
+        by_blueprint (dict): Maps each blueprint name to its rules. Rules that do
+            not belong to a blueprint are indexed under ''.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.by_blueprint = defaultdict(list)
+        self._routes = None
+        super().__init__(*args, **kwargs)
+
+    def add(self, rulefactory):
+        """
+        Adds a rule to the map and to the blueprint index.
+
+        The rules are indexed as the factory yields them: the Map keeps its
+        rules grouped by endpoint, so a new rule is not necessarily the last one.
+
+        Args:
+            rulefactory (RuleFactory): The rule, or rule factory, to add.
+        """
+        rules = list(rulefactory.get_rules(self))
+        super().add(RuleList(rules))
+        for rule in rules:
+            self.by_blueprint[rule.endpoint.rpartition('.')[0]].append(rule)
+        self._routes = None
+
+    def blueprint_rules(self, name):
+        """
+        Returns the rules of a blueprint, including its nested blueprints.
+
+        Args:
+            name (str): The name of the blueprint.
+
+        Returns:
+            list: The rules registered by the blueprint.
+        """
+        nested = f'{name}.'
+        return [rule for key, rules in self.by_blueprint.items()
+                if key == name or key.startswith(nested) for rule in rules]
+
+    def without_blueprint(self, name):
+        """
+        Builds a new map holding every rule except those of a blueprint.
+
+        The matcher of a werkzeug Map cannot drop rules, so the remaining rules
+        are copied into a fresh map that the caller swaps in.
+
+        Args:
+            name (str): The name of the blueprint to remove.
+
+        Returns:
+            tuple: The new RouteMap and the list of removed rules.
+        """
+        removed = self.blueprint_rules(name)
+        removed_ids = {id(rule) for rule in removed}
+        new_map = type(self)(
+            default_subdomain=self.default_subdomain,
+            strict_slashes=self.strict_slashes,
+            merge_slashes=self.merge_slashes,
+            redirect_defaults=self.redirect_defaults,
+            converters=self.converters,
+            sort_parameters=self.sort_parameters,
+            sort_key=self.sort_key,
+            host_matching=self.host_matching,
+        )
+        for rule in self._rules:
+            if id(rule) in removed_ids:
+                continue
+            new_rule = rule.empty()
+            new_rule.provide_automatic_options = getattr(rule, 'provide_automatic_options', False)
+            new_map.add(new_rule)
+        return new_map, removed
+
+    def routes(self):
+        """
+        Returns the `/routes` payload, computed once per version of the map.
+
+        Returns:
+            list: A dict with the endpoint, methods and url of every rule.
+        """
+        routes = self._routes
+        if routes is None:
+            routes = [{
+                'endpoint': rule.endpoint,
+                'methods': sorted(rule.methods or ()),
+                'url': str(rule)
+            } for rule in self._rules]
+            self._routes = routes
+        return routes
+
+
+class ModularFlask(Flask):
+    """
+    Flask application whose URL map is indexed by blueprint.
+    """
+    url_map_class = RouteMap
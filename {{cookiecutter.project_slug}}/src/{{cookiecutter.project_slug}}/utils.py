@@ -1,11 +1,22 @@
+import datetime
+
 from modules.manager.models import Log
 
-from .extensions import db
+from .extensions import audit_log
 
 
 # Logging function
 def log_action(action, module_id=None):
-    log_entry = Log(action=action, module_id=module_id)
-    db.session.add(log_entry)
-    db.session.commit()
+    """
+    Records an action in the audit log.
+
+    The row is queued and inserted in the background by `audit_log`, outside
+    of the caller's session, which is neither flushed nor committed.
 
+    Args:
+        action (str): The description of the action.
+        module_id (str): The id of the module concerned, if any.
+    """
+    # Stamped now rather than when the batch is inserted; naive UTC like CURRENT_TIMESTAMP
+    timestamp = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    audit_log.write(Log.__table__, {'action': action, 'module_id': module_id, 'timestamp': timestamp})
@@ -94,11 +94,4 @@ def check_s3():
     }
 }){%  endif %}
 def list_routes():
-    routes = []
-    for rule in current_app.url_map.iter_rules():
-        routes.append({
-            'endpoint': rule.endpoint,
-            'methods': list(rule.methods),
-            'url': str(rule)
-        })
-    return jsonify({"routes": routes})
+    return jsonify({"routes": current_app.url_map.routes()})